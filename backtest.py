@@ -0,0 +1,174 @@
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from book_history import BookHistoryReader
+
+
+class SimulatedExecutor:
+    """
+    Turns calculator opportunities into simulated trades.
+
+    Each leg pays slippage on top of the fees already applied by the calculator, and a
+    triangle is traded once per appearance: it has to drop out of the results before it
+    can be traded again, so a persisting opportunity is not counted on every sample.
+    """
+    def __init__(self, slippage_bps: float = 5.0):
+        self.slippage_multiplier = (1 - slippage_bps / 10000) ** 3
+        self.open_triangles = set()
+        self.trades = 0
+        self.realized_profit = 0.0
+
+    def on_results(self, results: Dict):
+        for key, opportunity in results.items():
+            if key in self.open_triangles:
+                continue
+            final_amount = opportunity['final_amount'] * self.slippage_multiplier
+            self.realized_profit += final_amount - opportunity['initial_amount']
+            self.trades += 1
+        self.open_triangles = set(results)
+
+
+def _replay(records: Dict[str, np.ndarray], reader: BookHistoryReader):
+    """Yield (ts, orderbooks) at every sample time, carrying each symbol's latest record forward"""
+    timeline = np.unique(np.concatenate([arr['ts'] for arr in records.values() if len(arr)] or [np.empty(0, 'i8')]))
+    cursors = {symbol: 0 for symbol in records}
+    orderbooks = {}
+    for ts in timeline:
+        for symbol, arr in records.items():
+            idx = cursors[symbol]
+            while idx < len(arr) and arr['ts'][idx] <= ts:
+                orderbooks[symbol] = reader.to_orderbook(arr[idx])
+                idx += 1
+            cursors[symbol] = idx
+        yield int(ts), orderbooks
+
+
+def run_slice(job: Dict) -> Dict:
+    """Replay one time slice with one parameter set (runs inside a worker process)"""
+    from triangle_no_pandas import BybitTriangleCalculation
+
+    reader = BookHistoryReader(job['history_root'])
+    symbols = sorted({triangle[key] for triangle in job['triangles'] for key in ('pair1', 'pair2', 'pair3')})
+    records = reader.load_range(symbols, job['start_ms'], job['end_ms'])
+
+    params = job['params']
+    calculator = BybitTriangleCalculation(
+        trade_amount=params.get('trade_amount', 10),
+        min_profit=params.get('min_profit', 1),
+        max_profit=params.get('max_profit', 10),
+        ladder=params.get('ladder'),
+        fee_rate=job['fee_rate'],
+        triangles=job['triangles'],
+        results_file=None,
+        verbose=False
+    )
+    executor = SimulatedExecutor(job['slippage_bps'])
+
+    steps = 0
+    opportunities = 0
+    for _, orderbooks in _replay(records, reader):
+        results = calculator.calculate_arbitrage(orderbooks)
+        opportunities += len(results)
+        executor.on_results(results)
+        steps += 1
+
+    return {
+        'params': params,
+        'start_ms': job['start_ms'],
+        'end_ms': job['end_ms'],
+        'steps': steps,
+        'opportunities': opportunities,
+        'trades': executor.trades,
+        'realized_profit': executor.realized_profit
+    }
+
+
+def run_backtest(history_root: str, triangles: List[Dict], start_ms: int, end_ms: int,
+                 param_grid: Dict[str, List], slices: int = 4, workers: int = None,
+                 fee_rate: float = 0.001, slippage_bps: float = 5.0) -> Dict:
+    """
+    Replay recorded books through BybitTriangleCalculation for every parameter combination
+
+    Args:
+        history_root (str): Directory written by BookHistoryWriter
+        triangles (list): Triangles to evaluate
+        start_ms (int): Start of the replayed range, ms since epoch
+        end_ms (int): End of the replayed range (exclusive)
+        param_grid (dict): Lists of values for trade_amount, min_profit, max_profit and ladder
+            (a ladder value is a list of trade amounts evaluated together; trades use the best size)
+        slices (int): Number of time slices the range is split into
+        workers (int, optional): Process pool size, defaults to the CPU count
+        fee_rate (float): Taker fee per leg
+        slippage_bps (float): Extra simulated slippage per leg, in basis points
+
+    Returns:
+        dict: Per-parameter-set totals and overall throughput
+    """
+    keys = sorted(param_grid)
+    combos = [dict(zip(keys, values)) for values in itertools.product(*(param_grid[key] for key in keys))]
+    bounds = np.linspace(start_ms, end_ms, slices + 1).astype('i8')
+
+    jobs = [
+        {
+            'history_root': history_root, 'triangles': triangles, 'params': params,
+            'start_ms': int(bounds[i]), 'end_ms': int(bounds[i + 1]),
+            'fee_rate': fee_rate, 'slippage_bps': slippage_bps
+        }
+        for params in combos for i in range(slices)
+    ]
+
+    wall_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        slice_results = list(pool.map(run_slice, jobs))
+    wall_seconds = time.perf_counter() - wall_start
+
+    totals = {}
+    for result in slice_results:
+        key = json.dumps(result['params'], sort_keys=True)
+        total = totals.setdefault(key, {'params': result['params'], 'steps': 0, 'opportunities': 0,
+                                        'trades': 0, 'realized_profit': 0.0})
+        for field in ('steps', 'opportunities', 'trades', 'realized_profit'):
+            total[field] += result[field]
+
+    # Every parameter set replays the whole range once
+    simulated_hours = (end_ms - start_ms) / 3_600_000 * len(combos)
+    return {
+        'results': sorted(totals.values(), key=lambda total: total['realized_profit'], reverse=True),
+        'jobs': len(jobs),
+        'wall_seconds': round(wall_seconds, 3),
+        'simulated_hours': round(simulated_hours, 3),
+        'simulated_hours_per_minute': round(simulated_hours / (wall_seconds / 60), 3) if wall_seconds else None
+    }
+
+
+if __name__ == "__main__":
+    HISTORY_ROOT = os.getenv('BOOK_HISTORY_ROOT', 'book_history')
+    PARAM_GRID = {
+        'trade_amount': [10, 100, 1000],
+        'min_profit': [0.1, 0.5, 1],
+        'max_profit': [10]
+    }
+
+    with open('triangles.json', 'r') as f:
+        triangles = json.load(f)
+
+    reader = BookHistoryReader(HISTORY_ROOT)
+    days = reader.days()
+    if not days:
+        raise SystemExit(f"No history recorded in {HISTORY_ROOT}")
+
+    # Replay everything that was recorded
+    first_day, last_day = days[0], days[-1]
+    start_ms = min(int(reader._segment(first_day, s)['ts'][0]) for s in reader.symbols(first_day))
+    end_ms = max(int(reader._segment(last_day, s)['ts'][-1]) for s in reader.symbols(last_day)) + 1
+
+    report = run_backtest(HISTORY_ROOT, triangles, start_ms, end_ms, PARAM_GRID)
+    print(json.dumps(report, indent=2))
+    with open('backtest_results.json', 'w') as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,1015 @@
+import json
+import random
+import threading
+import time
+from typing import Dict
+
+
+def _delta_message(symbol: str, seq: int, level: int) -> str:
+    """Delta that stamps the same sequence number on one bid level, one ask level and ts"""
+    return json.dumps({
+        "topic": f"orderbook.50.{symbol}",
+        "type": "delta",
+        "ts": seq,
+        "data": {
+            "s": symbol,
+            "b": [[f"{100 - level * 0.01:.2f}", str(seq)]],
+            "a": [[f"{101 + level * 0.01:.2f}", str(seq)]],
+            "u": seq
+        }
+    })
+
+
+def bench_snapshot_contention(ingest_threads: int = 3, symbols_per_thread: int = 50,
+                              readers: int = 2, duration: float = 3.0) -> Dict:
+    """
+    Stress copy-on-write book publishing with concurrent ingest and reader threads.
+
+    Every delta writes its sequence number into a bid level, an ask level and 'ts', so a
+    reader that ever saw a half-applied book would find the three out of step.
+    """
+    from test_triple_socket import SymbolWebSocket
+    from update_scheduler import DirtySymbolScheduler
+
+    orderbooks = {}
+    scheduler = DirtySymbolScheduler()
+    scheduler.register('bench')
+    sockets = []
+    for socket_id in range(ingest_threads):
+        symbols = [f"S{socket_id}X{i}USDT" for i in range(symbols_per_thread)]
+        sockets.append(SymbolWebSocket(symbols, socket_id + 1, orderbooks, scheduler))
+
+    running = True
+    counters = {'messages': 0, 'snapshots': 0, 'books_checked': 0, 'torn': 0, 'snapshot_ns': []}
+    counters_lock = threading.Lock()
+
+    def ingest(socket):
+        rng = random.Random(socket.socket_id)
+        messages = 0
+        seq = 1
+        while running:
+            socket._on_message(None, _delta_message(rng.choice(socket.symbols), seq, rng.randrange(20)))
+            seq += 1
+            messages += 1
+        with counters_lock:
+            counters['messages'] += messages
+
+    def read():
+        snapshots = books_checked = torn = 0
+        timings = []
+        while running:
+            start = time.perf_counter_ns()
+            snapshot = orderbooks.copy()
+            timings.append(time.perf_counter_ns() - start)
+            for book in snapshot.values():
+                top_bid_qty = max(qty for _, qty in book['bids'])
+                top_ask_qty = max(qty for _, qty in book['asks'])
+                if not (top_bid_qty == top_ask_qty == book['ts']):
+                    torn += 1
+                books_checked += 1
+            snapshots += 1
+        with counters_lock:
+            counters['snapshots'] += snapshots
+            counters['books_checked'] += books_checked
+            counters['torn'] += torn
+            counters['snapshot_ns'].extend(timings)
+
+    threads = [threading.Thread(target=ingest, args=(socket,)) for socket in sockets]
+    threads += [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    running = False
+    for thread in threads:
+        thread.join()
+
+    timings = sorted(counters['snapshot_ns']) or [0]
+    return {
+        'symbols': ingest_threads * symbols_per_thread,
+        'messages_per_sec': round(counters['messages'] / duration),
+        'snapshots': counters['snapshots'],
+        'books_checked': counters['books_checked'],
+        'torn_books': counters['torn'],
+        'snapshot_p50_us': round(timings[len(timings) // 2] / 1000, 2),
+        'snapshot_p99_us': round(timings[int(len(timings) * 0.99)] / 1000, 2)
+    }
+
+
+def _percentile(values, q: float) -> float:
+    values = sorted(values) or [0]
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def bench_dual_feed(symbols: int = 20, rate_per_symbol: float = 50.0, duration: float = 5.0,
+                    delay_ms: float = 5.0, jitter_ms: float = 2.0, spike_probability: float = 0.005,
+                    spike_ms: float = 80.0) -> Dict:
+    """
+    Book staleness (exchange publish -> applied) with one feed vs two redundant feeds.
+
+    Both connections get the same base delay and independent jitter spikes from the
+    local simulator; the redundant client only waits for a spike when both feeds stall.
+    """
+    from feed_simulator import LocalFeedSimulator
+    from test_dual_socket import DualSocketClient
+
+    names = [f"SIM{i}USDT" for i in range(symbols)]
+    report = {}
+    for mode, redundant in (('single', False), ('redundant', True)):
+        simulator = LocalFeedSimulator(names, rate_per_symbol=rate_per_symbol)
+        simulator.track_publish_times = True
+        staleness_ns = []
+
+        def on_update(symbol, u, recv_ns, feed_id):
+            published = simulator.published_ns.get((symbol, u))
+            if published is not None:
+                staleness_ns.append(recv_ns - published)
+
+        factories = [simulator.app_factory(delay_ms=delay_ms, jitter_ms=jitter_ms,
+                                           spike_probability=spike_probability, spike_ms=spike_ms)
+                     for _ in range(2 if redundant else 1)]
+        client = DualSocketClient(names, redundant=redundant, ws_app_factory=factories, on_update=on_update,
+                                  name=f"bench_{mode}")
+        client.start()
+        time.sleep(0.5)
+        simulator.start()
+        time.sleep(duration)
+        simulator.stop()
+        client.stop()
+
+        report[mode] = {
+            'updates_applied': len(staleness_ns),
+            'staleness_p50_ms': round(_percentile(staleness_ns, 0.5) / 1e6, 3),
+            'staleness_p99_ms': round(_percentile(staleness_ns, 0.99) / 1e6, 3),
+            'staleness_max_ms': round(_percentile(staleness_ns, 1.0) / 1e6, 3),
+            'feeds': {feed_id: {key: stats[key] for key in ('wins', 'duplicates', 'win_ratio', 'mean_lead_ms')}
+                      for feed_id, stats in client.get_feed_stats().items()}
+        }
+    return report
+
+
+def bench_startup(runs: int = 5, coins: int = 150) -> Dict:
+    """
+    Wall time from launching fast_start.py to its first subscribe request, with a cached topology.
+
+    Each run is a fresh interpreter streaming from the local simulator. The import cost of
+    the modules the old start-up pulled in eagerly (pandas, pybit) is measured for reference,
+    and reported as unavailable when one of them is not installed (pandas is no longer required).
+    """
+    import importlib.util
+    import os
+    import subprocess
+    import sys
+    import tempfile
+    from topology_cache import TopologyCache, synthetic_topology
+
+    repo = os.path.dirname(os.path.abspath(__file__))
+    workdir = tempfile.mkdtemp(prefix='startup_bench_')
+    cache_path = os.path.join(workdir, 'topology_cache.json')
+    TopologyCache(cache_path).save(synthetic_topology(coins))
+    env = dict(os.environ, TOPOLOGY_CACHE=cache_path, FAST_START_SIMULATOR='1', FAST_START_EXIT_AFTER_SUBSCRIBE='1')
+
+    launch_ms = []
+    in_process_ms = []
+    for _ in range(runs):
+        launched_at = time.time()
+        output = subprocess.run([sys.executable, os.path.join(repo, 'fast_start.py')], cwd=workdir, env=env,
+                                capture_output=True, text=True, timeout=60).stderr
+        start = output.find('STARTUP {')
+        if start < 0:
+            raise RuntimeError(f"fast_start.py did not report a subscription:\n{output[-2000:]}")
+        # Decode exactly one JSON object, whatever follows it on the line
+        timings, _ = json.JSONDecoder().raw_decode(output, start + len('STARTUP '))
+        launch_ms.append((timings['first_subscription_at'] - launched_at) * 1000)
+        in_process_ms.append(timings['first_subscription_ms'])
+
+    missing = [module for module in ('pandas', 'pybit') if importlib.util.find_spec(module) is None]
+    if missing:
+        legacy_import_ms = f"unavailable ({', '.join(missing)} not installed)"
+    else:
+        legacy = subprocess.run([sys.executable, '-c', 'import time; t = time.perf_counter(); '
+                                 'import pandas, pybit.unified_trading; print((time.perf_counter() - t) * 1000)'],
+                                capture_output=True, text=True)
+        legacy_import_ms = round(float(legacy.stdout), 1) if legacy.returncode == 0 else 'unavailable (import failed)'
+    launch_ms.sort()
+    return {
+        'symbols': len(synthetic_topology(coins)['symbols']),
+        'runs': runs,
+        'launch_to_first_subscription_ms_median': round(launch_ms[len(launch_ms) // 2], 1),
+        'launch_to_first_subscription_ms_max': round(launch_ms[-1], 1),
+        'after_interpreter_start_ms_median': round(sorted(in_process_ms)[len(in_process_ms) // 2], 1),
+        'legacy_eager_import_ms': legacy_import_ms
+    }
+
+
+def _thread_cpu_seconds(threads) -> float:
+    return sum(time.clock_gettime(time.pthread_getcpuclockid(thread.ident)) for thread in threads if thread.is_alive())
+
+
+def bench_depth_tiers(coins: int = 100, rate_per_symbol: float = 20.0, duration: float = 5.0,
+                      candidate_triangles: int = 10, pinned_triangles: int = 2) -> Dict:
+    """
+    Message volume, bytes and socket-thread CPU with every symbol on orderbook.50 vs depth tiers.
+
+    The tiered run puts everything on orderbook.1 except the legs of a few candidate
+    triangles (orderbook.50) and pinned triangles (orderbook.200), as DepthTierManager would.
+    """
+    from feed_simulator import LocalFeedSimulator
+    from test_triple_socket import MultiSocketClient
+    from topology_cache import synthetic_topology
+
+    topology = synthetic_topology(coins)
+    symbols = topology['symbols']
+    tiered = {symbol: 1 for symbol in symbols}
+    for triangle in topology['triangles'][:candidate_triangles]:
+        tiered.update({triangle[key]: 50 for key in ('pair1', 'pair2', 'pair3')})
+    for triangle in topology['triangles'][candidate_triangles:candidate_triangles + pinned_triangles]:
+        tiered.update({triangle[key]: 200 for key in ('pair1', 'pair2', 'pair3')})
+
+    report = {}
+    for mode, depths in (('all_depth_50', {}), ('tiered', tiered)):
+        simulator = LocalFeedSimulator(symbols, rate_per_symbol=rate_per_symbol)
+        client = MultiSocketClient(symbols, ws_app_factory=simulator.app_factory(), depths=depths)
+        client.json_writer_running = False
+        client.start()
+        time.sleep(1.0)
+        simulator.start()
+        time.sleep(0.5)
+
+        threads = [socket.thread for socket in client.sockets]
+        messages_before = sum(socket.metric_messages.value for socket in client.sockets)
+        bytes_before = sum(connection.bytes_delivered for connection in simulator.connections)
+        cpu_before = _thread_cpu_seconds(threads)
+        time.sleep(duration)
+        cpu = _thread_cpu_seconds(threads) - cpu_before
+        messages = sum(socket.metric_messages.value for socket in client.sockets) - messages_before
+        received_bytes = sum(connection.bytes_delivered for connection in simulator.connections) - bytes_before
+
+        report[mode] = {
+            'depth_tiers': {str(depth): count for depth, count in sorted(client.get_depth_tiers().items())},
+            'messages_per_sec': round(messages / duration),
+            'kbytes_per_sec': round(received_bytes / duration / 1024, 1),
+            'ingest_cpu_percent': round(cpu / duration * 100, 1)
+        }
+        simulator.stop()
+        client.stop()
+
+    report['message_reduction'] = round(1 - report['tiered']['messages_per_sec'] /
+                                        max(report['all_depth_50']['messages_per_sec'], 1), 3)
+    return report
+
+
+def _ns_per_op(function, repeat: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter_ns() - start) / repeat
+
+
+def bench_fixed_point(levels: int = 50, repeat: int = 2000, seed: int = 3) -> Dict:
+    """
+    float vs Decimal vs fixed-point integers on the book hot paths and at the order boundary.
+
+    parse: one 50-level side from exchange strings; apply: one 4-level delta into a dict
+    book; walk: quote-budget fill over 50 levels; format: lot-size rounding of an order
+    quantity. format_mismatches counts random quantities where the old float rounding
+    (int(q / step) * step) disagrees with exact decimal rounding.
+    """
+    from decimal import Decimal, ROUND_DOWN
+    from fixed_point import InstrumentScale, base_for_notional, parse_scaled
+
+    rng = random.Random(seed)
+    scale = InstrumentScale('ADAUSDT', tick_size='0.0001', lot_size='0.01')
+    asks = [[f"{0.7 + i * 0.0001:.4f}", f"{rng.uniform(1, 500):.2f}"] for i in range(levels)]
+    delta = [[f"{0.7 + rng.randrange(levels) * 0.0001:.4f}", f"{rng.uniform(0, 500):.2f}"] for _ in range(4)]
+    budget = "1000"
+
+    float_book = {float(price): float(qty) for price, qty in asks}
+    decimal_book = {Decimal(price): Decimal(qty) for price, qty in asks}
+    fixed_book = {scale.price(price): scale.qty(qty) for price, qty in asks}
+    float_levels = sorted(float_book.items())
+    decimal_levels = sorted(decimal_book.items())
+    fixed_levels = sorted(fixed_book.items())
+
+    def float_walk():
+        remaining, total = float(budget), 0.0
+        for price, qty in float_levels:
+            if remaining >= price * qty:
+                total += qty
+                remaining -= price * qty
+            else:
+                total += remaining / price
+                break
+        return total
+
+    def decimal_walk():
+        remaining, total = Decimal(budget), Decimal(0)
+        for price, qty in decimal_levels:
+            if remaining >= price * qty:
+                total += qty
+                remaining -= price * qty
+            else:
+                total += remaining / price
+                break
+        return total
+
+    def float_apply():
+        for price, qty in delta:
+            price, qty = float(price), float(qty)
+            if qty > 0:
+                float_book[price] = qty
+            else:
+                float_book.pop(price, None)
+
+    def decimal_apply():
+        for price, qty in delta:
+            price, qty = Decimal(price), Decimal(qty)
+            if qty > 0:
+                decimal_book[price] = qty
+            else:
+                decimal_book.pop(price, None)
+
+    def fixed_apply():
+        for price, qty in delta:
+            price, qty = parse_scaled(price, 4), parse_scaled(qty, 2)
+            if qty:
+                fixed_book[price] = qty
+            else:
+                fixed_book.pop(price, None)
+
+    quantity = "123.456789"
+    step = 0.01
+    report = {
+        'parse_side_us': {
+            'float': _ns_per_op(lambda: [(float(p), float(q)) for p, q in asks], repeat) / 1000,
+            'decimal': _ns_per_op(lambda: [(Decimal(p), Decimal(q)) for p, q in asks], repeat) / 1000,
+            'fixed': _ns_per_op(lambda: [(parse_scaled(p, 4), parse_scaled(q, 2)) for p, q in asks], repeat) / 1000
+        },
+        'apply_delta_us': {
+            'float': _ns_per_op(float_apply, repeat) / 1000,
+            'decimal': _ns_per_op(decimal_apply, repeat) / 1000,
+            'fixed': _ns_per_op(fixed_apply, repeat) / 1000
+        },
+        'walk_fill_us': {
+            'float': _ns_per_op(float_walk, repeat) / 1000,
+            'decimal': _ns_per_op(decimal_walk, repeat) / 1000,
+            'fixed': _ns_per_op(lambda: base_for_notional(fixed_levels, scale.notional(budget)), repeat) / 1000
+        },
+        'format_order_us': {
+            'float': _ns_per_op(lambda: f"{float(int(float(quantity) / step) * step):.2f}", repeat) / 1000,
+            'decimal': _ns_per_op(lambda: str(Decimal(quantity).quantize(Decimal('0.01'), rounding=ROUND_DOWN)),
+                                  repeat) / 1000,
+            'fixed': _ns_per_op(lambda: scale.order_qty(quantity), repeat) / 1000
+        }
+    }
+    for timings in report.values():
+        for name in timings:
+            timings[name] = round(timings[name], 3)
+
+    mismatches = 0
+    for _ in range(10000):
+        text = f"{rng.randrange(1, 10 ** 6) / 100:.2f}"
+        if f"{float(int(float(text) / step) * step):.2f}" != scale.order_qty(text):
+            mismatches += 1
+    report['format_mismatches_per_10k'] = mismatches
+    return report
+
+
+def bench_paper_trading(coins: int = 10, cycles: int = 20, rate_per_symbol: float = 50.0, latency_ms: float = 5.0,
+                        trade_amounts=('200', '5000')) -> Dict:
+    """
+    End-to-end triangle cycle time and slippage with the sequential executor on a paper exchange.
+
+    Orders fill against the books streamed from the local simulator, so slippage is the
+    book moving during the order latency plus walking levels; the large size also runs
+    into partial fills.
+    """
+    import asyncio
+    import contextlib
+    import io
+    from feed_simulator import LocalFeedSimulator
+    from fixed_point import scales_from_topology
+    from mock_exchange import PaperExchangeSession
+    from test_triple_socket import MultiSocketClient
+    from topology_cache import synthetic_topology
+    from walllet_connect import WalletManager, TriangleWalletExecutor, split_symbol
+
+    def coin_moved(order: Dict, received: bool) -> str:
+        base, quote = split_symbol(order['symbol'])
+        return base if (order['side'].upper() == "BUY") == received else quote
+
+    topology = synthetic_topology(coins)
+    simulator = LocalFeedSimulator(topology['symbols'], rate_per_symbol=rate_per_symbol)
+    # Cross-consistent prices, so a cycle hands back about what it spent and fees stay in proportion
+    rng = random.Random(11)
+    simulator.mids['BTCUSDT'] = 100.0
+    for i in range(coins):
+        price = 1 + rng.random() * 9
+        simulator.mids[f"C{i}USDT"], simulator.mids[f"C{i}BTC"] = price, price / 100
+    client = MultiSocketClient(topology['symbols'], ws_app_factory=simulator.app_factory())
+    client.json_writer_running = False
+    client.start()
+    simulator.start()
+    time.sleep(1.5)
+
+    report = {'latency_ms': latency_ms}
+    for amount in trade_amounts:
+        balances = {'USDT': 1e9, 'BTC': 1e9, **{f"C{i}": 1e9 for i in range(coins)}}
+        session = PaperExchangeSession(client.get_orderbooks, balances, latency_ms=latency_ms)
+        executor = TriangleWalletExecutor(WalletManager("paper", "paper", session=session), amount,
+                                          instrument_scales=scales_from_topology(topology))
+        executor.poll_interval = 0.005
+        cycle_ms = []
+        failed = 0
+
+        async def run():
+            nonlocal failed
+            for cycle in range(cycles):
+                triangle = topology['triangles'][cycle % len(topology['triangles'])]
+                start = time.perf_counter()
+                result = await executor.execute_triangle_trade([triangle['pair1'], triangle['pair2'], triangle['pair3']])
+                cycle_ms.append((time.perf_counter() - start) * 1000)
+                failed += result['status'] != 'success'
+                if result['status'] == 'success':
+                    first, last = (session.orders[order['orderId']] for order in (result['orders'][0], result['orders'][-1]))
+                    # A cycle has to end in the coin it started from
+                    assert coin_moved(last, received=True) == coin_moved(first, received=False), \
+                        f"Cycle {[order['symbol'] for order in result['orders']]} did not return to its start coin"
+
+        # The executor logs every request and response
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(run())
+        report[f"amount_{amount}"] = {
+            'cycles': cycles,
+            'failed_cycles': failed,
+            'cycle_ms_p50': round(_percentile(cycle_ms, 0.5), 2),
+            'cycle_ms_max': round(_percentile(cycle_ms, 1.0), 2),
+            **session.slippage_report()
+        }
+
+    simulator.stop()
+    client.stop()
+    return report
+
+
+def _synthetic_books(topology: Dict, levels: int = 50, seed: int = 5) -> Dict:
+    """Float books in the MultiSocketClient layout for every symbol of a synthetic topology"""
+    rng = random.Random(seed)
+    books = {}
+    for symbol in topology['symbols']:
+        mid = 1 + rng.random() * 100
+        tick = mid * 0.0001
+        books[symbol] = {
+            'bids': tuple((mid - tick * (i + 1), rng.random() * 10) for i in range(levels)),
+            'asks': tuple((mid + tick * (i + 1), rng.random() * 10) for i in range(levels))
+        }
+    return books
+
+
+def _best_ms(function, repeat: int) -> float:
+    """Fastest of several runs, the least disturbed by other processes on a shared machine"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def bench_ladder(coins: int = 300, levels: int = 50, sizes=(10, 50, 100, 250, 500, 1000, 2500, 5000),
+                 repeat: int = 15) -> Dict:
+    """
+    One ladder pass over every triangle vs one calculate_arbitrage pass per trade size.
+
+    Pruning is disabled (min_profit far below zero) so every triangle is walked, and
+    reported, in both modes; this is the worst case for the ladder's grid output, which is
+    built lazily and timed separately as the cost of reading every grid.
+    """
+    from topology_cache import synthetic_topology
+    from triangle_no_pandas import BybitTriangleCalculation
+
+    topology = synthetic_topology(coins)
+    books = _synthetic_books(topology, levels)
+    options = dict(min_profit=-100, max_profit=100, triangles=topology['triangles'], results_file=None,
+                   verbose=False)
+
+    singles = [BybitTriangleCalculation(trade_amount=size, **options) for size in sizes]
+    ladder = BybitTriangleCalculation(ladder=list(sizes), **options)
+    # Same walks with no triangle in the profit range: the cost without building grids
+    walk_only = BybitTriangleCalculation(ladder=list(sizes), **dict(options, max_profit=-100))
+
+    per_size_ms = _best_ms(lambda: [calculator.calculate_arbitrage(books) for calculator in singles], repeat)
+    # The ladder walks as deep as its largest size, so that is the single pass to compare with
+    one_pass_ms = _best_ms(lambda: singles[-1].calculate_arbitrage(books), repeat)
+    ladder_ms = _best_ms(lambda: ladder.calculate_arbitrage(books), repeat)
+    walk_only_ms = _best_ms(lambda: walk_only.calculate_arbitrage(books), repeat)
+    # Grids are built when read: the cost a consumer pays for reading every point of every triangle
+    grids_ms = _best_ms(lambda: [result['ladder'].to_list() for result in ladder.calculate_arbitrage(books).values()],
+                        repeat) - ladder_ms
+
+    # Every ladder point must match the single-size pass for the same amount
+    ladder_results = ladder.calculate_arbitrage(books)
+    max_diff = 0.0
+    for size, calculator in zip(sizes, singles):
+        for key, result in calculator.calculate_arbitrage(books).items():
+            point = next(point for point in ladder_results[key]['ladder'] if point[0] == size)
+            max_diff = max(max_diff, abs(round(point[3], 4) - result['profit_percent']))
+
+    return {
+        'triangles': len(topology['triangles']),
+        'sizes': len(sizes),
+        'largest_size_pass_ms': round(one_pass_ms, 2),
+        'pass_per_size_ms': round(per_size_ms, 2),
+        'ladder_pass_ms': round(ladder_ms, 2),
+        'ladder_pass_without_grids_ms': round(walk_only_ms, 2),
+        'ladder_vs_one_pass': round(ladder_ms / one_pass_ms, 2),
+        'ladder_without_grids_vs_one_pass': round(walk_only_ms / one_pass_ms, 2),
+        'reading_every_grid_ms': round(grids_ms, 2),
+        'max_profit_percent_diff': max_diff
+    }
+
+def _multi_quote_market(coins: int = 100, levels: int = 50, seed: int = 11):
+    """
+    Instruments and consistent float books for coins quoted in USDT, USDC, BTC and ETH,
+    plus the cross pairs between those four, with a little per-symbol price noise.
+    """
+    rng = random.Random(seed)
+    usd = {'USDT': 1.0, 'USDC': 1.0001, 'BTC': 60000.0, 'ETH': 3000.0}
+    usd.update({f"C{i}": 0.5 + rng.random() * 50 for i in range(coins)})
+    pairs = [('USDC', 'USDT'), ('BTC', 'USDT'), ('ETH', 'USDT'), ('BTC', 'USDC'), ('ETH', 'USDC'), ('ETH', 'BTC')]
+    pairs += [(f"C{i}", quote) for i in range(coins) for quote in ('USDT', 'USDC', 'BTC', 'ETH')]
+
+    instruments, books = {}, {}
+    for base, quote in pairs:
+        symbol = base + quote
+        instruments[symbol] = {'base': base, 'quote': quote, 'status': 'Trading'}
+        mid = usd[base] / usd[quote] * (1 + (rng.random() - 0.5) * 0.004)
+        tick = mid * 0.0001
+        size = 2000 / usd[base]
+        books[symbol] = {
+            'bids': tuple((mid - tick * (i + 1), rng.random() * size) for i in range(levels)),
+            'asks': tuple((mid + tick * (i + 1), rng.random() * size) for i in range(levels))
+        }
+    return instruments, books
+
+
+def bench_multi_anchor(coins: int = 100, levels: int = 50, trade_amount: float = 1000, repeat: int = 15) -> Dict:
+    """
+    Cost of one CycleCalculation pass as anchors are added, against one calculator per anchor.
+
+    Books are copied before every pass so the prefix arrays start over each time, as they
+    do when every book has moved; pruning is off so every cycle is converted. With one
+    anchor both columns run the same single calculator, so any gap there is noise.
+    """
+    from cycle_calculator import CycleCalculation
+
+    instruments, books = _multi_quote_market(coins, levels)
+    anchor_sets = [('USDT',), ('USDT', 'USDC'), ('USDT', 'USDC', 'BTC'), ('USDT', 'USDC', 'BTC', 'ETH')]
+    options = dict(trade_amount=trade_amount, min_profit=-100, max_profit=100)
+
+    def fresh_books():
+        return {symbol: {'bids': tuple(list(book['bids'])), 'asks': tuple(list(book['asks']))}
+                for symbol, book in books.items()}
+
+    def timed(calculators):
+        copies = [fresh_books() for _ in range(repeat)]
+        timings = []
+        for copy in copies:
+            start = time.perf_counter()
+            for calculator in calculators:
+                calculator.calculate_arbitrage(copy)
+            timings.append((time.perf_counter() - start) * 1000)
+        return min(timings)
+
+    report = {'symbols': len(instruments)}
+    single_ms = None
+    for anchors in anchor_sets:
+        calculator = CycleCalculation(instruments, anchors=anchors, **options)
+        shared_ms = timed([calculator])
+        single_ms = single_ms or shared_ms
+        separate_ms = timed([CycleCalculation(instruments, anchors=(anchor,), **options) for anchor in anchors])
+        report[f"{len(anchors)}_anchors"] = {
+            'cycles': len(calculator.compiled),
+            'legs': calculator.last_stats['legs'],
+            'shared_pass_ms': round(shared_ms, 2),
+            'separate_passes_ms': round(separate_ms, 2),
+            'vs_one_anchor': round(shared_ms / single_ms, 2),
+            'us_per_cycle': round(shared_ms * 1000 / len(calculator.compiled), 2)
+        }
+    return report
+
+
+def bench_watermarks(coins: int = 100, levels: int = 50, passes: int = 200, dirty_per_pass: int = 20,
+                     trade_amount: float = 1000, seed: int = 13) -> Dict:
+    """
+    Incremental CycleCalculation passes with and without consumed-depth watermarks.
+
+    Every pass changes the quantity of one random level (uniform over the depth) on
+    dirty_per_pass symbols, the way depth deltas spread over a 50-level book. Both
+    incremental calculators are checked against a full pass after every update.
+    """
+    from cycle_calculator import CycleCalculation
+
+    rng = random.Random(seed)
+    instruments, books = _multi_quote_market(coins, levels)
+    options = dict(trade_amount=trade_amount, min_profit=-100, max_profit=100)
+    with_watermarks = CycleCalculation(instruments, **options)
+    without_watermarks = CycleCalculation(instruments, watermarks=False, **options)
+    full = CycleCalculation(instruments, **options)
+    for calculator in (with_watermarks, without_watermarks, full):
+        calculator.calculate_arbitrage(dict(books))
+
+    symbols = sorted(books)
+    timings = {'watermarks': [], 'no_watermarks': [], 'full': []}
+    mismatches = 0
+    for _ in range(passes):
+        books = dict(books)
+        dirty = set(rng.sample(symbols, dirty_per_pass))
+        for symbol in dirty:
+            side = rng.choice(('bids', 'asks'))
+            level = rng.randrange(levels)
+            updated = list(books[symbol][side])
+            updated[level] = (updated[level][0], updated[level][1] * (0.5 + rng.random()))
+            books[symbol] = dict(books[symbol], **{side: tuple(updated)})
+
+        for name, calculator, changed in (('watermarks', with_watermarks, dirty),
+                                          ('no_watermarks', without_watermarks, dirty), ('full', full, None)):
+            start = time.perf_counter()
+            calculator.calculate_arbitrage(books, dirty=changed)
+            timings[name].append((time.perf_counter() - start) * 1000)
+        expected = {key: result['profit_percent'] for key, result in full.results.items()}
+        for calculator in (with_watermarks, without_watermarks):
+            if {key: result['profit_percent'] for key, result in calculator.results.items()} != expected:
+                mismatches += 1
+
+    return {
+        'cycles': len(full.compiled),
+        'dirty_symbols_per_pass': dirty_per_pass,
+        'full_pass_p50_ms': round(_percentile(timings['full'], 0.5), 3),
+        'incremental_p50_ms': round(_percentile(timings['no_watermarks'], 0.5), 3),
+        'watermark_p50_ms': round(_percentile(timings['watermarks'], 0.5), 3),
+        'recomputed_per_pass_without_watermarks': round(without_watermarks.recomputed / passes, 1),
+        'recomputed_per_pass_with_watermarks': round(with_watermarks.recomputed / passes, 1),
+        'watermark_hit_rate': with_watermarks.watermark_stats()['hit_rate'],
+        'mismatched_passes': mismatches
+    }
+
+
+def _socket_message_rates(client, duration: float) -> Dict[int, float]:
+    before = {socket.socket_id: socket.metric_messages.value for socket in client.sockets}
+    time.sleep(duration)
+    return {socket.socket_id: round((socket.metric_messages.value - before[socket.socket_id]) / duration, 1)
+            for socket in client.sockets}
+
+
+def bench_placement(coins: int = 50, hot_symbols: int = 6, hot_rate: float = 100.0, rate_per_symbol: float = 4.0,
+                    duration: float = 4.0, rebalances: int = 4) -> Dict:
+    """
+    Per-socket message load with the hot pairs first in the symbol list (all on one socket),
+    after runtime rebalancing by LoadBalancer, and with rate-weighted initial placement.
+    """
+    import contextlib
+    import io
+    from feed_simulator import LocalFeedSimulator
+    from symbol_placement import LoadBalancer
+    from test_triple_socket import MultiSocketClient
+    from topology_cache import synthetic_topology
+
+    symbols = synthetic_topology(coins)['symbols']
+    rates = {symbol: hot_rate for symbol in symbols[:hot_symbols]}
+
+    def imbalance(loads):
+        mean = sum(loads.values()) / len(loads)
+        return round(max(loads.values()) / mean, 3) if mean else None
+
+    report = {'symbols': len(symbols), 'hot_symbols': hot_symbols}
+    for mode, symbol_rates in (('list_order', None), ('weighted_start', rates)):
+        simulator = LocalFeedSimulator(symbols, rate_per_symbol=rate_per_symbol, rates=rates)
+        client = MultiSocketClient(symbols, ws_app_factory=simulator.app_factory(), symbol_rates=symbol_rates)
+        client.json_writer_running = False
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                client.start()
+                time.sleep(1.0)
+            simulator.start()
+            time.sleep(0.5)
+            before = _socket_message_rates(client, duration)
+            entry = {'messages_per_sec': before, 'imbalance': imbalance(before)}
+            if symbol_rates is None:
+                balancer = LoadBalancer(client, interval=duration, max_moves=10)
+                balancer.measure()
+                for _ in range(rebalances):
+                    time.sleep(duration)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        balancer.rebalance()
+                time.sleep(1.0)
+                after = _socket_message_rates(client, duration)
+                stale = [symbol for symbol, stats in client.get_update_stats(stale_after_ms=2000).items()
+                         if stats['stale']]
+                entry.update({
+                    'rebalanced_messages_per_sec': after,
+                    'rebalanced_imbalance': imbalance(after),
+                    'moves': balancer.moves,
+                    'load_report': balancer.load_report(),
+                    'books': len(client.get_orderbooks()),
+                    'streamed_symbols': sum(len(socket.symbols) for socket in client.sockets),
+                    'stale_symbols': len(stale)
+                })
+        finally:
+            simulator.stop()
+            with contextlib.redirect_stdout(io.StringIO()):
+                client.stop()
+        report[mode] = entry
+    return report
+
+
+def bench_elastic_pool(symbols: int = 1200, max_topics_per_connection: int = 200, max_pairs_per_socket: int = 180,
+                       rate_per_symbol: float = 0.5, shrink_to: int = 500, timeout: float = 60.0) -> Dict:
+    """
+    MultiSocketClient streaming more symbols than the old three-socket cap, against a simulator
+    enforcing per-connection topic and per-request arg limits: start, shrink, grow back.
+    """
+    import contextlib
+    import io
+    from feed_simulator import LocalFeedSimulator
+    from test_triple_socket import MultiSocketClient
+
+    names = [f"S{i}USDT" for i in range(symbols)]
+    simulator = LocalFeedSimulator(names, rate_per_symbol=rate_per_symbol,
+                                   max_topics_per_connection=max_topics_per_connection)
+    requests = []
+    handle_request = simulator.handle_request
+
+    def recorded(connection, request):
+        requests.append(time.monotonic())
+        handle_request(connection, request)
+    simulator.handle_request = recorded
+
+    def wait_for_books(wanted, since_ns):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            books = client.get_orderbooks()
+            if all(symbol in books and books[symbol]['recv_ns'] >= since_ns for symbol in wanted):
+                return True
+            time.sleep(0.1)
+        return False
+
+    def peak_requests_per_sec(since):
+        times = [t for t in requests if t >= since]
+        return max((sum(1 for other in times if t <= other < t + 1.0) for t in times), default=0)
+
+    def failures():
+        return sum(socket.metric_request_failures.value for socket in client.sockets)
+
+    report = {'symbols': symbols, 'max_topics_per_connection': max_topics_per_connection}
+    client = MultiSocketClient(names, ws_app_factory=simulator.app_factory(), max_pairs_per_socket=max_pairs_per_socket)
+    client.json_writer_running = False
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulator.start()
+        started, started_ns = time.monotonic(), time.monotonic_ns()
+        client.start()
+        complete = wait_for_books(names, started_ns)
+        report['start'] = {
+            'sockets': len(client.sockets),
+            'all_books': complete,
+            'seconds': round(time.monotonic() - started, 2),
+            'subscribe_requests': len(requests),
+            'peak_requests_per_sec': peak_requests_per_sec(started),
+            'rejected_requests': failures()
+        }
+
+        kept = names[:shrink_to]
+        shrink_started = time.monotonic()
+        client.remove_symbols(names[shrink_to:])
+        while client.retiring and time.monotonic() - shrink_started < timeout:
+            time.sleep(0.1)
+        time.sleep(6 / rate_per_symbol)
+        stale = [symbol for symbol, stats in client.get_update_stats(stale_after_ms=6000 / rate_per_symbol).items()
+                 if stats['stale']]
+        report['shrink'] = {
+            'symbols': len(client.all_symbols),
+            'sockets': len(client.sockets),
+            'streamed_symbols': sum(len(socket.symbols) for socket in client.sockets),
+            'stale_symbols': len(stale),
+            'missing_books': sum(1 for symbol in kept if symbol not in client.get_orderbooks()),
+            'rejected_requests': failures()
+        }
+
+        grow_started, grow_started_ns = time.monotonic(), time.monotonic_ns()
+        client.add_symbols(names[shrink_to:])
+        complete = wait_for_books(names[shrink_to:], grow_started_ns)
+        report['grow'] = {
+            'symbols': len(client.all_symbols),
+            'sockets': len(client.sockets),
+            'all_books': complete,
+            'seconds': round(time.monotonic() - grow_started, 2),
+            'peak_requests_per_sec': peak_requests_per_sec(grow_started),
+            'rejected_requests': failures()
+        }
+        simulator.stop()
+        client.stop()
+    return report
+
+
+def _jitter_stats(samples_ms) -> Dict:
+    return {
+        'p50_ms': round(_percentile(samples_ms, 0.5), 3),
+        'p99_ms': round(_percentile(samples_ms, 0.99), 3),
+        'p999_ms': round(_percentile(samples_ms, 0.999), 3),
+        'max_ms': round(max(samples_ms), 3)
+    }
+
+
+def bench_runtime_jitter(coins: int = 60, iterations: int = 3000, dirty_per_pass: int = 5,
+                         ballast_objects: int = 1_000_000, seed: int = 17) -> Dict:
+    """
+    Hot-loop latency jitter with default GC settings vs RuntimeConfig tuning, asyncio timer
+    lateness on the default loop (and uvloop when installed), and calculator-thread pinning.
+
+    Each hot-loop iteration rebuilds a few books and runs an incremental CycleCalculation
+    pass, as the calculator does per dirty set. ballast_objects long-lived tuples stand in
+    for the state a running scanner keeps (topology, books, history), which every full
+    collection has to traverse unless it is frozen.
+    """
+    import asyncio
+    import contextlib
+    import gc
+    import io
+    import os
+    import subprocess
+    import sys
+    from cycle_calculator import CycleCalculation
+    from runtime_config import RuntimeConfig
+
+    instruments, books = _multi_quote_market(coins, 20)
+    symbols = sorted(books)
+    ballast = [(i, str(i)) for i in range(ballast_objects)]
+
+    def hot_loop(rng):
+        calculator = CycleCalculation(instruments, min_profit=-100, max_profit=100)
+        current = dict(books)
+        calculator.calculate_arbitrage(current)
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            dirty = set(rng.sample(symbols, dirty_per_pass))
+            for symbol in dirty:
+                book = current[symbol]
+                current[symbol] = {'bids': tuple((price, quantity * (0.9 + rng.random() * 0.2))
+                                                 for price, quantity in book['bids']),
+                                   'asks': book['asks']}
+            calculator.calculate_arbitrage(current, dirty=dirty)
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    def collections_during(function):
+        pauses = []
+        started = {}
+
+        def callback(phase, info):
+            if phase == 'start':
+                started['t'] = time.perf_counter()
+            elif 't' in started:
+                pauses.append((time.perf_counter() - started.pop('t')) * 1000)
+        gc.callbacks.append(callback)
+        try:
+            result = function()
+        finally:
+            gc.callbacks.remove(callback)
+        return result, pauses
+
+    report = {'iterations': iterations, 'ballast_objects': ballast_objects}
+    default_thresholds = gc.get_threshold()
+    for mode, config in (('default_gc', RuntimeConfig()),
+                         ('tuned_gc', RuntimeConfig(gc_thresholds=(50000, 50, 100), gc_freeze=True))):
+        gc.collect()
+        config.tune_gc()
+        with contextlib.redirect_stdout(io.StringIO()):
+            config.warmed_up()
+        samples, pauses = collections_during(lambda: hot_loop(random.Random(seed)))
+        report[mode] = dict(_jitter_stats(samples), gc_collections=len(pauses),
+                            gc_pause_max_ms=round(max(pauses), 3) if pauses else 0.0,
+                            gc_pause_total_ms=round(sum(pauses), 1))
+        gc.unfreeze()
+        gc.set_threshold(*default_thresholds)
+    del ballast
+
+    async def timer_lateness(samples: int = 500, interval: float = 0.001):
+        loop = asyncio.get_running_loop()
+        lateness = []
+        for _ in range(samples):
+            due = loop.time() + interval
+            await asyncio.sleep(interval)
+            lateness.append((loop.time() - due) * 1000)
+        return lateness
+
+    report['event_loop'] = {'asyncio': _jitter_stats(RuntimeConfig(use_uvloop=False).run(timer_lateness()))}
+    if RuntimeConfig().uvloop_module():
+        report['event_loop']['uvloop'] = _jitter_stats(RuntimeConfig().run(timer_lateness()))
+    else:
+        report['event_loop']['uvloop'] = 'not installed'
+
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+    if len(cpus) < 2:
+        report['affinity'] = f"skipped: {len(cpus) or 'unknown'} CPU available"
+        return report
+    # A busy process on the first CPU; the hot loop first shares it, then is pinned away from it
+    noise = subprocess.Popen([sys.executable, '-c', f"import os; os.sched_setaffinity(0, {{{cpus[0]}}})\nwhile True: pass"])
+    original = os.sched_getaffinity(0)
+    try:
+        report['affinity'] = {}
+        for mode, config in (('shared_cpu', RuntimeConfig(affinity={'calculator': [cpus[0]]})),
+                             ('pinned_cpu', RuntimeConfig(affinity={'calculator': cpus[1:]}))):
+            config.pin('calculator')
+            report['affinity'][mode] = _jitter_stats(hot_loop(random.Random(seed)))
+            os.sched_setaffinity(0, original)
+    finally:
+        noise.kill()
+        os.sched_setaffinity(0, original)
+    return report
+
+
+def bench_opportunity_store(coins: int = 100, passes: int = 200) -> Dict:
+    """
+    Calculator pass time when results are rewritten to JSON vs queued to the SQLite store,
+    and query latency over the accumulated history.
+
+    Every triangle is reported (min_profit far below zero) so each pass carries a full result set.
+    """
+    import contextlib
+    import io
+    import os
+    import tempfile
+    from opportunity_store import OpportunityStore
+    from topology_cache import synthetic_topology
+    from triangle_no_pandas import BybitTriangleCalculation
+
+    topology = synthetic_topology(coins)
+    books = _synthetic_books(topology)
+    workdir = tempfile.mkdtemp(prefix='opportunity_bench_')
+    options = dict(min_profit=-100, max_profit=100, triangles=topology['triangles'], verbose=False)
+
+    report = {'triangles': len(topology['triangles']), 'passes': passes}
+    json_calculator = BybitTriangleCalculation(results_file=os.path.join(workdir, 'arbitrage_res_all.json'),
+                                               **options)
+    # The JSON path prints a line per save
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings = []
+        for _ in range(passes):
+            start = time.perf_counter()
+            json_calculator.calculate_arbitrage(books)
+            timings.append((time.perf_counter() - start) * 1000)
+    report['json_pass_ms_p50'] = round(_percentile(timings, 0.5), 3)
+    report['json_pass_ms_p99'] = round(_percentile(timings, 0.99), 3)
+
+    store = OpportunityStore(os.path.join(workdir, 'opportunities.db'))
+    store.start()
+    store_calculator = BybitTriangleCalculation(results_file=None, store=store, **options)
+    timings = []
+    for _ in range(passes):
+        start = time.perf_counter()
+        store_calculator.calculate_arbitrage(books)
+        timings.append((time.perf_counter() - start) * 1000)
+    store.stop()
+    report['store_pass_ms_p50'] = round(_percentile(timings, 0.5), 3)
+    report['store_pass_ms_p99'] = round(_percentile(timings, 0.99), 3)
+    report['rows_written'] = store.rows_written
+    report['flush_ms_mean'] = round(store.metric_flush.sum / max(store.metric_flush.count, 1) * 1000, 2)
+
+    triangle = next(iter(store.top_n(1)))['triangle']
+    report['query_ms'] = {
+        'top_n': round(_best_ms(lambda: store.top_n(10), 20), 3),
+        'triangle_history': round(_best_ms(lambda: store.triangle_history(triangle), 20), 3),
+        'per_hour': round(_best_ms(lambda: store.per_hour(), 5), 3)
+    }
+    return report
+
+
+BENCHMARKS = {
+    'snapshot_contention': bench_snapshot_contention,
+    'dual_feed': bench_dual_feed,
+    'startup': bench_startup,
+    'depth_tiers': bench_depth_tiers,
+    'fixed_point': bench_fixed_point,
+    'paper_trading': bench_paper_trading,
+    'ladder': bench_ladder,
+    'opportunity_store': bench_opportunity_store,
+    'multi_anchor': bench_multi_anchor,
+    'watermarks': bench_watermarks,
+    'placement': bench_placement,
+    'elastic_pool': bench_elastic_pool,
+    'runtime_jitter': bench_runtime_jitter,
+}
+
+
+if __name__ == "__main__":
+    import sys
+
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    report = {}
+    for name in selected:
+        print(f"Running {name}...")
+        report[name] = BENCHMARKS[name]()
+        print(json.dumps(report[name], indent=2))
+
+    with open('benchmark_results.json', 'w') as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+def record_dtype(depth: int) -> np.dtype:
+    """One fixed-size record per sample: sample time, exchange time and top-N levels per side"""
+    return np.dtype([
+        ('ts', '<i8'),          # local sample time, ms since epoch (monotonic within a segment)
+        ('exch_ts', '<i8'),     # exchange timestamp of the sampled book, ms
+        ('bid_px', '<f8', (depth,)),
+        ('bid_qty', '<f8', (depth,)),
+        ('ask_px', '<f8', (depth,)),
+        ('ask_qty', '<f8', (depth,)),
+    ])
+
+
+def _day(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+class BookHistoryWriter:
+    """
+    Append-only history of the top-N book levels per symbol.
+
+    Samples are written as fixed-size binary records into one segment per day and symbol
+    (book_history/2025-05-31/BTCUSDT.bin), so a segment can be memory-mapped as a NumPy
+    structured array without parsing anything.
+    """
+    def __init__(self, root: str = 'book_history', depth: int = 10, interval: float = 1.0):
+        """
+        Args:
+            root (str): Directory holding the day partitions
+            depth (int): Number of levels stored per side
+            interval (float): Seconds between samples when running in the background
+        """
+        self.root = root
+        self.depth = depth
+        self.interval = interval
+        self.dtype = record_dtype(depth)
+        self.running = False
+        self.records_written = 0
+        self._write_meta()
+
+    def _write_meta(self):
+        os.makedirs(self.root, exist_ok=True)
+        meta_path = os.path.join(self.root, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta['depth'] != self.depth:
+                raise ValueError(f"{self.root} stores depth {meta['depth']}, not {self.depth}")
+            return
+        with open(meta_path, 'w') as f:
+            json.dump({'depth': self.depth, 'format': 'numpy-records-v1'}, f)
+
+    def _fill_side(self, record, px_field: str, qty_field: str, levels: List):
+        levels = levels[:self.depth]
+        record[px_field][:] = np.nan
+        record[qty_field][:] = 0
+        if levels:
+            arr = np.asarray(levels, dtype='f8')
+            record[px_field][:len(levels)] = arr[:, 0]
+            record[qty_field][:len(levels)] = arr[:, 1]
+
+    def write_snapshot(self, orderbooks: Dict, ts_ms: int = None):
+        """Append one record per symbol from an orderbooks mapping"""
+        ts_ms = ts_ms or int(time.time() * 1000)
+        day_dir = os.path.join(self.root, _day(ts_ms))
+        os.makedirs(day_dir, exist_ok=True)
+
+        for symbol, book in orderbooks.items():
+            record = np.zeros(1, dtype=self.dtype)[0]
+            record['ts'] = ts_ms
+            record['exch_ts'] = book.get('ts') or 0
+            self._fill_side(record, 'bid_px', 'bid_qty', book.get('bids', []))
+            self._fill_side(record, 'ask_px', 'ask_qty', book.get('asks', []))
+            with open(os.path.join(day_dir, f"{symbol}.bin"), 'ab') as f:
+                f.write(record.tobytes())
+            self.records_written += 1
+
+    def _sampler_task(self, get_orderbooks: Callable[[], Dict]):
+        next_sample = time.monotonic()
+        while self.running:
+            try:
+                self.write_snapshot(get_orderbooks())
+            except Exception as e:
+                print(f"Error writing book history: {e}")
+            next_sample += self.interval
+            time.sleep(max(0.0, next_sample - time.monotonic()))
+
+    def start(self, get_orderbooks: Callable[[], Dict]):
+        self.running = True
+        self.thread = threading.Thread(target=self._sampler_task, args=(get_orderbooks,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+
+class BookHistoryReader:
+    """Query the history written by BookHistoryWriter through memory-mapped segments"""
+    def __init__(self, root: str = 'book_history'):
+        self.root = root
+        with open(os.path.join(root, 'meta.json'), 'r') as f:
+            self.depth = json.load(f)['depth']
+        self.dtype = record_dtype(self.depth)
+
+    def days(self) -> List[str]:
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def symbols(self, day: str) -> List[str]:
+        return sorted(name[:-4] for name in os.listdir(os.path.join(self.root, day)) if name.endswith('.bin'))
+
+    def _segment(self, day: str, symbol: str):
+        path = os.path.join(self.root, day, f"{symbol}.bin")
+        if not os.path.exists(path):
+            return None
+        count = os.path.getsize(path) // self.dtype.itemsize
+        if count == 0:
+            return None
+        return np.memmap(path, dtype=self.dtype, mode='r', shape=(count,))
+
+    def load_range(self, symbols: List[str], start_ms: int, end_ms: int) -> Dict[str, np.ndarray]:
+        """
+        Load records with start_ms <= ts < end_ms for the given symbols
+
+        Only the day partitions overlapping the range are opened, and within a segment the
+        bounds are found by binary search on the memory-mapped ts column, so pages outside
+        the range are never read.
+
+        Returns:
+            dict: symbol -> structured array of records, ordered by ts
+        """
+        first_day = datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc).date()
+        last_day = datetime.fromtimestamp((end_ms - 1) / 1000, tz=timezone.utc).date()
+        days = []
+        day = first_day
+        while day <= last_day:
+            days.append(day.strftime('%Y-%m-%d'))
+            day += timedelta(days=1)
+
+        result = {}
+        for symbol in symbols:
+            chunks = []
+            for day in days:
+                segment = self._segment(day, symbol)
+                if segment is None:
+                    continue
+                ts = segment['ts']
+                lo = np.searchsorted(ts, start_ms, side='left')
+                hi = np.searchsorted(ts, end_ms, side='left')
+                if hi > lo:
+                    chunks.append(np.array(segment[lo:hi]))
+            result[symbol] = np.concatenate(chunks) if chunks else np.empty(0, dtype=self.dtype)
+        return result
+
+    def to_orderbook(self, record) -> Dict:
+        """Rebuild the live orderbook layout ({'bids': [[price, qty], ...], ...}) from one record"""
+        def side(px, qty):
+            return [[float(p), float(q)] for p, q in zip(px, qty) if q > 0 and not np.isnan(p)]
+        return {
+            'bids': side(record['bid_px'], record['bid_qty']),
+            'asks': side(record['ask_px'], record['ask_qty']),
+            'ts': int(record['exch_ts'])
+        }
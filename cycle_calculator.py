@@ -0,0 +1,443 @@
+import time
+from bisect import bisect_right
+from typing import Dict, List
+
+from metrics import REGISTRY
+
+DEFAULT_ANCHORS = ("USDT", "USDC", "BTC", "ETH")
+
+
+def _edges(instruments: Dict[str, Dict]) -> Dict[str, Dict[str, tuple]]:
+    """coin -> {coin reachable in one trade: (symbol, 'buy' | 'sell')}"""
+    edges = {}
+    for symbol, filters in instruments.items():
+        base, quote = filters.get('base'), filters.get('quote')
+        if not base or not quote or filters.get('status', 'Trading') != 'Trading':
+            continue
+        edges.setdefault(quote, {})[base] = (symbol, 'buy')    # spend quote, receive base
+        edges.setdefault(base, {})[quote] = (symbol, 'sell')   # spend base, receive quote
+    return edges
+
+
+def find_cycles(instruments: Dict[str, Dict], anchors=DEFAULT_ANCHORS) -> List[Dict]:
+    """
+    Every three-leg cycle that starts and ends in one of the anchors, in both directions
+
+    Args:
+        instruments (dict): symbol -> {'base', 'quote', 'status'}, as in the topology cache
+        anchors (tuple): Currencies a cycle may start from
+
+    Returns:
+        list: {'anchor', 'coins': [anchor, first, second], 'legs': [[symbol, side], x3]}
+    """
+    edges = _edges(instruments)
+    cycles = []
+    for anchor in anchors:
+        for first, leg1 in edges.get(anchor, {}).items():
+            for second, leg2 in edges.get(first, {}).items():
+                if second == anchor:
+                    continue
+                leg3 = edges.get(second, {}).get(anchor)
+                if leg3 is not None:
+                    cycles.append({'anchor': anchor, 'coins': [anchor, first, second],
+                                   'legs': [list(leg1), list(leg2), list(leg3)]})
+    return cycles
+
+
+class CycleCalculation:
+    """
+    Evaluates triangles for several anchor currencies and both directions in one pass.
+
+    Each (symbol, side) book gets cumulative spend/receive prefix arrays per book version,
+    shared by every cycle using that leg, whatever its anchor or direction. The arrays are
+    extended lazily, only as deep as the largest amount converted through the leg so far, so
+    a single anchor costs no more than a level walk and further anchors add a few bisects per
+    cycle rather than more depth walks.
+
+    Standalone by default; fast_start.py uses it instead of BybitTriangleCalculation when
+    CYCLE_ANCHORS is set.
+
+    Unlike BybitTriangleCalculation, legs convert properly in both directions: a buy spends
+    quote at the asks, a sell spends base at the bids.
+    """
+    def __init__(self, instruments: Dict[str, Dict], anchors=DEFAULT_ANCHORS, trade_amount=1000,
+                 anchor_amounts: Dict[str, float] = None, min_profit=0.1, max_profit=10, fee_rate=0.001,
+                 store=None, verbose=False, watermarks=True, rate_tolerance=0.005):
+        """
+        Args:
+            instruments (dict): symbol -> {'base', 'quote', 'status'}, e.g. topology['instruments']
+            anchors (tuple): Currencies cycles start and end in
+            trade_amount (float): Starting amount in USDT, converted to each anchor at the current mid price
+            anchor_amounts (dict, optional): Fixed starting amount per anchor instead of the converted trade_amount
+            min_profit (float): Minimum profit percent reported
+            max_profit (float): Maximum profit percent reported
+            fee_rate (float): Taker fee charged on each leg
+            store (OpportunityStore, optional): Record every pass there
+            verbose (bool): Print per-pass statistics
+            watermarks (bool): In incremental passes, keep cycles whose legs only changed below the depth they consumed
+            rate_tolerance (float): Relative move of an anchor's USDT rate after which incremental passes
+                re-convert its starting amount and re-evaluate its cycles
+        """
+        self.anchors = tuple(anchors)
+        self.trade_amount = trade_amount
+        self.anchor_amounts = anchor_amounts or {}
+        self.min_profit = min_profit
+        self.max_profit = max_profit
+        self.fee = 1 - fee_rate
+        self.store = store
+        self.verbose = verbose
+        self.watermarks = watermarks
+        self.rate_tolerance = rate_tolerance
+        self.orderbooks = {}
+        self.prefixes: Dict[tuple, list] = {}
+        self.update_instruments(instruments)
+        self.last_stats = {}
+        self.watermark_hits = 0
+        self.recomputed = 0
+
+        self.metric_pass = REGISTRY.histogram('cycle_calculator_pass_seconds', 'Duration of one multi-anchor pass')
+        self.metric_prefix_builds = REGISTRY.counter('cycle_calculator_prefix_builds_total',
+                                                     'Prefix arrays started for a new book version')
+        self.metric_opportunities = REGISTRY.counter('cycle_calculator_opportunities_total', 'Opportunities found')
+        self.metric_watermark_hits = REGISTRY.counter('cycle_calculator_watermark_hits_total',
+                                                      'Cycles on an updated symbol kept because the change was below their watermark')
+        self.metric_recomputed = REGISTRY.counter('cycle_calculator_recomputed_total',
+                                                  'Cycles re-evaluated in incremental passes')
+
+    def update_instruments(self, instruments: Dict[str, Dict]):
+        """
+        Rebuild the cycles for a new universe
+
+        Not safe to call while a pass is running; the next pass after it is a full one.
+
+        Args:
+            instruments (dict): symbol -> {'base', 'quote', 'status'}
+        """
+        self.edges = _edges(instruments)
+        self.cycles = find_cycles(instruments, self.anchors)
+        # Flat tuples for the hot loop: (anchor, key, symbol1, side1, symbol2, side2, symbol3, side3)
+        self.compiled = [
+            (cycle['anchor'], f"{cycle['anchor']}:{'-'.join(symbol for symbol, _ in cycle['legs'])}",
+             *[value for leg in cycle['legs'] for value in leg])
+            for cycle in self.cycles
+        ]
+        self.by_symbol: Dict[str, List[int]] = {}
+        self.by_anchor: Dict[str, List[int]] = {}
+        for index, cycle in enumerate(self.cycles):
+            for symbol in {symbol for symbol, _ in cycle['legs']}:
+                self.by_symbol.setdefault(symbol, []).append(index)
+            self.by_anchor.setdefault(cycle['anchor'], []).append(index)
+        # Book each anchor's USDT rate is read from -> anchor
+        self.pricing = {self.edges[anchor]['USDT'][0]: anchor for anchor in self.anchors
+                        if 'USDT' in self.edges.get(anchor, {})}
+
+        # Incremental state: last result and per-leg consumed depth of every cycle
+        self.results: Dict[str, Dict] = {}
+        self.depths: List = [None] * len(self.compiled)
+        self.amounts: Dict[str, float] = {}
+        self.rates: Dict[str, float] = {}
+        self.amount_rates: Dict[str, float] = {}  # rate each converted starting amount was computed at
+
+    def _prefix(self, symbol: str, side: str):
+        """
+        [levels, cumulative spend, cumulative receive] for one side of a book
+
+        Cached per book version: books are replaced, never mutated, so an identical levels
+        tuple means the arrays are still valid. They start empty and convert() extends them.
+        """
+        book = self.orderbooks.get(symbol)
+        if book is None:
+            return None
+        levels = book['asks'] if side == 'buy' else book['bids']
+        cached = self.prefixes.get((symbol, side))
+        if cached is not None and cached[0] is levels:
+            return cached
+        if not levels:
+            return None
+
+        prefix = [levels, [0.0], [0.0]]
+        self.prefixes[(symbol, side)] = prefix
+        self.metric_prefix_builds.inc()
+        return prefix
+
+    @staticmethod
+    def convert(prefix, amount: float, side: str):
+        """
+        Amount received for spending amount through one leg
+
+        Returns:
+            tuple: (received, index of the deepest level touched), or (None, levels) if the book is too thin
+        """
+        levels, spend, receive = prefix
+        if spend[-1] <= amount:
+            # Extend the prefix arrays just past amount
+            total_spent, total_received = spend[-1], receive[-1]
+            for price, quantity in levels[len(spend) - 1:]:
+                if side == 'buy':
+                    total_spent += price * quantity
+                    total_received += quantity
+                else:
+                    total_spent += quantity
+                    total_received += price * quantity
+                spend.append(total_spent)
+                receive.append(total_received)
+                if total_spent > amount:
+                    break
+        level = bisect_right(spend, amount) - 1
+        if level >= len(levels):
+            return None, level
+        rest = amount - spend[level]
+        price = levels[level][0]
+        return receive[level] + (rest / price if side == 'buy' else rest * price), level
+
+    def usdt_rate(self, coin: str):
+        """USDT value of one unit of coin from the mid price of its direct USDT pair, None if unknown"""
+        if coin == "USDT":
+            return 1.0
+        leg = self.edges.get(coin, {}).get("USDT")
+        book = self.orderbooks.get(leg[0]) if leg else None
+        if not book or not book.get('bids') or not book.get('asks'):
+            return None
+        mid = (book['bids'][0][0] + book['asks'][0][0]) / 2
+        return mid if leg[1] == 'sell' else 1 / mid
+
+    @staticmethod
+    def first_change(old, new) -> float:
+        """Index of the first level that differs between two versions of a book side, inf if none does"""
+        if old is None or not new:
+            # A side seen for the first time, or one that went away, changes everything
+            return 0
+        if old is new:
+            return float('inf')
+        for index, (old_level, new_level) in enumerate(zip(old, new)):
+            if old_level != new_level:
+                return index
+        return float('inf') if len(old) == len(new) else min(len(old), len(new))
+
+    def _refresh_amounts(self):
+        self.rates = {anchor: self.usdt_rate(anchor) for anchor in self.anchors}
+        self.amounts = {}
+        for anchor in self.anchors:
+            if anchor in self.anchor_amounts:
+                self.amounts[anchor] = self.anchor_amounts[anchor]
+            elif self.rates[anchor]:
+                self.amounts[anchor] = self.trade_amount / self.rates[anchor]
+        self.amount_rates = dict(self.rates)
+
+    def _refresh_rates(self, dirty) -> set:
+        """
+        Follow the USDT rates of anchors whose pricing book is in dirty
+
+        Kept results get their profit_usdt at the new rate. A converted starting amount is
+        only re-based once the rate moved more than rate_tolerance, since that invalidates
+        every cycle of the anchor.
+
+        Returns:
+            set: Anchors whose starting amount changed
+        """
+        rebased = set()
+        for symbol in dirty:
+            anchor = self.pricing.get(symbol)
+            if anchor is None:
+                continue
+            rate = self.rates[anchor] = self.usdt_rate(anchor)
+            if rate is None:
+                continue
+            if anchor not in self.anchor_amounts and abs(rate / self.amount_rates[anchor] - 1) > self.rate_tolerance:
+                self.amounts[anchor] = self.trade_amount / rate
+                self.amount_rates[anchor] = rate
+                rebased.add(anchor)
+                continue
+            # Results may already have been handed out, replace them instead of updating in place
+            for key, result in self.results.items():
+                if result['anchor'] == anchor:
+                    self.results[key] = dict(result, profit_usdt=round(result['profit_amount'] * rate, 6))
+        return rebased
+
+    def _evaluate(self, index: int, prefixes: Dict) -> str:
+        """
+        Evaluate one cycle and update its result and consumed depth
+
+        Returns:
+            str: 'evaluated', 'pruned' or 'skipped'
+        """
+        anchor, key, symbol1, side1, symbol2, side2, symbol3, side3 = self.compiled[index]
+        self.results.pop(key, None)
+        self.depths[index] = None
+        amount = self.amounts.get(anchor)
+        if amount is None:
+            return 'skipped'
+        prefix1 = prefixes.get((symbol1, side1), False)
+        if prefix1 is False:
+            prefix1 = prefixes[(symbol1, side1)] = self._prefix(symbol1, side1)
+        prefix2 = prefixes.get((symbol2, side2), False)
+        if prefix2 is False:
+            prefix2 = prefixes[(symbol2, side2)] = self._prefix(symbol2, side2)
+        prefix3 = prefixes.get((symbol3, side3), False)
+        if prefix3 is False:
+            prefix3 = prefixes[(symbol3, side3)] = self._prefix(symbol3, side3)
+        if prefix1 is None or prefix2 is None or prefix3 is None:
+            return 'skipped'
+
+        # Best-price rate of the whole cycle; depth can only make it worse
+        fee = self.fee
+        best = fee * fee * fee
+        for prefix, side in ((prefix1, side1), (prefix2, side2), (prefix3, side3)):
+            best = best / prefix[0][0][0] if side == 'buy' else best * prefix[0][0][0]
+        if best < 1 + self.min_profit / 100:
+            # Only the best levels were read
+            self.depths[index] = (0, 0, 0)
+            return 'pruned'
+
+        received1, depth1 = self.convert(prefix1, amount, side1)
+        received2 = received3 = None
+        depth2 = depth3 = 0
+        if received1 is not None:
+            received2, depth2 = self.convert(prefix2, received1 * fee, side2)
+        if received2 is not None:
+            received3, depth3 = self.convert(prefix3, received2 * fee, side3)
+        # A thin book records its full length, so levels added at the end invalidate it
+        self.depths[index] = (depth1, depth2, depth3)
+        if received3 is None:
+            return 'skipped'
+
+        final_amount = received3 * fee
+        profit_amount = final_amount - amount
+        profit_percent = profit_amount / amount * 100
+        if self.min_profit <= profit_percent <= self.max_profit:
+            rate = self.rates.get(anchor)
+            self.results[key] = {
+                "anchor": anchor,
+                "pairs": [symbol1, symbol2, symbol3],
+                "sides": [side1, side2, side3],
+                "initial_amount": amount,
+                "final_amount": round(final_amount, 10),
+                "profit_amount": round(profit_amount, 10),
+                "profit_percent": round(profit_percent, 4),
+                "profit_usdt": round(profit_amount * rate, 6) if rate else None,
+                "depth": [depth1, depth2, depth3]
+            }
+        return 'evaluated'
+
+    def calculate_arbitrage(self, external_orderbooks=None, dirty=None) -> Dict:
+        """
+        Evaluate every cycle of every anchor against the current books
+
+        With dirty set, only cycles on those symbols are looked at, and of those only the
+        ones where a leg changed at or above the deepest level its fill consumed (its
+        watermark) are re-evaluated; the rest keep their previous result. A symbol whose book
+        or book side went away counts as changed at level 0, which drops its cycles' results.
+        An updated pricing book refreshes its anchor's USDT rate; once that moved more than
+        rate_tolerance the anchor's starting amount is re-converted and all its cycles are
+        re-evaluated. An anchor's USDT price appearing or disappearing forces a full pass.
+
+        Args:
+            external_orderbooks (dict, optional): Latest orderbooks from the WebSocket client
+            dirty (set, optional): Symbols updated since the previous pass, e.g. from a DirtyCursor
+
+        Returns:
+            dict: "anchor:symbol1-symbol2-symbol3" -> opportunity with profit in anchor units and USDT
+        """
+        pass_start = time.perf_counter()
+        if external_orderbooks:
+            self.orderbooks = external_orderbooks
+        # An anchor gaining or losing its USDT price changes the starting amounts: full pass
+        priced = {anchor for anchor in self.anchors if anchor in self.anchor_amounts or self.usdt_rate(anchor)}
+        incremental = dirty is not None and bool(self.amounts) and priced == set(self.amounts)
+        previous = {}
+        if incremental:
+            # Book sides as evaluated last time, before the new versions replace the prefixes
+            previous = {(symbol, side): self.prefixes[(symbol, side)][0]
+                        for symbol in dirty for side in ('buy', 'sell') if (symbol, side) in self.prefixes}
+
+        prefixes = {}
+        counts = {'evaluated': 0, 'pruned': 0, 'skipped': 0}
+        hits = 0
+        if not incremental:
+            self._refresh_amounts()
+            for index in range(len(self.compiled)):
+                counts[self._evaluate(index, prefixes)] += 1
+        else:
+            rebased = self._refresh_rates(dirty)
+            forced = {index for anchor in rebased for index in self.by_anchor.get(anchor, ())}
+            changed = {}
+            for symbol in dirty:
+                book = self.orderbooks.get(symbol)
+                if book is None:
+                    # Removed: its cycles are re-evaluated below, which drops their results
+                    for side in ('buy', 'sell'):
+                        self.prefixes.pop((symbol, side), None)
+                    changed[symbol] = (0, 0)
+                    continue
+                changed[symbol] = (self.first_change(previous.get((symbol, 'buy')), book.get('asks')),
+                                   self.first_change(previous.get((symbol, 'sell')), book.get('bids')))
+            candidates = sorted({index for symbol in dirty for index in self.by_symbol.get(symbol, ())} | forced)
+            for index in candidates:
+                depths = self.depths[index]
+                if self.watermarks and depths is not None and index not in forced:
+                    _, _, symbol1, side1, symbol2, side2, symbol3, side3 = self.compiled[index]
+                    for symbol, side, depth in ((symbol1, side1, depths[0]), (symbol2, side2, depths[1]),
+                                                (symbol3, side3, depths[2])):
+                        levels = changed.get(symbol)
+                        if levels is not None and levels[0 if side == 'buy' else 1] <= depth:
+                            break
+                    else:
+                        hits += 1
+                        continue
+                counts[self._evaluate(index, prefixes)] += 1
+            recomputed = sum(counts.values())
+            self.watermark_hits += hits
+            self.recomputed += recomputed
+            self.metric_watermark_hits.inc(hits)
+            self.metric_recomputed.inc(recomputed)
+
+        results = dict(self.results)
+        self.metric_pass.observe(time.perf_counter() - pass_start)
+        self.metric_opportunities.inc(len(results))
+        self.last_stats = {
+            "cycles": len(self.compiled),
+            "incremental": incremental,
+            "evaluated": counts['evaluated'],
+            "skipped": counts['skipped'],
+            "pruned": counts['pruned'],
+            "legs": len(prefixes),
+            "pass_ms": round((time.perf_counter() - pass_start) * 1000, 3)
+        }
+        if incremental:
+            self.last_stats.update({
+                "rebased": sorted(rebased),
+                "watermark_hits": hits,
+                "recomputed": recomputed,
+                "hit_rate": round(hits / (hits + recomputed), 4) if hits + recomputed else None
+            })
+        if self.verbose:
+            print(f"Evaluated {counts['evaluated']}/{len(self.compiled)} cycles over {len(self.anchors)} anchors "
+                  f"({counts['pruned']} pruned, {counts['skipped']} skipped, {hits} kept by watermark), "
+                  f"{len(results)} opportunities")
+        if self.store is not None:
+            self.store.record_pass(results, {"trade_amount": self.trade_amount, "triangles_processed": len(self.compiled),
+                                             "triangles_skipped": counts['skipped'],
+                                             "triangles_pruned": counts['pruned']})
+        return results
+
+    def watermark_stats(self) -> Dict:
+        """Cumulative watermark hit rate over all incremental passes"""
+        hits, recomputed = self.watermark_hits, self.recomputed
+        return {
+            "watermark_hits": hits,
+            "recomputed": recomputed,
+            "hit_rate": round(hits / (hits + recomputed), 4) if hits + recomputed else None
+        }
+
+
+if __name__ == "__main__":
+    import json
+    from topology_cache import TopologyCache
+
+    # Cycles of the cached universe, per anchor and direction
+    topology = TopologyCache().load()
+    if topology is None:
+        raise SystemExit("No topology cache, run fast_start.py once first")
+    cycles = find_cycles(topology['instruments'])
+    counts = {anchor: sum(1 for cycle in cycles if cycle['anchor'] == anchor) for anchor in DEFAULT_ANCHORS}
+    print(json.dumps({'cycles': len(cycles), 'per_anchor': counts}, indent=2))
@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Dict, Iterable
+
+from metrics import REGISTRY
+
+
+class DepthTierManager:
+    """
+    Chooses each symbol's subscription depth from its role in the scanner.
+
+    - screening (orderbook.1): enough for the top-of-book upper bound that prunes triangles
+    - candidate (orderbook.50): legs of triangles whose upper bound comes within
+      promote_margin of min_profit, so the depth walk sees real liquidity
+    - trading (orderbook.200): pinned legs, e.g. triangles being executed
+
+    Candidates are demoted back to screening after hold_seconds without qualifying,
+    which keeps a triangle hovering around the threshold from flapping between tiers.
+    """
+    def __init__(self, client, calculator, screening_depth: int = 1, candidate_depth: int = 50,
+                 trading_depth: int = 200, promote_margin: float = 0.5, hold_seconds: float = 30.0,
+                 interval: float = 1.0):
+        """
+        Args:
+            client (MultiSocketClient): Client whose subscriptions are re-tiered
+            calculator (BybitTriangleCalculation): Triangles, min_profit and the upper bound (live with top_of_book)
+            screening_depth (int): Depth for symbols only used as a price reference
+            candidate_depth (int): Depth for legs of candidate triangles
+            trading_depth (int): Depth for pinned legs
+            promote_margin (float): Promote when the upper bound is at least min_profit - promote_margin (percent)
+            hold_seconds (float): Time a candidate leg stays promoted after it last qualified
+            interval (float): Seconds between evaluations in the background thread
+        """
+        self.client = client
+        self.calculator = calculator
+        self.screening_depth = screening_depth
+        self.candidate_depth = candidate_depth
+        self.trading_depth = trading_depth
+        self.promote_margin = promote_margin
+        self.hold_seconds = hold_seconds
+        self.interval = interval
+        self.pinned = set()
+        self.candidates: Dict[str, float] = {}  # symbol -> last time it qualified
+        self.running = False
+
+        self.metric_promotions = REGISTRY.counter('depth_tier_promotions_total', 'Symbols moved to a deeper stream')
+        self.metric_demotions = REGISTRY.counter('depth_tier_demotions_total', 'Symbols moved to a shallower stream')
+
+    def initial_depths(self, symbols: Iterable[str]) -> Dict[str, int]:
+        """Depths to construct the client with: everything screening, pinned legs deep"""
+        return {symbol: self.trading_depth if symbol in self.pinned else self.screening_depth for symbol in symbols}
+
+    def pin(self, symbols: Iterable[str]):
+        """Keep symbols on the trading depth until unpinned (e.g. while their triangle is executed)"""
+        self.pinned.update(symbols)
+        self.evaluate()
+
+    def unpin(self, symbols: Iterable[str]):
+        self.pinned.difference_update(symbols)
+        self.evaluate()
+
+    def _desired_depth(self, symbol: str, now: float) -> int:
+        if symbol in self.pinned:
+            return self.trading_depth
+        last_seen = self.candidates.get(symbol)
+        if last_seen is not None and now - last_seen <= self.hold_seconds:
+            return self.candidate_depth
+        return self.screening_depth
+
+    def evaluate(self, now: float = None) -> Dict[str, int]:
+        """
+        Re-tier every symbol once and apply the changes to the client
+
+        Returns:
+            dict: symbol -> new depth for the symbols that changed
+        """
+        now = time.monotonic() if now is None else now
+        threshold = self.calculator.min_profit - self.promote_margin
+        for triangle in list(self.calculator.triangles):
+            legs = (triangle['pair1'], triangle['pair2'], triangle['pair3'])
+            upper_bound = self.calculator._upper_bound_percent(*legs, live=True)
+            if upper_bound is not None and upper_bound >= threshold:
+                for symbol in legs:
+                    self.candidates[symbol] = now
+
+        changes = {}
+        for symbol in list(self.client.all_symbols):
+            depth = self._desired_depth(symbol, now)
+            current = self.client.depths.get(symbol, self.client.default_depth)
+            if depth != current:
+                changes[symbol] = depth
+                (self.metric_promotions if depth > current else self.metric_demotions).inc()
+
+        for symbol, last_seen in list(self.candidates.items()):
+            if now - last_seen > self.hold_seconds:
+                del self.candidates[symbol]
+
+        if changes:
+            self.client.set_depths(changes)
+        return changes
+
+    def _evaluate_task(self):
+        while self.running:
+            try:
+                self.evaluate()
+            except Exception as e:
+                print(f"Error evaluating depth tiers: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._evaluate_task)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,180 @@
+import time
+
+STARTED_AT = time.time()
+STARTED_NS = time.monotonic_ns()
+
+import json
+import os
+import sys
+
+from topology_cache import TopologyCache
+
+
+def wait_for_first_subscription(client, timeout: float = 10.0):
+    """Block until the client has sent its first subscribe request; returns its monotonic_ns or None"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        sent_ns = client.first_subscription_ns()
+        if sent_ns is not None:
+            return sent_ns
+        time.sleep(0.001)
+    return None
+
+
+def main():
+    """
+    Scanner start-up that subscribes first and does everything else afterwards.
+
+    Order: cached topology -> sockets -> first subscription -> calculator and background
+    validation of the cache against the exchange. pybit, requests and triangle discovery
+    are only imported when the cache is missing or being validated.
+
+    Environment:
+        TOPOLOGY_CACHE: Cache file (default topology_cache.json)
+        FAST_START_SIMULATOR: 1 to stream from the local feed simulator instead of Bybit
+        FAST_START_EXIT_AFTER_SUBSCRIBE: 1 to print the start-up timings and exit
+        DEPTH_TIERS: 1 to start every symbol on orderbook.1 and let DepthTierManager promote candidates
+        OPPORTUNITY_DB: SQLite file to record every pass in, instead of rewriting arbitrage_res_all.json
+        REBALANCE_INTERVAL: Seconds between LoadBalancer runs moving hot symbols off busy sockets (off if unset)
+        CYCLE_ANCHORS: Comma-separated anchors, e.g. USDT,USDC,BTC,ETH, to evaluate every cycle of those
+            anchors with CycleCalculation instead of the cached triangles (DEPTH_TIERS is ignored then)
+        TRADING_AMOUNT_USDT: Starting amount of every cycle in USDT, converted to each anchor (default 1000)
+        UNIVERSE_REFRESH_INTERVAL: Seconds between UniverseManager refreshes re-subscribing to the current
+            triangle universe on the running sockets (off if unset, and with FAST_START_SIMULATOR)
+        UNIVERSE_MIN_LIQUIDITY_USDT: Drop pairs whose orderbook is worth less than this on each refresh
+        RUNTIME_AFFINITY, RUNTIME_GC_THRESHOLDS, RUNTIME_GC_FREEZE: see runtime_config.RuntimeConfig.from_env
+    """
+    from runtime_config import RUNTIME
+    RUNTIME.tune_gc()
+    cache = TopologyCache(os.getenv('TOPOLOGY_CACHE', 'topology_cache.json'))
+    simulate = os.getenv('FAST_START_SIMULATOR') == '1'
+    depth_tiers = os.getenv('DEPTH_TIERS') == '1'
+
+    pair_list = None
+    topology = cache.load()
+    cache_hit = topology is not None
+    if topology is None:
+        from triangle_no_pandas import BybitTradingPairList
+        pair_list = BybitTradingPairList(api_key=None, api_secret=None)
+        topology = cache.load_or_build(pair_list)
+        if topology is None:
+            print("No cached topology and the exchange returned no instruments")
+            return
+    topology_ns = time.monotonic_ns()
+
+    ws_app_factory = None
+    if simulate:
+        from feed_simulator import LocalFeedSimulator
+        simulator = LocalFeedSimulator(topology['symbols'])
+        simulator.start()
+        ws_app_factory = simulator.app_factory()
+
+    from test_triple_socket import MultiSocketClient
+    depths = {symbol: 1 for symbol in topology['symbols']} if depth_tiers else None
+    client = MultiSocketClient(symbols=topology['symbols'], ws_app_factory=ws_app_factory, depths=depths)
+    client.start()
+    subscribed_ns = wait_for_first_subscription(client)
+
+    timings = {
+        'cache_hit': cache_hit,
+        'symbols': len(topology['symbols']),
+        'triangles': len(topology['triangles']),
+        'topology_ms': round((topology_ns - STARTED_NS) / 1e6, 2),
+        'first_subscription_ms': round((subscribed_ns - STARTED_NS) / 1e6, 2) if subscribed_ns else None,
+        'first_subscription_at': STARTED_AT + (subscribed_ns - STARTED_NS) / 1e9 if subscribed_ns else None
+    }
+    # One write on stderr: socket threads print on stdout and could split the line
+    sys.stderr.write(f"STARTUP {json.dumps(timings)}\n")
+    sys.stderr.flush()
+    if os.getenv('FAST_START_EXIT_AFTER_SUBSCRIBE') == '1':
+        client.stop()
+        return
+
+    from triangle_no_pandas import BybitTriangleCalculation, BybitTradingPairList
+    store = None
+    if os.getenv('OPPORTUNITY_DB'):
+        from opportunity_store import OpportunityStore
+        store = OpportunityStore(os.getenv('OPPORTUNITY_DB'))
+        store.start()
+    cycle_anchors = [anchor.strip() for anchor in os.getenv('CYCLE_ANCHORS', '').split(',') if anchor.strip()]
+    if cycle_anchors:
+        from cycle_calculator import CycleCalculation
+        calculator = CycleCalculation(topology['instruments'], anchors=cycle_anchors, store=store,
+                                      trade_amount=float(os.getenv('TRADING_AMOUNT_USDT', 1000)))
+        print(f"Evaluating {len(calculator.compiled)} cycles over anchors {', '.join(cycle_anchors)}")
+    else:
+        calculator = BybitTriangleCalculation(triangles=list(topology['triangles']), top_of_book=client.top_of_book,
+                                              verbose=False, store=store)
+    if depth_tiers and cycle_anchors:
+        print("DEPTH_TIERS needs the triangle calculator, ignored with CYCLE_ANCHORS")
+    elif depth_tiers:
+        from depth_tiers import DepthTierManager
+        DepthTierManager(client, calculator).start()
+    if os.getenv('REBALANCE_INTERVAL'):
+        from symbol_placement import LoadBalancer
+        LoadBalancer(client, interval=float(os.getenv('REBALANCE_INTERVAL'))).start()
+    universe = None
+    if os.getenv('UNIVERSE_REFRESH_INTERVAL') and not simulate:
+        from universe import UniverseManager
+        pair_list = pair_list or BybitTradingPairList(api_key=None, api_secret=None)
+        liquidity_checker = None
+        if os.getenv('UNIVERSE_MIN_LIQUIDITY_USDT'):
+            from pair_socket_downloadable import BybitSpotOrderbookChecker
+            liquidity_checker = BybitSpotOrderbookChecker()
+        # The cycle calculator follows instrument changes through on_topology_change, not triangles
+        universe = UniverseManager(client, None if cycle_anchors else calculator, pair_list,
+                                   liquidity_checker=liquidity_checker,
+                                   min_liquidity_usdt=float(os.getenv('UNIVERSE_MIN_LIQUIDITY_USDT', 0)),
+                                   refresh_interval=float(os.getenv('UNIVERSE_REFRESH_INTERVAL')))
+        universe.start()
+
+    pending_instruments = []
+
+    def on_topology_change(fresh):
+        if universe:
+            # Same universe the periodic refresh would build, liquidity filter included
+            universe.refresh()
+        else:
+            client.update_universe(fresh['symbols'])
+        if cycle_anchors:
+            # Rebuilt between passes by the calculator loop
+            pending_instruments.append(fresh['instruments'])
+        elif not universe:
+            calculator.update_triangles(fresh['triangles'])
+
+    if cache_hit and not simulate:
+        cache.validate_in_background(pair_list or BybitTradingPairList(api_key=None, api_secret=None),
+                                     topology, on_change=on_topology_change)
+
+    cursor = client.register_consumer('calculator')
+    # Pinned after the sockets started, so only this loop (and threads it starts) uses the calculator CPUs
+    RUNTIME.pin('calculator')
+    warmed_up = False
+    try:
+        while True:
+            dirty = cursor.wait(timeout=1.0)
+            if pending_instruments:
+                calculator.update_instruments(pending_instruments.pop())
+                pending_instruments.clear()
+            if dirty:
+                if cycle_anchors:
+                    # Only cycles on the updated symbols are re-evaluated
+                    calculator.calculate_arbitrage(client.get_orderbooks(), dirty=dirty)
+                else:
+                    calculator.calculate_arbitrage(client.get_orderbooks())
+                if not warmed_up:
+                    # Topology, books and calculator state exist now: freeze them out of the GC
+                    RUNTIME.warmed_up()
+                    print(f"RUNTIME {json.dumps(RUNTIME.report())}")
+                    warmed_up = True
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+        if universe:
+            universe.stop()
+        client.stop()
+        if store:
+            store.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import heapq
+import json
+import queue
+import random
+import threading
+import time
+from typing import Dict, List
+
+
+class SimulatedWebSocketApp:
+    """
+    In-process stand-in for websocket.WebSocketApp connected to a LocalFeedSimulator.
+
+    Same constructor, send/run_forever/close surface as the real class, so any client
+    that builds its connections through an app factory can run against the simulator.
+    Messages are delivered in order after the connection's delay plus random jitter.
+    """
+    def __init__(self, simulator: 'LocalFeedSimulator', url: str, on_message=None, on_open=None,
+                 on_error=None, on_close=None, delay_ms: float = 0.0, jitter_ms: float = 0.0,
+                 spike_probability: float = 0.0, spike_ms: float = 0.0):
+        self.simulator = simulator
+        self.url = url
+        self.on_message = on_message
+        self.on_open = on_open
+        self.on_error = on_error
+        self.on_close = on_close
+        self.delay_ns = int(delay_ms * 1e6)
+        self.jitter_ns = int(jitter_ms * 1e6)
+        self.spike_probability = spike_probability
+        self.spike_ns = int(spike_ms * 1e6)
+        self.rng = random.Random()
+        self.inbox = queue.Queue()
+        self.topics = set()
+        self.last_deliver_ns = 0
+        self.open = False
+        self.messages_delivered = 0
+        self.bytes_delivered = 0
+
+    def _deliver_at(self, published_ns: int) -> int:
+        latency = self.delay_ns + (self.rng.random() * self.jitter_ns if self.jitter_ns else 0)
+        if self.spike_probability and self.rng.random() < self.spike_probability:
+            latency += self.rng.random() * self.spike_ns
+        # One TCP stream: a late message holds back everything behind it
+        self.last_deliver_ns = max(self.last_deliver_ns, published_ns + int(latency))
+        return self.last_deliver_ns
+
+    def push(self, message: str, published_ns: int):
+        self.inbox.put((self._deliver_at(published_ns), message))
+
+    def send(self, payload: str):
+        self.simulator.handle_request(self, json.loads(payload))
+
+    def run_forever(self, **kwargs):
+        self.open = True
+        self.simulator.connect(self)
+        if self.on_open:
+            self.on_open(self)
+        while self.open:
+            try:
+                deliver_at, message = self.inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+            wait_ns = deliver_at - time.monotonic_ns()
+            if wait_ns > 0:
+                time.sleep(wait_ns / 1e9)
+            self.messages_delivered += 1
+            self.bytes_delivered += len(message)
+            if self.on_message:
+                self.on_message(self, message)
+        self.open = False
+        self.simulator.disconnect(self)
+        if self.on_close:
+            self.on_close(self, 1000, "closed")
+
+    def close(self):
+        self.open = False
+        self.inbox.put((0, None))
+
+
+class LocalFeedSimulator:
+    """
+    Local Bybit spot orderbook feed for benchmarks and failure drills.
+
+    Every update gets one per-symbol update id 'u' and is fanned out to all connections
+    subscribed to it, so redundant connections see the same ids at different times.
+    Publish times are kept per (symbol, u) so end-to-end staleness can be measured.
+    """
+    DEPTHS = (1, 50, 200)
+
+    def __init__(self, symbols: List[str], rate_per_symbol: float = 10.0, rates: Dict[str, float] = None,
+                 max_topics_per_connection: int = None, max_args_per_request: int = 10, seed: int = 7):
+        """
+        Args:
+            symbols (list): Symbols the simulated exchange lists
+            rate_per_symbol (float): Updates per second for symbols without an explicit rate
+            rates (dict, optional): Per-symbol update rates (hot pairs)
+            max_topics_per_connection (int, optional): Reject subscriptions beyond this many topics
+            max_args_per_request (int): Reject subscribe requests with more args than this
+        """
+        self.symbols = list(symbols)
+        self.rates = {symbol: (rates or {}).get(symbol, rate_per_symbol) for symbol in self.symbols}
+        self.max_topics_per_connection = max_topics_per_connection
+        self.max_args_per_request = max_args_per_request
+        self.rng = random.Random(seed)
+        self.connections: List[SimulatedWebSocketApp] = []
+        self.lock = threading.Lock()
+        self.update_ids = {symbol: 0 for symbol in self.symbols}
+        self.mids = {symbol: 1 + self.rng.random() * 100 for symbol in self.symbols}
+        self.published_ns: Dict[tuple, int] = {}
+        self.track_publish_times = False
+        self.messages_published = 0
+        self.running = False
+
+    def app_factory(self, delay_ms: float = 0.0, jitter_ms: float = 0.0,
+                    spike_probability: float = 0.0, spike_ms: float = 0.0):
+        """Callable with the websocket.WebSocketApp signature, bound to a delay profile"""
+        def factory(url, **callbacks):
+            return SimulatedWebSocketApp(self, url, delay_ms=delay_ms, jitter_ms=jitter_ms,
+                                         spike_probability=spike_probability, spike_ms=spike_ms, **callbacks)
+        return factory
+
+    def connect(self, connection: SimulatedWebSocketApp):
+        with self.lock:
+            self.connections.append(connection)
+
+    def disconnect(self, connection: SimulatedWebSocketApp):
+        with self.lock:
+            if connection in self.connections:
+                self.connections.remove(connection)
+
+    def drop(self, connection: SimulatedWebSocketApp):
+        """Simulate the exchange closing a connection"""
+        connection.close()
+
+    def _levels(self, symbol: str, depth: int):
+        mid = self.mids[symbol]
+        tick = mid * 0.0001
+        bids = [[f"{mid - tick * (i + 1):.6f}", f"{self.rng.random() * 10:.4f}"] for i in range(depth)]
+        asks = [[f"{mid + tick * (i + 1):.6f}", f"{self.rng.random() * 10:.4f}"] for i in range(depth)]
+        return bids, asks
+
+    def _message(self, topic: str, symbol: str, msg_type: str, bids, asks, u: int) -> str:
+        return json.dumps({
+            "topic": topic,
+            "ts": int(time.time() * 1000),
+            "type": msg_type,
+            "data": {"s": symbol, "b": bids, "a": asks, "u": u, "seq": u},
+            "cts": int(time.time() * 1000)
+        }, separators=(',', ':'))
+
+    def handle_request(self, connection: SimulatedWebSocketApp, request: Dict):
+        op = request.get('op')
+        args = request.get('args', [])
+        now_ns = time.monotonic_ns()
+
+        def respond(success: bool, ret_msg: str = ""):
+            connection.push(json.dumps({"success": success, "ret_msg": ret_msg, "op": op, "conn_id": "sim"},
+                                       separators=(',', ':')), now_ns)
+
+        if op not in ('subscribe', 'unsubscribe'):
+            respond(False, f"unsupported op {op}")
+            return
+        if len(args) > self.max_args_per_request:
+            respond(False, f"args size >{self.max_args_per_request}")
+            return
+
+        with self.lock:
+            if op == 'unsubscribe':
+                connection.topics.difference_update(args)
+                respond(True)
+                return
+
+            new_topics = [topic for topic in args if topic not in connection.topics]
+            if (self.max_topics_per_connection is not None
+                    and len(connection.topics) + len(new_topics) > self.max_topics_per_connection):
+                respond(False, "topic limit exceeded")
+                return
+            for topic in new_topics:
+                _, depth, symbol = topic.split('.')
+                if symbol not in self.update_ids or int(depth) not in self.DEPTHS:
+                    respond(False, f"invalid topic {topic}")
+                    return
+            connection.topics.update(new_topics)
+            respond(True)
+
+            for topic in new_topics:
+                _, depth, symbol = topic.split('.')
+                bids, asks = self._levels(symbol, int(depth))
+                connection.push(self._message(topic, symbol, "snapshot", bids, asks, self.update_ids[symbol]), now_ns)
+
+    def _publish(self, symbol: str):
+        with self.lock:
+            self.update_ids[symbol] += 1
+            u = self.update_ids[symbol]
+            self.mids[symbol] *= 1 + (self.rng.random() - 0.5) * 0.0002
+            level = min(int(self.rng.expovariate(0.3)), 199)
+            subscribers = [
+                (connection, topic) for connection in self.connections
+                for topic in (f"orderbook.1.{symbol}", f"orderbook.50.{symbol}", f"orderbook.200.{symbol}")
+                if topic in connection.topics
+            ]
+
+        published_ns = time.monotonic_ns()
+        if self.track_publish_times:
+            self.published_ns[(symbol, u)] = published_ns
+        messages = {}
+        for connection, topic in subscribers:
+            depth = int(topic.split('.')[1])
+            if topic not in messages:
+                if depth == 1:
+                    # Level-1 streams push a fresh snapshot only when the top of book changes
+                    if level > 0:
+                        messages[topic] = None
+                        continue
+                    bids, asks = self._levels(symbol, 1)
+                    messages[topic] = self._message(topic, symbol, "snapshot", bids, asks, u)
+                elif level < depth:
+                    mid, tick = self.mids[symbol], self.mids[symbol] * 0.0001
+                    side = [[f"{mid - tick * (level + 1):.6f}", f"{self.rng.random() * 10:.4f}"]]
+                    messages[topic] = self._message(topic, symbol, "delta", side, side[:0], u)
+                else:
+                    messages[topic] = None
+            if messages[topic] is not None:
+                connection.push(messages[topic], published_ns)
+        self.messages_published += 1
+
+    def _publisher_task(self):
+        # Schedule each symbol independently at its own rate
+        schedule = [(time.monotonic() + self.rng.random() / rate, symbol)
+                    for symbol, rate in self.rates.items() if rate > 0]
+        heapq.heapify(schedule)
+        while self.running and schedule:
+            due, symbol = schedule[0]
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(min(wait, 0.05))
+                continue
+            heapq.heapreplace(schedule, (due + 1 / self.rates[symbol], symbol))
+            self._publish(symbol)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._publisher_task)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.close()
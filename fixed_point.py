@@ -0,0 +1,253 @@
+from decimal import Decimal
+from typing import Dict, List, Tuple
+
+
+def _plain(text: str) -> str:
+    # str(float) can produce exponents ('1e-05'); expand them once, at the boundary
+    if 'e' in text or 'E' in text:
+        return format(Decimal(text), 'f')
+    return text
+
+
+def decimals_of(step: str) -> int:
+    """Number of decimal places in a step string ('0.0001' -> 4, '1' -> 0)"""
+    _, _, fraction = _plain(step).partition('.')
+    return len(fraction.rstrip('0'))
+
+
+_POW10 = [10 ** i for i in range(40)]
+
+
+def parse_scaled(text: str, decimals: int, exact: bool = True) -> int:
+    """
+    Parse a decimal string straight to an integer count of 10**-decimals units
+
+    Args:
+        text (str): Decimal string as sent by the exchange (e.g., '0.000123')
+        decimals (int): Scale of the result
+        exact (bool): Raise ValueError if text has non-zero digits beyond the scale, otherwise truncate
+
+    Returns:
+        int: Scaled value (e.g., parse_scaled('0.000123', 8) == 12300)
+    """
+    if text.__class__ is not str:
+        text = str(text)
+    # Fast path: exchange strings never carry more digits than the tick/lot size
+    dot = text.find('.')
+    missing = decimals - (len(text) - dot - 1) if dot >= 0 else decimals
+    if missing >= 0:
+        try:
+            return int(text.replace('.', '', 1) if dot >= 0 else text) * _POW10[missing]
+        except ValueError:
+            pass  # exponent notation, handled below
+
+    text = _plain(text)
+    whole, _, fraction = text.partition('.')
+    if len(fraction) > decimals:
+        if exact and fraction[decimals:].strip('0'):
+            raise ValueError(f"{text} has more than {decimals} decimals")
+        fraction = fraction[:decimals]
+    return int((whole or '0') + fraction.ljust(decimals, '0'))
+
+
+def format_scaled(value: int, decimals: int) -> str:
+    """Inverse of parse_scaled, without exponent notation or float rounding"""
+    if decimals == 0:
+        return str(value)
+    sign = '-' if value < 0 else ''
+    digits = str(abs(value)).rjust(decimals + 1, '0')
+    return f"{sign}{digits[:-decimals]}.{digits[-decimals:]}"
+
+
+def floor_decimal_string(text: str, decimals: int) -> str:
+    """Round a decimal string down to a number of decimal places, exactly"""
+    return format_scaled(parse_scaled(text, decimals, exact=False), decimals)
+
+
+class InstrumentScale:
+    """
+    Integer representation of one instrument's prices and quantities.
+
+    Prices are counted in units of 10**-price_decimals, quantities in 10**-qty_decimals
+    and quote amounts in 10**-quote_decimals. A price times a quantity is a notional in
+    10**-(price_decimals + qty_decimals) units, so a book walk never leaves integers.
+    """
+    __slots__ = ('symbol', 'price_decimals', 'qty_decimals', 'quote_decimals', 'tick', 'lot', 'quote_step',
+                 'min_qty', 'min_amount')
+
+    def __init__(self, symbol: str, tick_size: str = '0.01', lot_size: str = '0.0001', quote_precision: str = '0.01',
+                 min_qty: str = '0', min_amount: str = '0'):
+        self.symbol = symbol
+        self.price_decimals = decimals_of(tick_size)
+        self.qty_decimals = decimals_of(lot_size)
+        self.quote_decimals = decimals_of(quote_precision)
+        self.tick = parse_scaled(tick_size, self.price_decimals)
+        self.lot = parse_scaled(lot_size, self.qty_decimals)
+        self.quote_step = parse_scaled(quote_precision, self.quote_decimals)
+        self.min_qty = parse_scaled(min_qty or '0', self.qty_decimals, exact=False)
+        self.min_amount = parse_scaled(min_amount or '0', self.quote_decimals, exact=False)
+
+    @classmethod
+    def from_filters(cls, symbol: str, filters: Dict) -> 'InstrumentScale':
+        """From the instrument filters stored in the topology cache"""
+        return cls(symbol, filters.get('tick_size') or '0.01', filters.get('lot_size') or '0.0001',
+                   filters.get('quote_precision') or '0.01', filters.get('min_qty'), filters.get('min_amount'))
+
+    @classmethod
+    def from_instrument(cls, instrument: Dict) -> 'InstrumentScale':
+        """From a raw v5 instruments-info entry"""
+        lot = instrument.get('lotSizeFilter', {})
+        return cls(instrument['symbol'], instrument.get('priceFilter', {}).get('tickSize') or '0.01',
+                   lot.get('basePrecision') or lot.get('qtyStep') or lot.get('minOrderQty') or '0.0001',
+                   lot.get('quotePrecision') or '0.01', lot.get('minOrderQty'), lot.get('minOrderAmt'))
+
+    def price(self, text: str) -> int:
+        return parse_scaled(text, self.price_decimals)
+
+    def qty(self, text: str) -> int:
+        return parse_scaled(text, self.qty_decimals)
+
+    def notional(self, text: str) -> int:
+        """Quote amount in price * qty units, the scale fill walks work in"""
+        return parse_scaled(text, self.price_decimals + self.qty_decimals, exact=False)
+
+    def format_price(self, units: int) -> str:
+        return format_scaled(units, self.price_decimals)
+
+    def format_qty(self, units: int) -> str:
+        return format_scaled(units, self.qty_decimals)
+
+    def format_notional(self, units: int) -> str:
+        """Notional rounded down to the quote precision"""
+        shift = self.price_decimals + self.qty_decimals - self.quote_decimals
+        quote = units // 10 ** shift if shift >= 0 else units * 10 ** -shift
+        return format_scaled(quote - quote % self.quote_step, self.quote_decimals)
+
+    def order_qty(self, quantity, quote_sized: bool = False) -> str:
+        """
+        Order size string, rounded down to the lot size (or quote precision for quote-sized market buys)
+
+        Raises:
+            ValueError: Size is below the instrument minimum after rounding
+        """
+        if quote_sized:
+            units = parse_scaled(str(quantity), self.quote_decimals, exact=False)
+            units -= units % self.quote_step
+            if units < self.min_amount:
+                raise ValueError(f"{self.symbol} order value {quantity} below minimum "
+                                 f"{format_scaled(self.min_amount, self.quote_decimals)}")
+            return format_scaled(units, self.quote_decimals)
+
+        units = parse_scaled(str(quantity), self.qty_decimals, exact=False)
+        units -= units % self.lot
+        if units < self.min_qty or units <= 0:
+            raise ValueError(f"{self.symbol} order quantity {quantity} below minimum {self.format_qty(self.min_qty)}")
+        return self.format_qty(units)
+
+
+def scales_from_topology(topology: Dict) -> Dict[str, InstrumentScale]:
+    """InstrumentScale for every symbol in a TopologyCache topology"""
+    return {symbol: InstrumentScale.from_filters(symbol, filters)
+            for symbol, filters in topology.get('instruments', {}).items()}
+
+
+def base_for_notional(levels: List[Tuple[int, int]], budget: int) -> Tuple[int, int]:
+    """
+    Walk integer levels spending a notional budget (a market buy sized in quote coin)
+
+    Args:
+        levels (list): (price units, qty units) best first
+        budget (int): Notional in price * qty units
+
+    Returns:
+        tuple: (base qty units filled, notional units spent)
+    """
+    filled = spent = 0
+    for price, qty in levels:
+        cost = price * qty
+        if budget - spent >= cost:
+            filled += qty
+            spent += cost
+        else:
+            partial = (budget - spent) // price
+            filled += partial
+            spent += partial * price
+            break
+    return filled, spent
+
+
+def notional_for_base(levels: List[Tuple[int, int]], quantity: int) -> Tuple[int, int]:
+    """
+    Walk integer levels selling (or buying) a base quantity
+
+    Returns:
+        tuple: (base qty units filled, notional units received/paid)
+    """
+    filled = notional = 0
+    for price, qty in levels:
+        take = min(qty, quantity - filled)
+        filled += take
+        notional += take * price
+        if filled == quantity:
+            break
+    return filled, notional
+
+
+class FixedPointBook:
+    """
+    One side-pair orderbook keyed by integer price units.
+
+    Exchange strings are parsed once into ints, so equal prices always hit the same key;
+    strings are only produced again by to_strings() at the output boundary. Without an
+    InstrumentScale the scale is taken from the data and widened if a finer price arrives.
+
+    Used by BybitGetOrderBook, whose output is strings. The live SymbolWebSocket books stay
+    float-keyed (see SymbolWebSocket._update_orderbook).
+    """
+    def __init__(self, scale: InstrumentScale = None):
+        self.price_decimals = scale.price_decimals if scale else 0
+        self.qty_decimals = scale.qty_decimals if scale else 0
+        self.bids: Dict[int, int] = {}
+        self.asks: Dict[int, int] = {}
+
+    def _rescale(self, price_decimals: int, qty_decimals: int):
+        price_factor = 10 ** (price_decimals - self.price_decimals)
+        qty_factor = 10 ** (qty_decimals - self.qty_decimals)
+        self.bids = {price * price_factor: qty * qty_factor for price, qty in self.bids.items()}
+        self.asks = {price * price_factor: qty * qty_factor for price, qty in self.asks.items()}
+        self.price_decimals, self.qty_decimals = price_decimals, qty_decimals
+
+    def _apply_side(self, side_name: str, levels: List):
+        side = getattr(self, side_name)
+        for price_text, qty_text in levels:
+            try:
+                price = parse_scaled(price_text, self.price_decimals)
+                qty = parse_scaled(qty_text, self.qty_decimals)
+            except ValueError:
+                self._rescale(max(self.price_decimals, decimals_of(price_text)),
+                              max(self.qty_decimals, decimals_of(qty_text)))
+                side = getattr(self, side_name)
+                price = parse_scaled(price_text, self.price_decimals)
+                qty = parse_scaled(qty_text, self.qty_decimals)
+            if qty:
+                side[price] = qty
+            else:
+                side.pop(price, None)
+
+    def apply(self, bids: List, asks: List, snapshot: bool = False):
+        """Apply exchange [price, qty] string levels; a zero quantity removes the level"""
+        if snapshot:
+            self.bids, self.asks = {}, {}
+        self._apply_side('bids', bids)
+        self._apply_side('asks', asks)
+
+    def levels(self, depth: int = None) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        """(bids, asks) as sorted integer (price, qty) lists, best first"""
+        bids = sorted(self.bids.items(), reverse=True)
+        asks = sorted(self.asks.items())
+        return (bids[:depth], asks[:depth]) if depth else (bids, asks)
+
+    def to_strings(self, depth: int = None) -> Tuple[List[List[str]], List[List[str]]]:
+        bids, asks = self.levels(depth)
+        return ([[format_scaled(price, self.price_decimals), format_scaled(qty, self.qty_decimals)] for price, qty in bids],
+                [[format_scaled(price, self.price_decimals), format_scaled(qty, self.qty_decimals)] for price, qty in asks])
@@ -4,15 +4,22 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 from walllet_connect import WalletManager, TriangleWalletExecutor
+from runtime_config import RUNTIME
 
 async def monitor_and_execute_trades():
     last_modified = None
+    last_pass_id = None
     wallet_manager = None
     
     try:
         # Load environment variables
         load_dotenv()
         TRADING_AMOUNT_USDT = float(os.getenv('TRADING_AMOUNT_USDT', 1000))
+        OPPORTUNITY_DB = os.getenv('OPPORTUNITY_DB')
+        store = None
+        if OPPORTUNITY_DB:
+            from opportunity_store import OpportunityStore
+            store = OpportunityStore(OPPORTUNITY_DB)
         
         # Initialize wallet manager
         wallet_manager = WalletManager()
@@ -20,6 +27,28 @@ async def monitor_and_execute_trades():
         
         while True:
             try:
+                if store:
+                    # Best opportunity of the latest calculator pass, if that pass is recent and new
+                    top = store.top_n(1, max_age=5)
+                    if top and top[0]['pass_id'] != last_pass_id:
+                        last_pass_id = top[0]['pass_id']
+                        trading_pairs = [top[0]['pair1'], top[0]['pair2'], top[0]['pair3']]
+                        print(f"\nExecuting triangle trade at {datetime.now()}")
+                        print(f"Trading pairs: {trading_pairs} ({top[0]['profit_percent']}%)")
+
+                        if top[0]['anchor']:
+                            # A CycleCalculation cycle: start in its anchor with the amount it was priced for
+                            result = await triangle_executor.execute_triangle_trade(
+                                trading_pairs, start_coin=top[0]['anchor'], amount=str(top[0]['initial_amount']),
+                                sides=top[0]['sides'])
+                        else:
+                            result = await triangle_executor.execute_triangle_trade(trading_pairs)
+                        print("\nTrade Result:")
+                        print(json.dumps(result, indent=2))
+
+                    await asyncio.sleep(1)
+                    continue
+
                 # Check if arbitrage_res_all.json exists and get its modification time
                 if os.path.exists('arbitrage_res_all.json'):
                     current_modified = os.path.getmtime('arbitrage_res_all.json')
@@ -66,5 +95,7 @@ if __name__ == "__main__":
     MIN_PROFIT = float(os.getenv('MIN_PROFIT', 0.5))
     MAX_PROFIT = float(os.getenv('MAX_PROFIT', 1000))
     
-    # Run the monitoring and trading loop
-    asyncio.run(monitor_and_execute_trades())
\ No newline at end of file
+    # Run the monitoring and trading loop; to_thread workers inherit the executor CPUs
+    RUNTIME.tune_gc()
+    RUNTIME.pin('executor')
+    RUNTIME.run(monitor_and_execute_trades())
\ No newline at end of file
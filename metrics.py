@@ -0,0 +1,172 @@
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Tuple
+
+# Latency buckets in seconds, from 10 µs to 5 s
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Counter:
+    """Monotonic counter. inc() is a single attribute add, cheap enough for every message"""
+    __slots__ = ('value',)
+    kind = 'counter'
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name: str, labels: Tuple):
+        yield f"{name}{_format_labels(labels)} {self.value}"
+
+
+class Gauge:
+    """Value that goes up and down, or is read from a callback at scrape time"""
+    __slots__ = ('value', 'function')
+    kind = 'gauge'
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def samples(self, name: str, labels: Tuple):
+        value = self.function() if self.function else self.value
+        yield f"{name}{_format_labels(labels)} {value}"
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two adds"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+    kind = 'histogram'
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: Tuple):
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            yield f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}"
+        yield f"{name}_sum{_format_labels(labels)} {self.sum}"
+        yield f"{name}_count{_format_labels(labels)} {self.count}"
+
+
+class MetricsRegistry:
+    """
+    Holds every metric by name and label set and renders them in Prometheus text format.
+
+    Metric objects are created once (typically in __init__ of the component that updates
+    them) and then updated directly, so the hot path never touches the registry.
+    """
+    def __init__(self):
+        self.metrics: Dict[str, Dict[Tuple, object]] = {}
+        self.help: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name: str, help_text: str, labels: Dict = None, **kwargs):
+        key = tuple(sorted((labels or {}).items()))
+        with self.lock:
+            family = self.metrics.setdefault(name, {})
+            self.help.setdefault(name, help_text)
+            metric = family.get(key)
+            if metric is None:
+                metric = family[key] = cls(**kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str = '', labels: Dict = None) -> Counter:
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str = '', labels: Dict = None) -> Gauge:
+        return self._get(Gauge, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str = '', labels: Dict = None, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            families = [(name, list(family.items())) for name, family in self.metrics.items()]
+        for name, family in families:
+            lines.append(f"# HELP {name} {self.help.get(name, '')}")
+            lines.append(f"# TYPE {name} {family[0][1].kind}")
+            for labels, metric in family:
+                lines.extend(metric.samples(name, labels))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+class MetricsServer:
+    """Serves a registry on http://127.0.0.1:<port>/metrics from a daemon thread"""
+    def __init__(self, port: int = 9108, host: str = '127.0.0.1', registry: MetricsRegistry = REGISTRY):
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        print(f"Metrics available at http://127.0.0.1:{self.port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def start_metrics_server(port: int = 9108, registry: MetricsRegistry = REGISTRY) -> MetricsServer:
+    server = MetricsServer(port=port, registry=registry)
+    server.start()
+    return server
@@ -0,0 +1,264 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+from metrics import REGISTRY
+from runtime_config import RUNTIME
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS passes (
+    pass_id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    trade_amount REAL,
+    triangles_processed INTEGER,
+    triangles_skipped INTEGER,
+    triangles_pruned INTEGER,
+    opportunities INTEGER
+);
+CREATE TABLE IF NOT EXISTS opportunities (
+    id INTEGER PRIMARY KEY,
+    pass_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    triangle TEXT NOT NULL,
+    pair1 TEXT, pair2 TEXT, pair3 TEXT,
+    anchor TEXT,
+    sides TEXT,
+    initial_amount REAL,
+    final_amount REAL,
+    profit_amount REAL,
+    profit_percent REAL,
+    ladder TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_opportunities_ts ON opportunities (ts);
+CREATE INDEX IF NOT EXISTS idx_opportunities_triangle ON opportunities (triangle, ts);
+CREATE INDEX IF NOT EXISTS idx_opportunities_profit ON opportunities (pass_id, profit_percent);
+CREATE INDEX IF NOT EXISTS idx_passes_ts ON passes (ts);
+"""
+
+# Columns added after the first release, so databases created before them are upgraded in place
+ADDED_COLUMNS = {'opportunities': (('anchor', 'TEXT'), ('sides', 'TEXT'))}
+
+
+class OpportunityStore:
+    """
+    History of every calculator pass in SQLite, in place of rewriting arbitrage_res_all.json.
+
+    record_pass() only appends the pass to an in-memory queue; a background thread turns
+    queued passes into rows and writes them in one transaction per flush. The database runs
+    in WAL mode, so readers (main.py, dashboards) query while the writer appends.
+    """
+    def __init__(self, path: str = 'opportunities.db', flush_interval: float = 0.5, max_pending: int = 10000):
+        """
+        Args:
+            path (str): SQLite database file
+            flush_interval (float): Seconds between background flushes
+            max_pending (int): Passes kept in memory when the writer falls behind; the oldest are dropped beyond this
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.pending = deque(maxlen=max_pending)
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.passes_written = 0
+        self.rows_written = 0
+
+        self.metric_rows = REGISTRY.counter('opportunity_store_rows_total', 'Opportunity rows written')
+        self.metric_flush = REGISTRY.histogram('opportunity_store_flush_seconds', 'Duration of one batched write')
+        self.metric_pending = REGISTRY.gauge('opportunity_store_pending_passes', 'Passes waiting to be written')
+        self.metric_pending.set_function(lambda: len(self.pending))
+        self.metric_dropped = REGISTRY.counter('opportunity_store_dropped_passes_total',
+                                               'Passes dropped because the writer fell behind')
+
+        self.connection = self._connect()
+        self.connection.executescript(SCHEMA)
+        self._migrate()
+        # A new database would otherwise start at pass 1 again after a restart
+        self.next_pass_id = (self.connection.execute("SELECT MAX(pass_id) FROM passes").fetchone()[0] or 0) + 1
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _migrate(self):
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")}
+            for name, column_type in columns:
+                if name not in existing:
+                    self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+        self.connection.commit()
+
+    def record_pass(self, results: Dict, stats: Dict = None, ts: float = None) -> int:
+        """
+        Queue one calculate_arbitrage pass; cheap enough for the calculator loop
+
+        Args:
+            results (dict): calculate_arbitrage results, not modified afterwards by the caller
+            stats (dict, optional): Pass statistics (trade_amount, triangles_processed, ...)
+            ts (float, optional): Pass time, seconds since epoch
+
+        Returns:
+            int: Pass id the results will be stored under
+        """
+        with self.condition:
+            pass_id = self.next_pass_id
+            self.next_pass_id += 1
+            if len(self.pending) == self.pending.maxlen:
+                self.metric_dropped.inc()
+            self.pending.append((pass_id, ts or time.time(), stats or {}, results))
+        return pass_id
+
+    @staticmethod
+    def _rows(pass_id: int, ts: float, results: Dict) -> List[tuple]:
+        rows = []
+        for triangle, result in results.items():
+            pairs = result.get('pairs') or triangle.split('-')
+            ladder = result.get('ladder')
+            sides = result.get('sides')
+            # Triangle results carry no anchor or sides: NULL means the USDT-anchored forward path
+            rows.append((pass_id, ts, triangle, pairs[0], pairs[1], pairs[2], result.get('anchor'),
+                         json.dumps(list(sides)) if sides else None, result.get('initial_amount'),
+                         result.get('final_amount'), result.get('profit_amount'), result.get('profit_percent'),
+                         json.dumps(list(ladder)) if ladder else None))
+        return rows
+
+    def flush(self) -> int:
+        """Write everything queued so far in one transaction; returns the number of passes written"""
+        with self.write_lock:
+            with self.condition:
+                batch = list(self.pending)
+                self.pending.clear()
+            if not batch:
+                return 0
+
+            start = time.perf_counter()
+            pass_rows = []
+            rows = []
+            for pass_id, ts, stats, results in batch:
+                pass_rows.append((pass_id, ts, stats.get('trade_amount'), stats.get('triangles_processed'),
+                                  stats.get('triangles_skipped'), stats.get('triangles_pruned'), len(results)))
+                rows.extend(self._rows(pass_id, ts, results))
+            with self.connection:
+                self.connection.executemany("INSERT INTO passes VALUES (?, ?, ?, ?, ?, ?, ?)", pass_rows)
+                self.connection.executemany(
+                    "INSERT INTO opportunities (pass_id, ts, triangle, pair1, pair2, pair3, anchor, sides, "
+                    "initial_amount, final_amount, profit_amount, profit_percent, ladder) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+            self.metric_flush.observe(time.perf_counter() - start)
+            self.metric_rows.inc(len(rows))
+            self.passes_written += len(batch)
+            self.rows_written += len(rows)
+            return len(batch)
+
+    def _writer_task(self):
+        RUNTIME.pin('background')
+        while self.running:
+            with self.condition:
+                self.condition.wait(timeout=self.flush_interval)
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Error writing opportunities: {e}")
+        self.flush()
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        # A short-lived connection per query: WAL readers never block the writer
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        try:
+            return [dict(row) for row in connection.execute(sql, params)]
+        finally:
+            connection.close()
+
+    def top_n(self, n: int = 10, max_age: float = None) -> List[Dict]:
+        """
+        Best opportunities of the latest written pass
+
+        Args:
+            n (int): Number of opportunities
+            max_age (float, optional): Return nothing if the latest pass is older than this many seconds
+
+        Returns:
+            list: Opportunities by descending profit_percent, each with pass_id and ts; anchor and
+                sides (e.g. ['buy', 'sell', 'sell']) are None for USDT-anchored triangle results
+        """
+        latest = self._query("SELECT pass_id, ts FROM passes ORDER BY pass_id DESC LIMIT 1")
+        if not latest or (max_age is not None and time.time() - latest[0]['ts'] > max_age):
+            return []
+        rows = self._query(
+            "SELECT pass_id, ts, triangle, pair1, pair2, pair3, anchor, sides, initial_amount, final_amount, "
+            "profit_amount, profit_percent, ladder FROM opportunities WHERE pass_id = ? "
+            "ORDER BY profit_percent DESC LIMIT ?",
+            (latest[0]['pass_id'], n)
+        )
+        for row in rows:
+            row['sides'] = json.loads(row['sides']) if row['sides'] else None
+            row['ladder'] = json.loads(row['ladder']) if row['ladder'] else None
+        return rows
+
+    def triangle_history(self, triangle: str, since: float = None, limit: int = 1000) -> List[Dict]:
+        """
+        Every appearance of one triangle, newest first
+
+        Args:
+            triangle (str): Triangle key as in the results ('ADAUSDT-ADABTC-BTCUSDT')
+            since (float, optional): Only appearances after this time, seconds since epoch
+            limit (int): Maximum rows
+        """
+        return self._query(
+            "SELECT pass_id, ts, initial_amount, final_amount, profit_amount, profit_percent FROM opportunities "
+            "WHERE triangle = ? AND ts >= ? ORDER BY ts DESC LIMIT ?",
+            (triangle, since or 0, limit)
+        )
+
+    def per_hour(self, since: float = None) -> List[Dict]:
+        """
+        Opportunities per hour
+
+        Returns:
+            list: hour (epoch seconds), opportunities, triangles (distinct), best and average profit_percent
+        """
+        return self._query(
+            "SELECT CAST(ts / 3600 AS INTEGER) * 3600 AS hour, COUNT(*) AS opportunities, "
+            "COUNT(DISTINCT triangle) AS triangles, MAX(profit_percent) AS best_profit_percent, "
+            "AVG(profit_percent) AS avg_profit_percent FROM opportunities WHERE ts >= ? GROUP BY hour ORDER BY hour",
+            (since or 0,)
+        )
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._writer_task)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop the writer after a final flush"""
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join()
+        self.flush()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python opportunity_store.py [db] [top|hour|triangle <key>]
+    store = OpportunityStore(sys.argv[1] if len(sys.argv) > 1 else 'opportunities.db')
+    command = sys.argv[2] if len(sys.argv) > 2 else 'top'
+    if command == 'hour':
+        rows = store.per_hour()
+    elif command == 'triangle':
+        rows = store.triangle_history(sys.argv[3])
+    else:
+        rows = store.top_n()
+    print(json.dumps(rows, indent=2))
@@ -0,0 +1,342 @@
+import functools
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter as TallyCounter
+from typing import Dict, List, Tuple
+
+from metrics import REGISTRY
+
+# (module, class, method) hot paths that get timers; a module that is not loaded is skipped
+HOT_PATHS = [
+    ('test_triple_socket', 'SymbolWebSocket', '_on_message'),
+    ('test_triple_socket', 'SymbolWebSocket', '_update_orderbook'),
+    ('triangle_no_pandas', 'BybitTriangleCalculation', 'calculate_value'),
+    ('triangle_no_pandas', 'BybitTriangleCalculation', 'calculate_arbitrage'),
+]
+
+
+class FunctionTimers:
+    """
+    Per-function wall-clock timers that exist only while enabled.
+
+    enable() swaps a timing wrapper onto each class attribute and disable() puts the
+    original function back, so with timers off the hot paths run the untouched code.
+    """
+    def __init__(self, targets: List[Tuple[str, str, str]] = None):
+        self.targets = targets or HOT_PATHS
+        self.originals: Dict[Tuple[type, str], object] = {}
+        self.stats: Dict[str, List[float]] = {}
+        self.stats_lock = threading.Lock()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _resolve(module_name: str, class_name: str):
+        # A module run as a script lives in __main__ rather than under its own name
+        for name in (module_name, '__main__'):
+            module = sys.modules.get(name)
+            if module is not None and hasattr(module, class_name):
+                return getattr(module, class_name)
+        return None
+
+    def _wrap(self, label: str, function):
+        histogram = REGISTRY.histogram('profile_function_seconds', 'Hot path duration while timers are enabled',
+                                       {'function': label})
+        stats = self.stats.setdefault(label, [0, 0.0, 0.0])  # calls, total seconds, max seconds
+        # Hot paths run on several socket threads; the read-modify-write below is not atomic
+        stats_lock = self.stats_lock
+        perf_counter = time.perf_counter
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                histogram.observe(elapsed)
+                with stats_lock:
+                    stats[0] += 1
+                    stats[1] += elapsed
+                    if elapsed > stats[2]:
+                        stats[2] = elapsed
+        return timed
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.originals)
+
+    def enable(self) -> List[str]:
+        """Install the wrappers; returns the labels that were found"""
+        installed = []
+        with self.lock:
+            for module_name, class_name, method in self.targets:
+                cls = self._resolve(module_name, class_name)
+                if cls is None or (cls, method) in self.originals:
+                    continue
+                original = cls.__dict__[method]
+                self.originals[(cls, method)] = original
+                label = f"{class_name}.{method}"
+                setattr(cls, method, self._wrap(label, original))
+                installed.append(label)
+        return installed
+
+    def disable(self):
+        """Restore the original functions"""
+        with self.lock:
+            for (cls, method), original in self.originals.items():
+                setattr(cls, method, original)
+            self.originals = {}
+
+    def report(self) -> Dict[str, Dict]:
+        with self.stats_lock:
+            stats = {label: tuple(values) for label, values in self.stats.items()}
+        return {
+            label: {
+                'calls': calls,
+                'total_ms': round(total * 1000, 3),
+                'mean_us': round(total / calls * 1e6, 2) if calls else 0.0,
+                'max_us': round(worst * 1e6, 2)
+            }
+            for label, (calls, total, worst) in sorted(stats.items(), key=lambda item: -item[1][1])
+        }
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread at a fixed interval.
+
+    cProfile only sees the thread that enabled it, while the scanner's hot paths run on
+    the socket and calculator threads, so the live dump is built from sys._current_frames().
+    """
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+
+    def run(self, seconds: float) -> Tuple[TallyCounter, TallyCounter, int]:
+        own_thread = threading.get_ident()
+        self_samples = TallyCounter()
+        stack_samples = TallyCounter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self_samples[stack[0]] += 1
+                stack_samples[';'.join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(self.interval)
+        return self_samples, stack_samples, samples
+
+    def dump(self, seconds: float, output_prefix: str) -> str:
+        """
+        Profile for N seconds and write <prefix>.txt (top functions) and <prefix>.folded (flamegraph input)
+
+        Returns:
+            str: Path of the text report
+        """
+        self_samples, stack_samples, samples = self.run(seconds)
+        cumulative = TallyCounter()
+        for stack, count in stack_samples.items():
+            for function in set(stack.split(';')):
+                cumulative[function] += count
+
+        total = sum(self_samples.values()) or 1
+        lines = [f"{samples} sampling rounds over {seconds}s, {total} thread samples", "",
+                 f"{'self %':>8} {'cum %':>8}  function"]
+        for function, count in self_samples.most_common(40):
+            lines.append(f"{count / total:8.2%} {cumulative[function] / total:8.2%}  {function}")
+
+        with open(f"{output_prefix}.txt", 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        with open(f"{output_prefix}.folded", 'w') as f:
+            for stack, count in stack_samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return f"{output_prefix}.txt"
+
+
+class ProfilingControl:
+    """
+    Runtime profiling switches for a live process.
+
+    SIGUSR1 dumps a sampling profile, SIGUSR2 takes a tracemalloc snapshot (diffed against
+    the previous one). The same actions, plus the function timers, are available as
+    one-line commands on a local Unix socket:
+
+        profile [seconds] | mem | mem stop | timers on | timers off | timers | status
+    """
+    def __init__(self, output_dir: str = 'profiles', socket_path: str = None, profile_seconds: float = 10.0,
+                 timers: FunctionTimers = None):
+        """
+        Args:
+            output_dir (str): Where profile and memory reports are written
+            socket_path (str, optional): Control socket path, default /tmp/bybit_profiling_<pid>.sock
+            profile_seconds (float): Profile length when triggered by signal
+            timers (FunctionTimers, optional): Timers to toggle, default the scanner hot paths
+        """
+        self.output_dir = output_dir
+        self.socket_path = socket_path or f"/tmp/bybit_profiling_{os.getpid()}.sock"
+        self.profile_seconds = profile_seconds
+        self.timers = timers or FunctionTimers()
+        self.profiler = SamplingProfiler()
+        self.profile_lock = threading.Lock()
+        self.memory_lock = threading.Lock()
+        self.last_snapshot = None
+        self.server = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _path(self, kind: str) -> str:
+        return os.path.join(self.output_dir, f"{kind}_{time.strftime('%Y%m%d_%H%M%S')}")
+
+    def profile(self, seconds: float = None) -> str:
+        """Run the sampling profiler in the calling thread; one profile at a time"""
+        if not self.profile_lock.acquire(blocking=False):
+            return "profile already running"
+        try:
+            path = self.profiler.dump(seconds or self.profile_seconds, self._path('profile'))
+            print(f"Profile written to {path}")
+            return path
+        finally:
+            self.profile_lock.release()
+
+    @staticmethod
+    def _take_snapshot():
+        """Snapshot without tracemalloc's own allocations; the baseline too, so diffs compare like with like"""
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+
+    def memory_snapshot(self) -> str:
+        """Start tracemalloc on first use, then write the top allocation growth since the last snapshot"""
+        # A signal and the control socket can ask at the same time
+        with self.memory_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(10)
+                self.last_snapshot = self._take_snapshot()
+                return "tracemalloc started, next snapshot will be diffed against this one"
+
+            snapshot = self._take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            lines = [f"traced {current / 1e6:.1f} MB (peak {peak / 1e6:.1f} MB)", ""]
+            for stat in snapshot.compare_to(self.last_snapshot, 'lineno')[:25]:
+                lines.append(str(stat))
+            self.last_snapshot = snapshot
+
+        path = self._path('memory') + '.txt'
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        print(f"Memory diff written to {path}")
+        return path
+
+    def memory_stop(self) -> str:
+        with self.memory_lock:
+            tracemalloc.stop()
+            self.last_snapshot = None
+        return "tracemalloc stopped"
+
+    def handle_command(self, command: str) -> str:
+        parts = command.split()
+        if not parts:
+            return "empty command"
+        if parts[0] == 'profile':
+            return self.profile(float(parts[1]) if len(parts) > 1 else None)
+        if parts == ['mem']:
+            return self.memory_snapshot()
+        if parts == ['mem', 'stop']:
+            return self.memory_stop()
+        if parts == ['timers', 'on']:
+            return f"timers enabled: {', '.join(self.timers.enable()) or 'no targets loaded'}"
+        if parts == ['timers', 'off']:
+            self.timers.disable()
+            return "timers disabled"
+        if parts == ['timers']:
+            return '\n'.join(f"{label}: {stats}" for label, stats in self.timers.report().items()) or "no timings"
+        if parts == ['status']:
+            return (f"timers {'on' if self.timers.enabled else 'off'}, "
+                    f"tracemalloc {'on' if tracemalloc.is_tracing() else 'off'}, "
+                    f"profile {'running' if self.profile_lock.locked() else 'idle'}")
+        return f"unknown command: {command}"
+
+    def _in_background(self, action):
+        thread = threading.Thread(target=action)
+        thread.daemon = True
+        thread.start()
+
+    def install_signals(self):
+        """SIGUSR1 -> profile, SIGUSR2 -> memory snapshot. Only possible from the main thread"""
+        if not hasattr(signal, 'SIGUSR1') or threading.current_thread() is not threading.main_thread():
+            print("Profiling signals not available, use the control socket")
+            return
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self._in_background(self.profile))
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self._in_background(self.memory_snapshot))
+
+    def start(self):
+        """Install the signal handlers and serve the control socket"""
+        self.install_signals()
+        if not hasattr(socket, 'AF_UNIX'):
+            print("Unix sockets not available, profiling control socket disabled")
+            return
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        control = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                command = self.rfile.readline().decode().strip()
+                try:
+                    reply = control.handle_command(command)
+                except Exception as e:
+                    reply = f"error: {e}"
+                self.wfile.write((reply + '\n').encode())
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        print(f"Profiling control on {self.socket_path} (SIGUSR1 profile, SIGUSR2 memory)")
+
+    def stop(self):
+        self.timers.disable()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+def send_command(socket_path: str, command: str, timeout: float = 120.0) -> str:
+    """Send one command to a running process' control socket and return the reply"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall((command + '\n').encode())
+        reply = b''
+        while not reply.endswith(b'\n'):
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            reply += chunk
+    return reply.decode().strip()
+
+
+if __name__ == "__main__":
+    # python profiling.py <pid or socket path> <command...>
+    if len(sys.argv) < 3:
+        print("usage: python profiling.py <pid|socket path> profile [seconds] | mem | mem stop | timers [on|off] | status")
+        sys.exit(1)
+
+    target = sys.argv[1]
+    path = f"/tmp/bybit_profiling_{target}.sock" if target.isdigit() else target
+    print(send_command(path, ' '.join(sys.argv[2:])))
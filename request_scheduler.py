@@ -0,0 +1,357 @@
+import functools
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, List
+
+from metrics import REGISTRY
+
+# Request priorities, lower is served first
+URGENT, NORMAL, BACKGROUND = 0, 1, 2
+
+# Requests per second per endpoint until the first X-Bapi-Limit header says otherwise
+DEFAULT_LIMITS = {
+    'place_order': 10,
+    'place_batch_order': 10,
+    'cancel_order': 10,
+    'get_order_history': 10,
+    'get_open_orders': 10,
+    'get_wallet_balance': 10,
+    'default': 10
+}
+
+# Bybit's per-IP cap across all endpoints (600 requests per 5 seconds)
+IP_LIMIT = 120
+
+DEFAULT_PRIORITIES = {
+    'place_order': URGENT,
+    'place_batch_order': URGENT,
+    'cancel_order': URGENT,
+    'get_order_history': NORMAL,
+    'get_open_orders': NORMAL,
+    'get_wallet_balance': BACKGROUND,
+    'get_instruments_info': BACKGROUND,
+    'get_tickers': BACKGROUND
+}
+
+# Bybit accepts at most 10 spot orders per batch request
+BATCH_MAX_ORDERS = 10
+
+
+class TokenBucket:
+    """
+    Requests-per-second budget of one endpoint.
+
+    Starts from a configured rate and is resynchronised from Bybit's X-Bapi-Limit,
+    X-Bapi-Limit-Status and X-Bapi-Limit-Reset-Timestamp response headers.
+    """
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available, 0 if one is available now"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def update(self, limit: int = None, remaining: int = None, reset_ms: int = None, now: float = None):
+        """Adopt the exchange's view of the limit; remaining only ever lowers the local count"""
+        now = time.monotonic() if now is None else now
+        if limit:
+            self.rate = self.capacity = limit
+        if remaining is not None:
+            self._refill(now)
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= 0 and reset_ms:
+                self.blocked_until = now + max(0.0, reset_ms / 1000 - time.time())
+
+
+class _Request:
+    __slots__ = ('endpoint', 'kwargs', 'priority', 'enqueued', 'event', 'response', 'error', 'batch', 'leader')
+
+    def __init__(self, endpoint: str, kwargs: Dict, priority: int):
+        self.endpoint = endpoint
+        self.kwargs = kwargs
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.event = threading.Event()
+        self.response = None
+        self.error = None
+        self.batch = None   # set on the request that sends a coalesced batch
+        self.leader = None  # set on requests answered by someone else's batch
+
+
+class RequestScheduler:
+    """
+    Rate-limited front for a pybit HTTP session, usable wherever the session is.
+
+    Every call waits in one priority queue until both its endpoint's token bucket and
+    the shared per-IP bucket have a token. When tokens are scarce, order traffic goes
+    ahead of status polls, which go ahead of balance and metadata refreshes. The call itself still runs in the caller's thread, so concurrent
+    legs stay concurrent. With batch_window_ms set, market orders queued together are
+    sent as one place_batch_order request and the per-order results are handed back.
+
+    Create the HTTP session with return_response_headers=True so the buckets follow the
+    exchange's X-Bapi-Limit headers instead of the configured defaults.
+    """
+    def __init__(self, session, limits: Dict[str, float] = None, priorities: Dict[str, int] = None,
+                 ip_limit: float = IP_LIMIT, batch_window_ms: float = 0.0, name: str = 'rest'):
+        """
+        Args:
+            session: pybit HTTP (or a mock exposing the same methods)
+            limits (dict, optional): Requests per second per endpoint, merged over DEFAULT_LIMITS
+            priorities (dict, optional): Priority per endpoint, merged over DEFAULT_PRIORITIES
+            ip_limit (float): Requests per second across all endpoints
+            batch_window_ms (float): How long an order may wait for others to share a batch; 0 disables batching
+            name (str): Metric label
+        """
+        self.session = session
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.priorities = dict(DEFAULT_PRIORITIES, **(priorities or {}))
+        self.batch_window = batch_window_ms / 1000
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.ip_bucket = TokenBucket(ip_limit)
+        self.queue = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+        labels = {'scheduler': name}
+        self.metric_wait = {
+            priority: REGISTRY.histogram('rest_scheduler_wait_seconds', 'Time a request waited for a token',
+                                         dict(labels, priority=label))
+            for priority, label in ((URGENT, 'urgent'), (NORMAL, 'normal'), (BACKGROUND, 'background'))
+        }
+        self.metric_batched = REGISTRY.counter('rest_scheduler_batched_orders_total',
+                                               'Orders sent inside a place_batch_order request', labels)
+        self.metric_rate_limited = REGISTRY.counter('rest_scheduler_rate_limited_total',
+                                                    'Responses rejected with retCode 10006', labels)
+        self.metric_queue = REGISTRY.gauge('rest_scheduler_queue_depth', 'Requests waiting for a token', labels)
+        self.metric_queue.set_function(lambda: len(self.queue))
+
+    def __getattr__(self, name: str):
+        # Drop-in for the session: scheduler.place_order(...) is scheduler.request('place_order', ...)
+        session = self.__dict__.get('session')
+        if name.startswith('_') or session is None or not hasattr(session, name):
+            raise AttributeError(name)
+        return functools.partial(self.request, name)
+
+    def _bucket(self, endpoint: str) -> TokenBucket:
+        bucket = self.buckets.get(endpoint)
+        if bucket is None:
+            bucket = self.buckets[endpoint] = TokenBucket(self.limits.get(endpoint, self.limits['default']))
+        return bucket
+
+    def request(self, endpoint: str, priority: int = None, **kwargs):
+        """
+        Call a session method once its endpoint has a token
+
+        Args:
+            endpoint (str): Session method name (e.g., 'place_order')
+            priority (int, optional): URGENT, NORMAL or BACKGROUND, default from the endpoint
+
+        Returns:
+            The session's response (without headers, even if the session returns them)
+        """
+        request = _Request(endpoint, kwargs, self.priorities.get(endpoint, NORMAL) if priority is None else priority)
+        with self.condition:
+            # Checked under the lock, so a concurrent stop() either sees this request or starts after it
+            if not self.running:
+                self.start()
+            heapq.heappush(self.queue, (request.priority, next(self.sequence), request))
+            self.condition.notify()
+
+        request.event.wait()
+        self.metric_wait[min(request.priority, BACKGROUND)].observe(time.monotonic() - request.enqueued)
+        if request.leader is None and request.error is None:
+            if request.batch:
+                self._send_batch(request.batch)
+            else:
+                try:
+                    request.response = self._call(endpoint, kwargs)
+                except Exception as e:
+                    request.error = e
+        if request.error is not None:
+            raise request.error
+        return request.response
+
+    def _call(self, endpoint: str, kwargs: Dict):
+        response = getattr(self.session, endpoint)(**kwargs)
+        if isinstance(response, tuple):
+            response, _, headers = response
+            self._update_limits(endpoint, headers)
+        if isinstance(response, dict) and response.get('retCode') == 10006:
+            self.metric_rate_limited.inc()
+        return response
+
+    def _update_limits(self, endpoint: str, headers):
+        limit = headers.get('X-Bapi-Limit')
+        remaining = headers.get('X-Bapi-Limit-Status')
+        if limit is None and remaining is None:
+            return
+        reset = headers.get('X-Bapi-Limit-Reset-Timestamp')
+        with self.condition:
+            self._bucket(endpoint).update(int(limit) if limit else None,
+                                          int(remaining) if remaining is not None else None,
+                                          int(reset) if reset else None)
+
+    def _batchable(self, request: _Request) -> bool:
+        return self.batch_window > 0 and request.endpoint == 'place_order' and hasattr(self.session, 'place_batch_order')
+
+    def _next_ready(self, now: float):
+        """
+        Pop the highest-priority request that can go now
+
+        Returns:
+            tuple: (request or None, seconds to wait before checking again)
+        """
+        delay = 1.0
+        for _, _, request in sorted(self.queue):
+            if self._batchable(request):
+                category = request.kwargs.get('category')
+                group = [queued for _, _, queued in sorted(self.queue)
+                         if queued.endpoint == 'place_order' and queued.kwargs.get('category') == category]
+                group = group[:BATCH_MAX_ORDERS]
+                window_left = request.enqueued + self.batch_window - now
+                if window_left > 0 and len(group) < BATCH_MAX_ORDERS:
+                    delay = min(delay, window_left)
+                    continue
+                endpoint = 'place_batch_order' if len(group) > 1 else 'place_order'
+            else:
+                group = [request]
+                endpoint = request.endpoint
+
+            bucket = self._bucket(endpoint)
+            wait = max(bucket.wait_time(now), self.ip_bucket.wait_time(now))
+            if wait > 0:
+                delay = min(delay, wait)
+                continue
+
+            bucket.take(now)
+            self.ip_bucket.take(now)
+            taken = {id(item) for item in group}
+            self.queue = [entry for entry in self.queue if id(entry[2]) not in taken]
+            heapq.heapify(self.queue)
+            if len(group) > 1:
+                request = group[0]
+                request.batch = group
+                for follower in group[1:]:
+                    follower.leader = request
+            return request, 0.0
+        return None, delay
+
+    def _dispatch_task(self):
+        while self.running:
+            with self.condition:
+                request, delay = self._next_ready(time.monotonic())
+                if request is None:
+                    self.condition.wait(timeout=delay if self.queue else None)
+                    continue
+            request.event.set()
+
+    def _send_batch(self, batch: List[_Request]):
+        """Send coalesced orders as one place_batch_order and give each caller its own place_order-style response"""
+        category = batch[0].kwargs.get('category')
+        orders = [{key: value for key, value in request.kwargs.items() if key not in ('category', 'accountType')}
+                  for request in batch]
+        try:
+            response = self._call('place_batch_order', {'category': category, 'request': orders})
+            if response.get('retCode') != 0:
+                for request in batch:
+                    request.response = {'retCode': response.get('retCode'), 'retMsg': response.get('retMsg'),
+                                        'result': {}}
+            else:
+                results = response['result']['list']
+                statuses = response.get('retExtInfo', {}).get('list', [{}] * len(results))
+                for request, result, status in zip(batch, results, statuses):
+                    code = status.get('code', 0)
+                    request.response = {
+                        'retCode': code,
+                        'retMsg': status.get('msg', 'OK'),
+                        'result': {'orderId': result.get('orderId', ''), 'orderLinkId': result.get('orderLinkId', '')}
+                        if code == 0 else {}
+                    }
+                self.metric_batched.inc(len(batch))
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        for request in batch[1:]:
+            request.event.set()
+
+    def get_stats(self) -> Dict:
+        with self.condition:
+            return {
+                'queued': len(self.queue),
+                'batched_orders': self.metric_batched.value,
+                'rate_limited': self.metric_rate_limited.value,
+                'buckets': {endpoint: {'rate': bucket.rate, 'tokens': round(bucket.tokens, 2)}
+                            for endpoint, bucket in self.buckets.items()}
+            }
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._dispatch_task)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop dispatching; callers still waiting in the queue get an error instead of hanging"""
+        with self.condition:
+            self.running = False
+            queued, self.queue = self.queue, []
+            self.condition.notify_all()
+        for _, _, request in queued:
+            request.error = RuntimeError(f"Request scheduler stopped before {request.endpoint} was sent")
+            request.event.set()
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+    from mock_exchange import MockExchangeSession
+
+    # 40 order requests at once against an endpoint allowing 10 per second
+    prices = {"ADAUSDC": 0.70}
+    for mode in ('direct', 'scheduled'):
+        session = MockExchangeSession(prices, {"USDC": 1e6}, latency_ms=5, rate_limit=10,
+                                      return_response_headers=mode == 'scheduled')
+        target = RequestScheduler(session, name=mode) if mode == 'scheduled' else session
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=40) as pool:
+            responses = list(pool.map(lambda _: target.place_order(category="spot", symbol="ADAUSDC", side="BUY",
+                                                                   orderType="MARKET", qty="10"), range(40)))
+        accepted = sum(1 for response in responses if response['retCode'] == 0)
+        print(f"{mode}: {accepted}/40 accepted, {session.rejected} rejected with 10006, "
+              f"{time.perf_counter() - start:.2f}s")
+
+    # An order behind a queue of balance refreshes when only 5 requests per second are allowed
+    scheduler = RequestScheduler(MockExchangeSession(prices, {"USDC": 1e6}, latency_ms=5), ip_limit=5,
+                                 name='priority')
+    refreshes = [threading.Thread(target=scheduler.get_wallet_balance, kwargs={'accountType': "UNIFIED"})
+                 for _ in range(20)]
+    for thread in refreshes:
+        thread.start()
+    time.sleep(0.1)
+    start = time.perf_counter()
+    scheduler.place_order(category="spot", symbol="ADAUSDC", side="BUY", orderType="MARKET", qty="10")
+    print(f"order waited {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"{len(scheduler.queue)} earlier balance refreshes still queued")
+    for thread in refreshes:
+        thread.join()
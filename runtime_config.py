@@ -0,0 +1,146 @@
+import gc
+import os
+import threading
+from typing import Dict, Iterable, Set, Tuple
+
+ROLES = ('ingest', 'calculator', 'executor', 'background')
+
+
+def parse_cpus(spec: str) -> Set[int]:
+    """CPU list in taskset/cpuset syntax ('0-2,5' -> {0, 1, 2, 5})"""
+    cpus = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+class RuntimeConfig:
+    """
+    Process tuning for latency-sensitive deployments: event loop, CPU affinity and GC.
+
+    - uvloop runs the asyncio loop when it is installed (executor in main.py)
+    - each thread role is pinned to its own cores with os.sched_setaffinity, which on
+      Linux applies to the calling thread; threads it starts afterwards inherit the mask
+    - GC thresholds are raised, and after warm-up every long-lived object (topology,
+      books, instrument filters) is moved out of the collector's reach with gc.freeze,
+      so full collections in the hot loops scan only young objects
+
+    Nothing is changed unless configured, and every step is a no-op where unsupported.
+    """
+    def __init__(self, affinity: Dict[str, Iterable[int]] = None, gc_thresholds: Tuple[int, int, int] = None,
+                 gc_freeze: bool = False, use_uvloop: bool = True):
+        """
+        Args:
+            affinity (dict, optional): Role ('ingest', 'calculator', 'executor', 'background') -> CPU ids
+            gc_thresholds (tuple, optional): gc.set_threshold values, e.g. (50000, 50, 100)
+            gc_freeze (bool): Freeze all objects alive when warmed_up() is called
+            use_uvloop (bool): Run event loops on uvloop if it is importable
+        """
+        self.affinity = {role: set(cpus) for role, cpus in (affinity or {}).items()}
+        unknown = set(self.affinity) - set(ROLES)
+        if unknown:
+            raise ValueError(f"Unknown thread roles {sorted(unknown)}, expected {ROLES}")
+        self.gc_thresholds = gc_thresholds
+        self.gc_freeze = gc_freeze
+        self.use_uvloop = use_uvloop
+        self.pinned: Dict[str, str] = {}  # thread name -> role
+        self.frozen = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'RuntimeConfig':
+        """
+        Environment:
+            RUNTIME_AFFINITY: Role CPUs, e.g. 'ingest=0-1;calculator=2;executor=3;background=3'
+            RUNTIME_GC_THRESHOLDS: Three comma-separated gc thresholds, e.g. '50000,50,100'
+            RUNTIME_GC_FREEZE: 1 to gc.freeze() long-lived objects after warm-up
+            RUNTIME_UVLOOP: 0 to keep the default asyncio loop even if uvloop is installed
+        """
+        affinity = {}
+        for entry in os.getenv('RUNTIME_AFFINITY', '').split(';'):
+            role, _, spec = entry.partition('=')
+            if role.strip() and spec.strip():
+                affinity[role.strip()] = parse_cpus(spec)
+        thresholds = os.getenv('RUNTIME_GC_THRESHOLDS')
+        return cls(affinity=affinity,
+                   gc_thresholds=tuple(int(value) for value in thresholds.split(',')) if thresholds else None,
+                   gc_freeze=os.getenv('RUNTIME_GC_FREEZE') == '1',
+                   use_uvloop=os.getenv('RUNTIME_UVLOOP', '1') != '0')
+
+    def pin(self, role: str) -> bool:
+        """
+        Pin the calling thread to the CPUs configured for role
+
+        Returns:
+            bool: True if the affinity was changed
+        """
+        cpus = self.affinity.get(role)
+        if not cpus or not hasattr(os, 'sched_setaffinity'):
+            return False
+        available = os.sched_getaffinity(0)
+        usable = cpus & available
+        if not usable:
+            print(f"Warning: CPUs {sorted(cpus)} for {role} are not available (have {sorted(available)})")
+            return False
+        os.sched_setaffinity(0, usable)
+        with self.lock:
+            self.pinned[threading.current_thread().name] = role
+        return True
+
+    def tune_gc(self):
+        """Apply the configured GC thresholds; call once at start-up"""
+        if self.gc_thresholds:
+            gc.set_threshold(*self.gc_thresholds)
+
+    def warmed_up(self):
+        """
+        Call once the long-lived state is built (topology loaded, first books received)
+
+        A full collection first, so garbage is not frozen along with the live objects.
+        """
+        if not self.gc_freeze:
+            return
+        gc.collect()
+        gc.freeze()
+        self.frozen = gc.get_freeze_count()
+        print(f"Froze {self.frozen} long-lived objects out of garbage collection")
+
+    def uvloop_module(self):
+        if not self.use_uvloop:
+            return None
+        try:
+            import uvloop
+        except ImportError:
+            return None
+        return uvloop
+
+    def run(self, coroutine):
+        """asyncio.run on uvloop when available, on the default loop otherwise"""
+        import asyncio
+
+        uvloop = self.uvloop_module()
+        if uvloop is None:
+            return asyncio.run(coroutine)
+        if hasattr(uvloop, 'run'):
+            return uvloop.run(coroutine)
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        return asyncio.run(coroutine)
+
+    def report(self) -> Dict:
+        """Settings in effect, for start-up logs"""
+        return {
+            'event_loop': 'uvloop' if self.uvloop_module() else 'asyncio',
+            'affinity': {role: sorted(cpus) for role, cpus in self.affinity.items()},
+            'pinned_threads': dict(self.pinned),
+            'cpus_available': len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count(),
+            'gc_thresholds': gc.get_threshold(),
+            'gc_frozen_objects': gc.get_freeze_count()
+        }
+
+
+# Process-wide configuration, read from the environment once
+RUNTIME = RuntimeConfig.from_env()
@@ -7,18 +7,21 @@ import ssl
 import time
 from collections import defaultdict
 from typing import Dict, List, Any
+from fixed_point import FixedPointBook
 
 class BybitGetOrderBook:
-    def __init__(self, symbols, depth=50):
-
+    def __init__(self, symbols, depth=50, scales=None):
+        """
+        Args:
+            symbols (list): Symbols to record
+            depth (int): Levels per side written to the JSON file
+            scales (dict, optional): symbol -> InstrumentScale; without one the scale is taken from the data
+        """
         self.symbols = symbols
         self.depth = depth
-        self.orderbooks = {
-            symbol: {
-                'bids': {},  # price -> quantity
-                'asks': {}   # price -> quantity
-            } for symbol in symbols
-        }
+        scales = scales or {}
+        # Integer price units -> integer quantity units, parsed once from the exchange strings
+        self.orderbooks = {symbol: FixedPointBook(scales.get(symbol)) for symbol in symbols}
         self.current_data = {}
         self.ws = None
         self.ws_thread = None
@@ -46,32 +49,12 @@ class BybitGetOrderBook:
         self.ws_thread.daemon = True
         self.ws_thread.start()
 
-    def update_orderbook(self, symbol, bids, asks):
-        # Update bids
-        for bid in bids:
-            price, quantity = float(bid[0]), float(bid[1])
-            if quantity > 0:
-                self.orderbooks[symbol]['bids'][price] = quantity
-            else:
-                self.orderbooks[symbol]['bids'].pop(price, None)
-
-        # Update asks
-        for ask in asks:
-            price, quantity = float(ask[0]), float(ask[1])
-            if quantity > 0:
-                self.orderbooks[symbol]['asks'][price] = quantity
-            else:
-                self.orderbooks[symbol]['asks'].pop(price, None)
-
-        # Sort and limit the orderbook
-        sorted_bids = sorted(self.orderbooks[symbol]['bids'].items(), reverse=True)[:self.depth]
-        sorted_asks = sorted(self.orderbooks[symbol]['asks'].items())[:self.depth]
-
-        # Convert back to the format we want to save
-        formatted_bids = [[str(price), str(qty)] for price, qty in sorted_bids]
-        formatted_asks = [[str(price), str(qty)] for price, qty in sorted_asks]
+    def update_orderbook(self, symbol, bids, asks, snapshot=False):
+        book = self.orderbooks[symbol]
+        book.apply(bids, asks, snapshot=snapshot)
 
-        return formatted_bids, formatted_asks
+        # Strings are only rebuilt here, for the JSON output, with the exchange's exact digits
+        return book.to_strings(self.depth)
 
     def save_to_json(self, symbol, bids, asks):
         # Update the data for this symbol
@@ -107,7 +90,8 @@ class BybitGetOrderBook:
                     print(f"Processing {symbol} - Bids: {len(bids)}, Asks: {len(asks)}")
                     
                     # Update internal orderbook and get sorted results
-                    formatted_bids, formatted_asks = self.update_orderbook(symbol, bids, asks)
+                    formatted_bids, formatted_asks = self.update_orderbook(symbol, bids, asks,
+                                                                           snapshot=data.get('type') == 'snapshot')
                     
                     # Save the current state
                     self.save_to_json(symbol, formatted_bids, formatted_asks)
@@ -0,0 +1,184 @@
+import heapq
+import threading
+import time
+from typing import Dict, List
+
+from metrics import REGISTRY
+
+
+def lpt_placement(rates: Dict[str, float], connections: int, capacity: int = None,
+                  default_rate: float = 1.0) -> List[List[str]]:
+    """
+    Longest-processing-time placement: hottest symbols first, each onto the least loaded connection
+
+    Args:
+        rates (dict): symbol -> messages per second; symbols in rates with no rate use default_rate
+        connections (int): Number of connections to fill
+        capacity (int, optional): Maximum symbols per connection
+        default_rate (float): Weight for symbols without a measured rate
+
+    Returns:
+        list: Symbols per connection
+    """
+    placement = [[] for _ in range(connections)]
+    heap = [(0.0, i) for i in range(connections)]
+    for symbol in sorted(rates, key=lambda symbol: -(rates[symbol] or default_rate)):
+        if not heap:
+            print(f"Warning: no connection capacity left for {symbol}")
+            continue
+        load, i = heapq.heappop(heap)
+        placement[i].append(symbol)
+        # A full connection is simply not pushed back
+        if capacity is None or len(placement[i]) < capacity:
+            heapq.heappush(heap, (load + (rates[symbol] or default_rate), i))
+    return placement
+
+
+class LoadBalancer:
+    """
+    Keeps per-connection message load even by moving symbols between sockets at run time.
+
+    Message rates are measured per symbol over each interval and smoothed; when the most
+    loaded socket exceeds the mean by more than imbalance, symbols are moved from the most
+    to the least loaded socket, each move picked to bring the pair closest to even. Moves
+    use MultiSocketClient.move_symbols, so books stay live during the handover.
+    """
+    def __init__(self, client, interval: float = 30.0, imbalance: float = 1.2, max_moves: int = 10,
+                 smoothing: float = 0.5):
+        """
+        Args:
+            client (MultiSocketClient): Client whose symbols are placed
+            interval (float): Seconds between rate measurements and rebalancing
+            imbalance (float): Rebalance when the busiest socket exceeds the mean load by this factor
+            max_moves (int): Most symbols moved per rebalance, bounding the subscribe traffic
+            smoothing (float): Weight of the newest interval in the rate average
+        """
+        self.client = client
+        self.interval = interval
+        self.imbalance = imbalance
+        self.max_moves = max_moves
+        self.smoothing = smoothing
+        self.rates: Dict[str, float] = {}
+        self.last_counts: Dict[str, int] = {}
+        self.last_measured = None
+        self.moves = 0
+        self.running = False
+
+        self.metric_moves = REGISTRY.counter('placement_moves_total', 'Symbols moved to another socket')
+        self.metric_imbalance = REGISTRY.gauge('placement_imbalance_ratio', 'Busiest socket load over the mean')
+
+    def measure(self, now: float = None) -> Dict[str, float]:
+        """Update the smoothed per-symbol message rates from the sockets' update counters"""
+        now = time.monotonic() if now is None else now
+        counts = {}
+        for socket in list(self.client.sockets):
+            for symbol, stats in list(socket.update_stats.items()):
+                counts[symbol] = counts.get(symbol, 0) + stats[0]
+        if self.last_measured is not None and now > self.last_measured:
+            elapsed = now - self.last_measured
+            for symbol, count in counts.items():
+                # Counters restart when a symbol moves socket
+                delta = count - self.last_counts.get(symbol, 0)
+                rate = max(delta, count if delta < 0 else 0) / elapsed
+                previous = self.rates.get(symbol)
+                self.rates[symbol] = rate if previous is None else (
+                    self.smoothing * rate + (1 - self.smoothing) * previous)
+        self.last_counts = counts
+        self.last_measured = now
+        return self.rates
+
+    def socket_loads(self) -> Dict[int, float]:
+        """socket_id -> measured messages per second of the symbols it streams (standby sockets excluded)"""
+        return {socket.socket_id: sum(self.rates.get(symbol, 0.0) for symbol in list(socket.symbols))
+                for socket in self.client.sockets if not socket.standby}
+
+    def plan_moves(self) -> Dict[str, int]:
+        """
+        Moves that even out the load, most loaded socket to least loaded first
+
+        Returns:
+            dict: symbol -> target socket_id
+        """
+        loads = self.socket_loads()
+        if len(loads) < 2:
+            return {}
+        members = {socket.socket_id: list(socket.symbols) for socket in self.client.sockets if socket.socket_id in loads}
+        capacity = self.client.max_pairs_per_socket
+        mean = sum(loads.values()) / len(loads)
+        moves = {}
+        while len(moves) < self.max_moves and mean > 0:
+            source = max(loads, key=loads.get)
+            target = min(loads, key=loads.get)
+            if loads[source] <= self.imbalance * mean or len(members[target]) >= capacity:
+                break
+            gap = loads[source] - loads[target]
+            # The best single move takes half the gap; anything at or above the gap makes it worse
+            candidates = [symbol for symbol in members[source]
+                          if symbol not in moves and 0 < self.rates.get(symbol, 0.0) < gap]
+            if not candidates:
+                break
+            symbol = min(candidates, key=lambda symbol: abs(self.rates[symbol] - gap / 2))
+            rate = self.rates[symbol]
+            members[source].remove(symbol)
+            members[target].append(symbol)
+            loads[source] -= rate
+            loads[target] += rate
+            moves[symbol] = target
+        return moves
+
+    def rebalance(self) -> Dict[str, int]:
+        """Measure, then move symbols if the load is uneven; returns the moves made"""
+        self.measure()
+        loads = self.socket_loads()
+        if loads:
+            mean = sum(loads.values()) / len(loads)
+            self.metric_imbalance.set(max(loads.values()) / mean if mean else 0.0)
+        moves = self.plan_moves()
+        if moves:
+            self.client.move_symbols(moves)
+            self.moves += len(moves)
+            self.metric_moves.inc(len(moves))
+            print(f"Rebalanced {len(moves)} symbols: {moves}")
+        return moves
+
+    def load_report(self) -> Dict:
+        """Per-socket symbol count, measured message rate and share of the total, plus the imbalance"""
+        loads = self.socket_loads()
+        total = sum(loads.values())
+        mean = total / len(loads) if loads else 0.0
+        sockets = {}
+        for socket in self.client.sockets:
+            if socket.socket_id not in loads:
+                continue
+            hottest = sorted(list(socket.symbols), key=lambda symbol: -self.rates.get(symbol, 0.0))[:3]
+            sockets[socket.socket_id] = {
+                'symbols': len(socket.symbols),
+                'messages_per_sec': round(loads[socket.socket_id], 1),
+                'share': round(loads[socket.socket_id] / total, 3) if total else None,
+                'hottest': hottest
+            }
+        return {
+            'sockets': sockets,
+            'imbalance': round(max(loads.values()) / mean, 3) if mean else None,
+            'moves': self.moves
+        }
+
+    def _balancer_task(self):
+        self.measure()
+        while self.running:
+            time.sleep(self.interval)
+            if not self.running:
+                break
+            try:
+                self.rebalance()
+            except Exception as e:
+                print(f"Error rebalancing sockets: {e}")
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._balancer_task)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
@@ -5,12 +5,59 @@ import ssl
 import threading
 import time
 
+from metrics import REGISTRY
+
+# Lead of the winning feed over the losing one, in seconds, from 100 µs to 1 s
+LEAD_BUCKETS = (0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.5, 1.0)
+
+
 class DualSocketClient:
-    def __init__(self, symbols: List[str]):
+    """
+    Orderbook client that can subscribe every symbol on two independent connections.
+
+    In redundant mode both feeds carry the same updates; the first arrival of each update
+    id 'u' is applied and the copy from the slower feed is dropped from a string peek,
+    before any JSON decoding. A jitter spike on one connection is then hidden as long as
+    the other one is on time.
+
+    Deltas are deduplicated by 'u' alone. A snapshot resets the book and its stored 'u'
+    even when 'u' goes backwards, which is how a service restart (snapshot with u=1) comes
+    through; only the other feed's copy of the snapshot in effect, or a snapshot older
+    than the book that is not a restart, is dropped.
+    """
+    def __init__(self, symbols: List[str], redundant: bool = True, ws_app_factory=None, on_update=None,
+                 name: str = 'dual'):
+        """
+        Args:
+            symbols (list): Symbols to stream
+            redundant (bool): Subscribe every symbol on two connections instead of one
+            ws_app_factory (callable or list, optional): WebSocketApp-compatible constructor,
+                or one per feed (e.g. LocalFeedSimulator.app_factory with different delays)
+            on_update (callable, optional): Called as on_update(symbol, u, recv_ns, feed_id) for every applied update
+            name (str): Client label on the dual_feed_* metrics
+        """
         self.ws_url = "wss://stream.bybit.com/v5/public/spot"
         self.symbols = symbols
         self.orderbooks = {symbol: {} for symbol in symbols}
         self.running = False
+        self.feed_count = 2 if redundant else 1
+        if not isinstance(ws_app_factory, (list, tuple)):
+            ws_app_factory = [ws_app_factory or websocket.WebSocketApp] * self.feed_count
+        self.ws_app_factories = list(ws_app_factory)
+        self.on_update = on_update
+        self.lock = threading.Lock()
+        self.connections = {}
+
+        # symbol -> {u: (recv_ns, feed_id)} for recent winners, to time the losing copy
+        self.arrivals: Dict[str, Dict[int, tuple]] = {symbol: {} for symbol in symbols}
+        self.arrival_window = 512
+        self.metric_wins = [REGISTRY.counter('dual_feed_wins_total', 'Updates first delivered by this feed',
+                                             {'client': name, 'feed': feed_id}) for feed_id in range(self.feed_count)]
+        self.metric_duplicates = [REGISTRY.counter('dual_feed_duplicates_total', 'Late copies dropped from this feed',
+                                                   {'client': name, 'feed': feed_id}) for feed_id in range(self.feed_count)]
+        self.metric_lead = [REGISTRY.histogram('dual_feed_lead_seconds', 'How far this feed was ahead when it won',
+                                               {'client': name, 'feed': feed_id}, buckets=LEAD_BUCKETS)
+                            for feed_id in range(self.feed_count)]
 
     def _get_subscribe_message(self, symbols: List[str]) -> Dict:
         return {
@@ -18,6 +65,34 @@ class DualSocketClient:
             "args": [f"orderbook.50.{symbol}" for symbol in symbols]
         }
 
+    @staticmethod
+    def _peek_update(message: str):
+        """
+        Read (symbol, u, is_snapshot) straight from the raw message without decoding it
+
+        Returns:
+            tuple: (symbol, u, is_snapshot), or None when the message is not an orderbook update
+        """
+        start = message.find('"topic":')
+        if start < 0:
+            return None
+        start = message.find('"', start + 8) + 1
+        topic = message[start:message.find('"', start)]
+        if not topic.startswith('orderbook.'):
+            return None
+        start = message.find('"u":')
+        if start < 0:
+            return None
+        start += 4
+        while message[start] == ' ':
+            start += 1
+        end = start
+        while message[end].isdigit():
+            end += 1
+        kind = message.find('"type":')
+        is_snapshot = kind >= 0 and message.startswith('snapshot', message.find('"', kind + 7) + 1)
+        return topic.rsplit('.', 1)[1], int(message[start:end]), is_snapshot
+
     def _update_orderbook(self, symbol: str, bids: List, asks: List):
         if symbol not in self.orderbooks:
             self.orderbooks[symbol] = {'bids': {}, 'asks': {}}
@@ -38,7 +113,7 @@ class DualSocketClient:
             else:
                 self.orderbooks[symbol]['asks'].pop(price, None)
 
-    def _process_orderbook(self, data: Dict):
+    def _process_orderbook(self, data: Dict, feed_id: int = 0):
         book_data = data.get('data', {})
         symbol = book_data.get('s', '')
         bids = book_data.get('b', [])
@@ -49,7 +124,10 @@ class DualSocketClient:
                 'bids': {float(price): float(qty) for price, qty in bids if float(qty) > 0},
                 'asks': {float(price): float(qty) for price, qty in asks if float(qty) > 0},
                 'u': book_data.get('u', 0),
-                'seq': book_data.get('seq', 0)
+                'seq': book_data.get('seq', 0),
+                'snapshot_u': book_data.get('u', 0),
+                # Feeds that delivered this snapshot; another copy from one of them is a new snapshot
+                'snapshot_feeds': {feed_id}
             }
         elif data.get('type') == 'delta':
             self._update_orderbook(symbol, bids, asks)
@@ -58,26 +136,75 @@ class DualSocketClient:
                 'seq': book_data.get('seq', 0)
             })
 
-    def _on_message(self, ws, message):
+    def _record_duplicate(self, feed_id: int, symbol: str, u: int, recv_ns: int):
+        self.metric_duplicates[feed_id].inc()
+        winner = self.arrivals.get(symbol, {}).pop(u, None)
+        if winner is not None and winner[1] != feed_id:
+            self.metric_lead[winner[1]].observe((recv_ns - winner[0]) / 1e9)
+
+    def _on_message(self, feed_id: int, ws, message):
+        recv_ns = time.monotonic_ns()
         try:
-            data = json.loads(message)
-            if 'topic' in data and 'orderbook' in data['topic']:
-                self._process_orderbook(data)
+            peeked = self._peek_update(message)
+            if peeked is None:
+                data = json.loads(message)
+                if 'topic' in data and 'orderbook' in data['topic']:
+                    with self.lock:
+                        self._process_orderbook(data)
+                return
+
+            symbol, u, is_snapshot = peeked
+            with self.lock:
+                book = self.orderbooks.get(symbol)
+                restarted = False
+                if book and 'bids' in book:
+                    if not is_snapshot:
+                        # An update id already applied means the other feed got there first. After a
+                        # restart, a feed that has not sent the new snapshot yet still has old deltas in flight
+                        duplicate = book['u'] >= u or (book.get('restarted') and feed_id not in book['snapshot_feeds'])
+                    elif u == book.get('snapshot_u') and feed_id not in book['snapshot_feeds']:
+                        # The other feed's copy of the snapshot in effect; the same feed sending it
+                        # again (e.g. two restarts in a row) is a new snapshot
+                        duplicate = True
+                    else:
+                        # u=1 follows a service restart and replaces the book whatever was stored
+                        duplicate = u != 1 and u <= book['u']
+                        restarted = u < book['u']
+                    if duplicate:
+                        if is_snapshot:
+                            # This feed's next deltas follow its own snapshot, they are current
+                            book.setdefault('snapshot_feeds', set()).add(feed_id)
+                        self._record_duplicate(feed_id, symbol, u, recv_ns)
+                        return
+                self._process_orderbook(json.loads(message), feed_id)
+                if is_snapshot:
+                    self.orderbooks[symbol]['restarted'] = restarted
+                self.metric_wins[feed_id].inc()
+                if self.feed_count > 1:
+                    arrivals = self.arrivals.setdefault(symbol, {})
+                    arrivals[u] = (recv_ns, feed_id)
+                    if len(arrivals) > self.arrival_window:
+                        del arrivals[next(iter(arrivals))]
+            if self.on_update:
+                self.on_update(symbol, u, recv_ns, feed_id)
         except Exception as e:
             print(f"Error: {e}")
 
-    def _ws_thread(self):
+    def _ws_thread(self, feed_id: int):
         def on_open(ws):
-            ws.send(json.dumps(self._get_subscribe_message(self.symbols)))
-            print("WebSocket connected")
+            # Spot accepts at most 10 topics per subscribe request
+            for i in range(0, len(self.symbols), 10):
+                ws.send(json.dumps(self._get_subscribe_message(self.symbols[i:i + 10])))
+            print(f"WebSocket feed {feed_id} connected")
 
-        self.ws = websocket.WebSocketApp(
+        ws = self.ws_app_factories[feed_id](
             self.ws_url,
-            on_message=self._on_message,
+            on_message=lambda ws, message: self._on_message(feed_id, ws, message),
             on_open=on_open
         )
+        self.connections[feed_id] = ws
 
-        self.ws.run_forever(
+        ws.run_forever(
             sslopt={"cert_reqs": ssl.CERT_NONE},
             ping_interval=20,
             ping_timeout=10
@@ -85,14 +212,38 @@ class DualSocketClient:
 
     def start(self):
         self.running = True
-        self.ws_thread = threading.Thread(target=self._ws_thread)
-        self.ws_thread.daemon = True
-        self.ws_thread.start()
+        self.ws_threads = []
+        for feed_id in range(self.feed_count):
+            thread = threading.Thread(target=self._ws_thread, args=(feed_id,))
+            thread.daemon = True
+            thread.start()
+            self.ws_threads.append(thread)
 
     def stop(self):
         self.running = False
-        if hasattr(self, 'ws'):
-            self.ws.close()
+        for ws in list(self.connections.values()):
+            ws.close()
+
+    def get_feed_stats(self) -> Dict:
+        """
+        Win ratio per feed and the distribution of how far the winner was ahead
+
+        Returns:
+            dict: Per-feed wins, duplicates dropped, win ratio and lead histogram (bucket upper bound in ms -> count)
+        """
+        total_wins = sum(counter.value for counter in self.metric_wins) or 1
+        stats = {}
+        for feed_id in range(self.feed_count):
+            lead = self.metric_lead[feed_id]
+            bounds = [f"{bound * 1000:g}" for bound in lead.buckets] + ['inf']
+            stats[feed_id] = {
+                'wins': self.metric_wins[feed_id].value,
+                'duplicates': self.metric_duplicates[feed_id].value,
+                'win_ratio': round(self.metric_wins[feed_id].value / total_wins, 4),
+                'mean_lead_ms': round(lead.sum / lead.count * 1000, 3) if lead.count else 0.0,
+                'lead_histogram_ms': dict(zip(bounds, lead.counts))
+            }
+        return stats
 
     def get_orderbook(self, symbol: str) -> Dict:
         return self.orderbooks.get(symbol, {})
@@ -147,6 +298,9 @@ if __name__ == "__main__":
         
         while True:
             client.print_orderbooks()
+            for feed_id, stats in client.get_feed_stats().items():
+                print(f"Feed {feed_id}: win ratio {stats['win_ratio']:.2%}, "
+                      f"duplicates dropped {stats['duplicates']}, mean lead {stats['mean_lead_ms']} ms")
             time.sleep(1)  # Reduced to 1 second
             print("\033[2J\033[H")  # Clear screen
             
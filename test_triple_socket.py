@@ -1,3 +1,4 @@
+import itertools
 import json
 import websocket
 from typing import Dict, List
@@ -7,107 +8,264 @@ import time
 from datetime import datetime
 from pprint import pprint
 import os
-from collections import deque
-import threading
+import random
 import logging
+from top_of_book import TopOfBook
+from metrics import REGISTRY, start_metrics_server
+from update_scheduler import DirtySymbolScheduler
+from profiling import ProfilingControl
+from symbol_placement import lpt_placement
+from request_scheduler import TokenBucket
+from runtime_config import RUNTIME
+
+
+class SubscriptionPacer:
+    """
+    Subscribe/unsubscribe request budget shared by all of a client's sockets.
+
+    A thousand symbols are a hundred 10-topic requests; the bucket lets the first burst
+    out at once and spreads the rest at rate requests per second across connections.
+    """
+    def __init__(self, rate: float = 20.0, burst: int = 10, client_name: str = 'default'):
+        self.bucket = TokenBucket(rate, burst)
+        self.lock = threading.Lock()
+        self.metric_wait = REGISTRY.histogram('bybit_ws_subscribe_wait_seconds', 'Time a subscribe request was held back',
+                                              {'client': client_name})
+
+    def acquire(self):
+        """Block until the next request may be sent"""
+        start = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = self.bucket.wait_time(now)
+                if wait <= 0:
+                    self.bucket.take(now)
+                    break
+            time.sleep(wait)
+        self.metric_wait.observe(time.monotonic() - start)
 
 
 class SymbolWebSocket:
-    def __init__(self, symbols: List[str], socket_id: int, orderbooks: Dict, update_queue: deque):
+    # Serialises the publishes of a symbol changing socket; the only time two sockets stream the same symbol
+    handover_lock = threading.Lock()
+
+    def __init__(self, symbols: List[str], socket_id: int, orderbooks: Dict, scheduler: DirtySymbolScheduler,
+                 top_of_book: TopOfBook = None, on_disconnect=None, standby: bool = False,
+                 subscribe_batch_delay: float = 0.05, backoff_base: float = 0.5, backoff_cap: float = 30.0,
+                 ws_app_factory=None, depths: Dict[str, int] = None, default_depth: int = 50,
+                 pacer: SubscriptionPacer = None, on_empty=None, client_name: str = 'default'):
         self.ws_url = "wss://stream.bybit.com/v5/public/spot"
         self.symbols = symbols
+        self.symbol_set = set(symbols)
         self.socket_id = socket_id
         self.orderbooks = orderbooks
-        self.update_queue = update_queue
+        self.scheduler = scheduler
+        self.top_of_book = top_of_book
         self.ws = None
+        # WebSocketApp-compatible constructor, e.g. LocalFeedSimulator.app_factory() in benchmarks
+        self.ws_app_factory = ws_app_factory or websocket.WebSocketApp
         self.running = False
-        self.lock = threading.Lock()
-
-    def _get_subscribe_message(self) -> Dict:
+        self.connected = False
+        self.first_subscribe_ns = None
+        # Called with this socket when an established connection drops (used for standby takeover)
+        self.on_disconnect = on_disconnect
+        self.standby = standby
+        self.subscribe_batch_delay = subscribe_batch_delay
+        # Shared request budget; without one, batches are spaced by subscribe_batch_delay
+        self.pacer = pacer
+        # Called with this socket when its last symbol is released to another socket
+        self.on_empty = on_empty
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        # Outage bookkeeping: start of the current outage and the closed incidents
+        self.outage_started_ns = None
+        self.outage_recovery = None
+        self.outages = []
+        # symbol -> [update count, first receive ns, last receive ns]
+        self.update_stats = {}
+        # Depth tier per symbol (orderbook.1 / 50 / 200), shared with the client
+        self.depths = depths if depths is not None else {}
+        self.default_depth = default_depth
+        # symbol -> topic whose messages are applied, and the deeper/shallower topic replacing it
+        self.topics: Dict[str, str] = {}
+        self.pending_topics: Dict[str, str] = {}
+        # Topics switched away from; their in-flight messages are dropped
+        self.retired_topics = set()
+        # symbol -> socket still streaming it until this socket's snapshot arrives (see adopt)
+        self.handover: Dict[str, 'SymbolWebSocket'] = {}
+        # Symbols another socket adopted from this one; their publishes go through handover_lock,
+        # including messages already in flight when the symbol was released
+        self.handing_over = set()
+
+        # Socket ids restart at 1 in every client, so the client label keeps their series apart
+        labels = {'client': client_name, 'socket': str(socket_id)}
+        self.metric_messages = REGISTRY.counter('bybit_ws_messages_total', 'Messages received per socket', labels)
+        self.metric_decode = REGISTRY.histogram('bybit_ws_decode_seconds', 'JSON decode time per message', labels)
+        self.metric_apply = REGISTRY.histogram('bybit_ws_apply_seconds', 'Orderbook apply time per message', labels)
+        self.metric_request_failures = REGISTRY.counter('bybit_ws_request_failures_total',
+                                                        'Subscribe/unsubscribe requests rejected by the exchange', labels)
+
+    @staticmethod
+    def _request_messages(op: str, args: List[str]) -> List[Dict]:
         # Bybit has a limit of 10 topics per subscription
         MAX_TOPICS = 10
-        symbols_batch = self.symbols[:MAX_TOPICS]
-        
-        return {
-            "op": "subscribe",
-            "args": [f"orderbook.50.{symbol}" for symbol in symbols_batch]
+        return [{"op": op, "args": args[i:i + MAX_TOPICS]} for i in range(0, len(args), MAX_TOPICS)]
+
+    def _get_subscribe_messages(self) -> List[Dict]:
+        """Subscribe requests covering every symbol of this socket at its depth tier"""
+        return self._request_messages("subscribe", [self._topic(symbol) for symbol in self.symbols])
+
+    def _record_update(self, symbol: str, recv_ns: int):
+        stats = self.update_stats.get(symbol)
+        if stats is None:
+            self.update_stats[symbol] = [1, recv_ns, recv_ns]
+        else:
+            stats[0] += 1
+            stats[2] = recv_ns
+
+    def _publish(self, symbol: str, bids: tuple, asks: tuple, ts: int, recv_ns: int):
+        """
+        Publish a new immutable version of a book with a single reference swap.
+
+        Each symbol is written by exactly one socket thread, and readers only ever see a
+        complete version, so neither side takes a lock. Published books and their level
+        tuples must be treated as read-only.
+
+        While another socket adopts a symbol, both receive it. The old owner then publishes
+        under handover_lock and only while it still owns the symbol, so once the new owner
+        has published its snapshot and released it, no older book can overwrite it.
+        """
+        if symbol in self.handing_over:
+            with self.handover_lock:
+                if symbol not in self.symbol_set:
+                    return
+                self._write_book(symbol, bids, asks, ts, recv_ns)
+        else:
+            self._write_book(symbol, bids, asks, ts, recv_ns)
+        self._record_update(symbol, recv_ns)
+
+        if self.top_of_book:
+            self.top_of_book.update(symbol, bids, asks)
+
+        # Signal update
+        self.scheduler.mark(symbol)
+
+    def _write_book(self, symbol: str, bids: tuple, asks: tuple, ts: int, recv_ns: int):
+        self.orderbooks[symbol] = {
+            'bids': bids,
+            'asks': asks,
+            'socket_id': self.socket_id,
+            'ts': ts,
+            'recv_ns': recv_ns
         }
 
-    def _update_orderbook(self, symbol: str, bids: List, asks: List):
-        with self.lock:
-            if symbol not in self.orderbooks:
-                self.orderbooks[symbol] = {
-                    'bids': [],
-                    'asks': [],
-                    'socket_id': self.socket_id,
-                    'timestamp': datetime.now().isoformat()
-                }
-
-            # Convert existing bids/asks to dictionary for efficient updates
-            current_bids = {float(price): float(qty) for price, qty in self.orderbooks[symbol]['bids']}
-            current_asks = {float(price): float(qty) for price, qty in self.orderbooks[symbol]['asks']}
-
-            # Update bids
-            for price, qty in bids:
-                price, qty = float(price), float(qty)
-                if qty > 0:
-                    current_bids[price] = qty
-                else:
-                    current_bids.pop(price, None)
-
-            # Update asks
-            for price, qty in asks:
-                price, qty = float(price), float(qty)
-                if qty > 0:
-                    current_asks[price] = qty
-                else:
-                    current_asks.pop(price, None)
-
-            # Convert back to sorted lists
-            self.orderbooks[symbol]['bids'] = [
-                [price, qty]
-                for price, qty in sorted(current_bids.items(), reverse=True)
-            ]
-            self.orderbooks[symbol]['asks'] = [
-                [price, qty]
-                for price, qty in sorted(current_asks.items())
-            ]
-
-            # Update timestamp
-            self.orderbooks[symbol]['timestamp'] = datetime.now().isoformat()
+    def _update_orderbook(self, symbol: str, bids: List, asks: List, ts: int = 0, recv_ns: int = 0):
+        # Live books stay keyed by float(price) on purpose. The same exchange string always parses
+        # to the same float, so deltas find their level; exactness only matters at the order
+        # boundary, where walllet_connect rounds through InstrumentScale. Fixed-point levels
+        # measured 3-6x slower to parse and apply (benchmark.py fixed_point), and TopOfBook, the
+        # calculators and the history files all read float64.
+        current = self.orderbooks.get(symbol)
+
+        # Convert existing bids/asks to dictionary for efficient updates
+        current_bids = dict(current['bids']) if current else {}
+        current_asks = dict(current['asks']) if current else {}
+
+        # Update bids
+        for price, qty in bids:
+            price, qty = float(price), float(qty)
+            if qty > 0:
+                current_bids[price] = qty
+            else:
+                current_bids.pop(price, None)
+
+        # Update asks
+        for price, qty in asks:
+            price, qty = float(price), float(qty)
+            if qty > 0:
+                current_asks[price] = qty
+            else:
+                current_asks.pop(price, None)
+
+        # Convert back to sorted (price, qty) tuples and publish as a new version
+        self._publish(
+            symbol,
+            tuple(sorted(current_bids.items(), reverse=True)),
+            tuple(sorted(current_asks.items())),
+            ts,
+            recv_ns
+        )
 
-            # Signal update
-            self.update_queue.append(symbol)
+    def _end_outage(self, recv_ns: int):
+        self.outages.append({
+            'socket_id': self.socket_id,
+            'symbols': len(self.symbols),
+            'duration_ms': round((recv_ns - self.outage_started_ns) / 1e6, 1),
+            'recovery': self.outage_recovery or 'reconnect',
+            'ended_at': datetime.now().isoformat()
+        })
+        print(f"Socket {self.socket_id} recovered after {self.outages[-1]['duration_ms']} ms "
+              f"({self.outages[-1]['recovery']})")
+        self.outage_started_ns = None
+        self.outage_recovery = None
 
     def _on_message(self, ws, message):
+        recv_ns = time.monotonic_ns()
+        self.metric_messages.inc()
         try:
             data = json.loads(message)
+            decoded_ns = time.monotonic_ns()
+            self.metric_decode.observe((decoded_ns - recv_ns) / 1e9)
             
             # Handle subscription responses
-            if 'op' in data and data['op'] == 'subscribe':
-                print(f"Socket {self.socket_id} subscription response: {message}")
+            if data.get('op') in ('subscribe', 'unsubscribe'):
+                print(f"Socket {self.socket_id} {data['op']} response: {message}")
                 if not data.get('success'):
-                    print(f"Socket {self.socket_id} subscription failed: {data.get('ret_msg')}")
+                    self.metric_request_failures.inc()
+                    print(f"Socket {self.socket_id} {data['op']} failed: {data.get('ret_msg')}")
                 return
 
             # Handle orderbook data
             if 'topic' in data and 'orderbook' in data['topic']:
                 book_data = data.get('data', {})
                 symbol = book_data.get('s', '')
+                if symbol not in self.symbol_set:
+                    return  # In flight after an unsubscribe
+                topic = data['topic']
+                if topic in self.retired_topics:
+                    return  # In flight after a depth change
+                previous_owner = None
+                if symbol in self.pending_topics and topic == self.pending_topics.get(symbol):
+                    if data.get('type') != 'snapshot':
+                        return
+                    self._switch_topic(ws, symbol, topic)
+                    previous_owner = self.handover.pop(symbol, None)
+                if self.outage_started_ns is not None:
+                    self._end_outage(recv_ns)
                 bids = book_data.get('b', [])
                 asks = book_data.get('a', [])
 
                 if data.get('type') == 'snapshot':
-                    with self.lock:
-                        self.orderbooks[symbol] = {
-                            'bids': [[float(price), float(qty)] for price, qty in bids if float(qty) > 0],
-                            'asks': [[float(price), float(qty)] for price, qty in asks if float(qty) > 0],
-                            'socket_id': self.socket_id,
-                            'timestamp': datetime.now().isoformat()
-                        }
-                    self.update_queue.append(symbol)
+                    parsed_bids = ((float(price), float(qty)) for price, qty in bids)
+                    parsed_asks = ((float(price), float(qty)) for price, qty in asks)
+                    snapshot = (
+                        symbol,
+                        tuple(level for level in parsed_bids if level[1] > 0),
+                        tuple(level for level in parsed_asks if level[1] > 0),
+                        data.get('ts', 0),
+                        recv_ns
+                    )
+                    if previous_owner:
+                        # Publish and take ownership in one step, see _publish
+                        with self.handover_lock:
+                            self._publish(*snapshot)
+                            previous_owner.release([symbol])
+                    else:
+                        self._publish(*snapshot)
                 elif data.get('type') == 'delta':
-                    self._update_orderbook(symbol, bids, asks)
+                    self._update_orderbook(symbol, bids, asks, data.get('ts', 0), recv_ns)
+                self.metric_apply.observe((time.monotonic_ns() - decoded_ns) / 1e9)
 
         except Exception as e:
             print(f"Error in Socket {self.socket_id}: {e}")
@@ -122,39 +280,204 @@ class SymbolWebSocket:
         print(f"Close status code: {close_status_code}")
         print(f"Close message: {close_msg}")
         print(f"Affected symbols: {self.symbols}")
-        if self.running:
-            print(f"Attempting to reconnect Socket {self.socket_id}...")
-            time.sleep(5)
-            self._ws_thread()
+        was_connected = self.connected
+        self.connected = False
+        if self.running and self.symbols and self.outage_started_ns is None:
+            self.outage_started_ns = time.monotonic_ns()
+        # Reconnecting is left to the loop in _ws_thread, never done from inside this callback
+        if self.running and was_connected and self.on_disconnect:
+            self.on_disconnect(self)
+
+    def _topic(self, symbol: str) -> str:
+        return f"orderbook.{self.depths.get(symbol, self.default_depth)}.{symbol}"
+
+    def _send_args(self, ws, op: str, args: List[str]):
+        for i, subscribe_msg in enumerate(self._request_messages(op, args)):
+            if self.pacer:
+                self.pacer.acquire()
+            elif i:
+                # Add a small delay between batches to avoid overwhelming the server
+                time.sleep(self.subscribe_batch_delay)
+            print(f"{datetime.now().strftime('%H:%M:%S.%f')} Socket {self.socket_id} {op} batch {i + 1}: {json.dumps(subscribe_msg)}")
+            ws.send(json.dumps(subscribe_msg))
+            if op == "subscribe" and self.first_subscribe_ns is None:
+                self.first_subscribe_ns = time.monotonic_ns()
+
+    def _send_topics(self, ws, op: str, symbols: List[str]):
+        if op == "subscribe":
+            args = []
+            for symbol in symbols:
+                topic = self.topics[symbol] = self._topic(symbol)
+                self.pending_topics.pop(symbol, None)
+                self.retired_topics.discard(topic)
+                args.append(topic)
+        else:
+            args = [topic for symbol in symbols
+                    for topic in (self.topics.pop(symbol, None), self.pending_topics.pop(symbol, None)) if topic]
+        self._send_args(ws, op, args)
+
+    def _switch_topic(self, ws, symbol: str, topic: str):
+        """The new tier's snapshot arrived: apply it from now on and drop the old stream"""
+        old_topic = self.topics.get(symbol)
+        self.topics[symbol] = topic
+        self.pending_topics.pop(symbol, None)
+        if old_topic and old_topic != topic:
+            self.retired_topics.add(old_topic)
+            self._send_args(ws, "unsubscribe", [old_topic])
+
+    def set_depths(self, depths: Dict[str, int]):
+        """
+        Move symbols to another depth tier without a gap in their books
+
+        The new topic is subscribed alongside the old one and only replaces it once its
+        snapshot has arrived (make-before-break); the old topic is then unsubscribed.
+
+        Args:
+            depths (dict): symbol -> 1, 50 or 200, for symbols on this socket
+        """
+        subscribe, unsubscribe = [], []
+        for symbol, depth in depths.items():
+            if symbol not in self.symbol_set:
+                continue
+            self.depths[symbol] = depth
+            if not self.connected:
+                continue  # _on_open subscribes at the new depth
+            topic = self._topic(symbol)
+            pending = self.pending_topics.pop(symbol, None)
+            if pending and pending != topic:
+                self.retired_topics.add(pending)
+                unsubscribe.append(pending)
+            if topic == self.topics.get(symbol):
+                continue
+            self.pending_topics[symbol] = topic
+            self.retired_topics.discard(topic)
+            if topic != pending:
+                subscribe.append(topic)
+        if subscribe:
+            self._send_args(self.ws, "subscribe", subscribe)
+        if unsubscribe:
+            self._send_args(self.ws, "unsubscribe", unsubscribe)
 
     def _on_open(self, ws):
-        # Split subscriptions into batches of 10
-        MAX_TOPICS = 10
-        for i in range(0, len(self.symbols), MAX_TOPICS):
-            symbols_batch = self.symbols[i:i + MAX_TOPICS]
-            subscribe_msg = {
-                "op": "subscribe",
-                "args": [f"orderbook.50.{symbol}" for symbol in symbols_batch]
-            }
-            print(f"{datetime.now().strftime('%H:%M:%S.%f')} Socket {self.socket_id} subscribing batch {i//MAX_TOPICS + 1}: {json.dumps(subscribe_msg)}")
-            ws.send(json.dumps(subscribe_msg))
-            # Add a small delay between batches to avoid overwhelming the server
-            time.sleep(0.5)
+        self.connected = True
+        # A new connection starts without subscriptions
+        self.topics, self.pending_topics, self.retired_topics = {}, {}, set()
+        # Moves still waiting for a snapshot are completed by resubscribing everything below
+        handover, self.handover = self.handover, {}
+        for symbol, previous_owner in handover.items():
+            previous_owner.release([symbol])
+        self._send_topics(ws, "subscribe", list(self.symbols))
+
+    def subscribe(self, symbols: List[str]):
+        """Add symbols to this socket, subscribing on the live connection if there is one"""
+        new_symbols = [symbol for symbol in symbols if symbol not in self.symbol_set]
+        self.symbols.extend(new_symbols)
+        self.symbol_set.update(new_symbols)
+        self.handing_over.difference_update(new_symbols)
+        if new_symbols and self.connected:
+            self._send_topics(self.ws, "subscribe", new_symbols)
+
+    def unsubscribe(self, symbols: List[str]):
+        """Stop streaming symbols on this socket and drop their books"""
+        removed = [symbol for symbol in symbols if symbol in self.symbol_set]
+        for symbol in removed:
+            self.symbol_set.discard(symbol)
+            self.symbols.remove(symbol)
+            self.orderbooks.pop(symbol, None)
+            self.update_stats.pop(symbol, None)
+            if self.top_of_book:
+                self.top_of_book.clear(symbol)
+        if removed and self.connected:
+            self._send_topics(self.ws, "unsubscribe", removed)
+
+    def adopt(self, symbols: List[str], source: 'SymbolWebSocket'):
+        """
+        Move symbols from another socket without a gap in their books
+
+        The symbols are subscribed here as pending topics; source keeps applying their
+        updates until this socket's snapshot arrives, and is only then told to release
+        them (make-before-break, as in set_depths).
+        """
+        new_symbols = [symbol for symbol in symbols if symbol not in self.symbol_set]
+        if not new_symbols:
+            return
+        if not self.connected:
+            source.release(new_symbols)
+            self.subscribe(new_symbols)  # _on_open subscribes them
+            return
+        self.symbols.extend(new_symbols)
+        self.symbol_set.update(new_symbols)
+        self.handing_over.difference_update(new_symbols)
+        topics = []
+        for symbol in new_symbols:
+            topic = self.pending_topics[symbol] = self._topic(symbol)
+            self.retired_topics.discard(topic)
+            self.handover[symbol] = source
+            source.handing_over.add(symbol)
+            topics.append(topic)
+        self._send_args(self.ws, "subscribe", topics)
+
+    def release(self, symbols: List[str]):
+        """Stop streaming symbols another socket has taken over; unlike unsubscribe, their books are kept"""
+        released = [symbol for symbol in symbols if symbol in self.symbol_set]
+        for symbol in released:
+            self.symbol_set.discard(symbol)
+            self.symbols.remove(symbol)
+            self.update_stats.pop(symbol, None)
+        if released and self.connected:
+            self._send_topics(self.ws, "unsubscribe", released)
+        if released and not self.symbols and self.on_empty:
+            self.on_empty(self)
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter, so sockets dropped together do not reconnect in lockstep"""
+        return min(self.backoff_cap, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
 
     def _ws_thread(self):
-        self.ws = websocket.WebSocketApp(
-            self.ws_url,
-            on_message=self._on_message,
-            on_open=self._on_open,
-            on_error=self._on_error,
-            on_close=self._on_close
-        )
-
-        self.ws.run_forever(
-            sslopt={"cert_reqs": ssl.CERT_NONE},
-            ping_interval=20,
-            ping_timeout=10
-        )
+        RUNTIME.pin('ingest')
+        attempt = 0
+        while self.running:
+            self.ws = self.ws_app_factory(
+                self.ws_url,
+                # Looked up per message so profiling timers can be swapped in on a live socket
+                on_message=lambda ws, message: self._on_message(ws, message),
+                on_open=self._on_open,
+                on_error=self._on_error,
+                on_close=self._on_close
+            )
+
+            messages_before = self.metric_messages.value
+            self.ws.run_forever(
+                sslopt={"cert_reqs": ssl.CERT_NONE},
+                ping_interval=20,
+                ping_timeout=10
+            )
+            if not self.running:
+                break
+
+            # A connection that delivered data resets the backoff
+            if self.metric_messages.value > messages_before:
+                attempt = 0
+            delay = self._backoff_delay(attempt)
+            attempt += 1
+            print(f"Reconnecting Socket {self.socket_id} in {delay:.2f}s (attempt {attempt})")
+            time.sleep(delay)
+
+    def take_over(self, failed: 'SymbolWebSocket'):
+        """
+        Standby takeover: adopt the subscriptions of a failed socket on this live connection
+
+        The symbol list object itself moves across, so anything holding a reference to it
+        (MultiSocketClient.socket_symbols) now points at this socket.
+        """
+        self.symbols, failed.symbols = failed.symbols, self.symbols
+        self.symbol_set, failed.symbol_set = set(self.symbols), set(failed.symbols)
+        self.standby, failed.standby = False, True
+        self.outage_started_ns, failed.outage_started_ns = failed.outage_started_ns, None
+        self.outage_recovery = 'standby'
+        failed.topics, failed.pending_topics, failed.retired_topics = {}, {}, set()
+        print(f"Standby Socket {self.socket_id} taking over {len(self.symbols)} symbols from Socket {failed.socket_id}")
+        self._send_topics(self.ws, "subscribe", list(self.symbols))
 
     def start(self):
         self.running = True
@@ -169,41 +492,66 @@ class SymbolWebSocket:
 
 
 class MultiSocketClient:
+    _instances = itertools.count(1)
+
     def __init__(self, symbols: List[str], trading_amounts: Dict[str, float] = None, default_amount: float = 10000,
-                 max_pairs_per_socket: int = 150):
-        self.all_symbols = symbols
+                 max_pairs_per_socket: int = 150, history_writer=None, standby_sockets: int = 0,
+                 ws_app_factory=None, depths: Dict[str, int] = None, default_depth: int = 50,
+                 symbol_rates: Dict[str, float] = None, min_sockets: int = 3, subscribe_rate: float = 20.0,
+                 subscribe_burst: int = 10, name: str = None):
+        self.all_symbols = list(symbols)
+        # Label on every metric of this client's sockets and scheduler, so two clients in one process
+        # (e.g. a benchmark next to the live feed) do not update the same series
+        self.name = name or f"client{next(MultiSocketClient._instances)}"
+        # Expected messages per second per symbol (e.g. a previous LoadBalancer.rates), for the initial placement
+        self.symbol_rates = symbol_rates
+        # Sockets are added beyond min_sockets as needed; keep max_pairs_per_socket below the exchange's
+        # per-connection topic limit, depth switches and moves briefly hold two topics for one symbol
         self.max_pairs_per_socket = max_pairs_per_socket
+        self.min_sockets = min_sockets
+        self.pacer = SubscriptionPacer(subscribe_rate, subscribe_burst, client_name=self.name)
+        # Re-entrant: a move to a socket that is not connected releases, and may retire, the source inline
+        self.universe_lock = threading.RLock()
         self.orderbooks = {}
         self.sockets = []
-        self.update_queue = deque(maxlen=1000)  # Store updates
+        self.scheduler = DirtySymbolScheduler(name=self.name)  # Coalesced per-consumer dirty sets
+        self.top_of_book = TopOfBook(symbols)
         self.socket_symbols = self._distribute_symbols()
         self.trading_amounts = trading_amounts or {}
         self.default_amount = default_amount
-        self.lock = threading.Lock()
+        # Optional BookHistoryWriter sampling the books at its own cadence
+        self.history_writer = history_writer
+        # Pre-connected sockets without subscriptions, ready to adopt a failed socket's symbols
+        self.standby_count = standby_sockets
+        self.ws_app_factory = ws_app_factory
+        # Per-symbol subscription depth tier; symbols not listed use default_depth
+        self.depths = dict(depths or {})
+        self.default_depth = default_depth
+        self.started = False
+        # Sockets whose symbols are being moved off so they can be closed
+        self.retiring = set()
 
         # Start JSON writer thread
         self.json_writer_running = True
+        self.json_writer_interval = 0.1  # Minimum time between two rewrites of result.json
+        self.json_writer_cursor = self.scheduler.register('json_writer')
         self.json_writer_thread = threading.Thread(target=self._json_writer_task)
         self.json_writer_thread.daemon = True
         self.json_writer_thread.start()
 
     def _json_writer_task(self):
         """Continuously write updates to JSON file"""
+        RUNTIME.pin('background')
         # Create the directory if it doesn't exist
         os.makedirs('test_triple_socket', exist_ok=True)
         
         while self.json_writer_running:
-            if len(self.update_queue) > 0:
-                with self.lock:
-                    # Filter orderbooks with sufficient liquidity
-                    valid_orderbooks = {}
-                    for symbol, book in self.orderbooks.items():
-                            valid_orderbooks[symbol] = {
-                                **book # Include all existing book data
-                            }
-
-                # Get total number of pairs from load_trading_pairs
-                expected_pairs = set(load_trading_pairs())  # All trading pairs
+            if self.json_writer_cursor.wait(timeout=1.0):
+                last_write = time.monotonic()
+                valid_orderbooks = self.get_orderbooks()
+
+                # Pairs in the current universe
+                expected_pairs = set(self.all_symbols)
                 actual_pairs = len(valid_orderbooks)
                 monitored_pairs = set(valid_orderbooks.keys())  # Pairs being monitored
                 unmonitored_pairs = list(expected_pairs - monitored_pairs)  # Pairs not being monitored
@@ -213,7 +561,7 @@ class MultiSocketClient:
                     'trading_amount_usdt': self.default_amount,
                     'total_pairs': actual_pairs,
                     'pairs not monitored by test_triple_socket': unmonitored_pairs,
-                    'number of pairs uploaded initially': len(load_trading_pairs()),
+                    'number of pairs in universe': len(expected_pairs),
                     'socket_distribution': {
                         f'socket_{i + 1}': len(symbols)
                         for i, symbols in enumerate(self.socket_symbols)
@@ -227,28 +575,29 @@ class MultiSocketClient:
                 except Exception as e:
                     print(f"Error saving to JSON: {e}")
 
-                # Clear processed updates
-                self.update_queue.clear()
+                # Updates arriving meanwhile stay coalesced in the cursor until the next write
+                time.sleep(max(0.0, self.json_writer_interval - (time.monotonic() - last_write)))
 
-            time.sleep(0.1)  # Small delay to prevent CPU overuse
 
 
+    def _sockets_needed(self, symbols: int) -> int:
+        return max(self.min_sockets, -(-symbols // self.max_pairs_per_socket))
 
     def _distribute_symbols(self) -> List[List[str]]:
-        """Distribute symbols evenly across 3 sockets"""
+        """Distribute symbols evenly across as many sockets as max_pairs_per_socket requires (at least min_sockets)"""
+        connections = self._sockets_needed(len(self.all_symbols))
+        if self.symbol_rates:
+            # Weighted by message rate, so hot pairs do not share a receive thread
+            return lpt_placement({symbol: self.symbol_rates.get(symbol) for symbol in self.all_symbols}, connections,
+                                 self.max_pairs_per_socket)
+
         socket_symbols = []
         total_symbols = len(self.all_symbols)
-
-        if total_symbols > self.max_pairs_per_socket * 3:
-            print(f"Warning: Total pairs ({total_symbols}) exceeds maximum capacity ({self.max_pairs_per_socket * 3})")
-            self.all_symbols = self.all_symbols[:self.max_pairs_per_socket * 3]
-            total_symbols = len(self.all_symbols)
-
-        base_size = total_symbols // 3
-        remainder = total_symbols % 3
+        base_size = total_symbols // connections
+        remainder = total_symbols % connections
 
         start = 0
-        for i in range(3):
+        for i in range(connections):
             size = base_size + (1 if i < remainder else 0)
             end = start + size
             socket_symbols.append(self.all_symbols[start:end])
@@ -256,47 +605,254 @@ class MultiSocketClient:
 
         return socket_symbols
 
+    def _start_socket(self, symbols: List[str], standby: bool = False) -> SymbolWebSocket:
+        socket_id = max((socket.socket_id for socket in self.sockets), default=0) + 1
+        socket = SymbolWebSocket(symbols, socket_id, self.orderbooks, self.scheduler, self.top_of_book,
+                                 on_disconnect=self._on_socket_disconnect, standby=standby,
+                                 ws_app_factory=self.ws_app_factory, depths=self.depths,
+                                 default_depth=self.default_depth, pacer=self.pacer, on_empty=self._on_socket_empty,
+                                 client_name=self.name)
+        self.sockets.append(socket)
+        socket.start()
+        return socket
+
     def start(self):
-        for socket_id, symbols in enumerate(self.socket_symbols):
+        self.started = True
+        for symbols in self.socket_symbols:
             if symbols:
-                socket = SymbolWebSocket(symbols, socket_id + 1, self.orderbooks, self.update_queue)
-                self.sockets.append(socket)
-                socket.start()
+                self._start_socket(symbols)
+        for i in range(self.standby_count):
+            self._start_socket([], standby=True)
+        if self.history_writer:
+            self.history_writer.start(self.get_orderbooks)
+
+    def _on_socket_disconnect(self, socket: SymbolWebSocket):
+        """Hand a dropped socket's subscriptions to a connected standby, if one is ready"""
+        with self.universe_lock:
+            if socket.standby or not socket.symbols:
+                return
+            standby = next((s for s in self.sockets if s.standby and s.connected and not s.symbols), None)
+            if standby is None:
+                print(f"No standby ready, Socket {socket.socket_id} will reconnect with backoff")
+                return
+            standby.take_over(socket)
+
+    def set_depths(self, depths: Dict[str, int]):
+        """Change the subscription depth of symbols (1, 50 or 200) on whichever socket streams them"""
+        with self.universe_lock:
+            for socket in self.sockets:
+                owned = {symbol: depth for symbol, depth in depths.items() if symbol in socket.symbol_set}
+                if owned:
+                    socket.set_depths(owned)
+            # Symbols not streamed yet pick their tier up when subscribed
+            self.depths.update(depths)
+
+    def get_depth_tiers(self) -> Dict[int, int]:
+        """Number of symbols per subscription depth"""
+        tiers = {}
+        for symbol in self.all_symbols:
+            depth = self.depths.get(symbol, self.default_depth)
+            tiers[depth] = tiers.get(depth, 0) + 1
+        return tiers
+
+    def first_subscription_ns(self):
+        """monotonic_ns of the first subscribe request sent by any socket, None until then"""
+        sent = [socket.first_subscribe_ns for socket in self.sockets if socket.first_subscribe_ns is not None]
+        return min(sent) if sent else None
+
+    def get_outages(self) -> List[Dict]:
+        """Every recovered outage across sockets, oldest first"""
+        return sorted((outage for socket in self.sockets for outage in socket.outages),
+                      key=lambda outage: outage['ended_at'])
+
+    def add_symbols(self, symbols: List[str]):
+        """Subscribe new symbols on the least loaded running sockets, opening sockets when all are full"""
+        with self.universe_lock:
+            current = set(self.all_symbols)
+            new_symbols = [symbol for symbol in symbols if symbol not in current]
+
+            # Plan placements first so each socket gets a single batched subscribe
+            open_lists = [i for i, socket_symbols in enumerate(self.socket_symbols)
+                          if not any(socket.symbols is socket_symbols and socket.socket_id in self.retiring
+                                     for socket in self.sockets)]
+            planned = {i: [] for i in open_lists}
+            for symbol in new_symbols:
+                i = min(planned, key=lambda i: len(self.socket_symbols[i]) + len(planned[i]), default=None)
+                if i is None or len(self.socket_symbols[i]) + len(planned[i]) >= self.max_pairs_per_socket:
+                    self.socket_symbols.append([])
+                    i = len(self.socket_symbols) - 1
+                    planned[i] = []
+                planned[i].append(symbol)
+
+            for i, added in planned.items():
+                if not added:
+                    continue
+                socket = next((s for s in self.sockets if s.symbols is self.socket_symbols[i]), None)
+                if socket:
+                    socket.subscribe(added)
+                else:
+                    self.socket_symbols[i].extend(added)
+                    if self.started:
+                        self._start_socket(self.socket_symbols[i])
+                self.all_symbols.extend(added)
+                for symbol in added:
+                    self.top_of_book.slot(symbol)
+
+    def move_symbols(self, moves: Dict[str, int]):
+        """
+        Move symbols to other running sockets, keeping their books live during the handover
+
+        Args:
+            moves (dict): symbol -> target socket_id
+        """
+        with self.universe_lock:
+            by_socket = {socket.socket_id: socket for socket in self.sockets}
+            planned = {}
+            for symbol, target_id in moves.items():
+                source = next((socket for socket in self.sockets if symbol in socket.symbol_set), None)
+                target = by_socket.get(target_id)
+                if (source is None or target is None or source is target or target.standby
+                        or target_id in self.retiring):
+                    continue
+                planned.setdefault((source.socket_id, target_id), []).append(symbol)
+            for (source_id, target_id), symbols in planned.items():
+                by_socket[target_id].adopt(symbols, by_socket[source_id])
+
+    def remove_symbols(self, symbols: List[str]):
+        """Unsubscribe symbols from whichever socket carries them and drop their books"""
+        with self.universe_lock:
+            removed = set(symbols) & set(self.all_symbols)
+            for socket_symbols in self.socket_symbols:
+                leaving = [symbol for symbol in socket_symbols if symbol in removed]
+                if not leaving:
+                    continue
+                socket = next((s for s in self.sockets if s.symbols is socket_symbols), None)
+                if socket:
+                    socket.unsubscribe(leaving)
+                else:
+                    for symbol in leaving:
+                        socket_symbols.remove(symbol)
+            self.all_symbols = [symbol for symbol in self.all_symbols if symbol not in removed]
+            self._consolidate()
+
+    def _consolidate(self):
+        """Close surplus sockets once the remaining symbols fit on fewer: move the smallest socket's symbols away"""
+        if not self.started:
+            self.socket_symbols = [symbols for symbols in self.socket_symbols if symbols] or [[]]
+            return
+        for socket in [s for s in self.sockets if not s.symbols and not s.standby and s.socket_id not in self.retiring]:
+            self._retire(socket)
+        while True:
+            active = [s for s in self.sockets if not s.standby and s.socket_id not in self.retiring]
+            if len(active) <= self._sockets_needed(len(self.all_symbols)):
+                return
+            smallest = min(active, key=lambda s: len(s.symbols))
+            others = [s for s in active if s is not smallest]
+            if sum(self.max_pairs_per_socket - len(s.symbols) for s in others) < len(smallest.symbols):
+                return
+            self.retiring.add(smallest.socket_id)
+            moves = {}
+            room = {s.socket_id: self.max_pairs_per_socket - len(s.symbols) for s in others}
+            for symbol in list(smallest.symbols):
+                target = max(room, key=room.get)
+                room[target] -= 1
+                moves[symbol] = target
+            print(f"Retiring Socket {smallest.socket_id}: moving {len(moves)} symbols to other sockets")
+            self.move_symbols(moves)
+
+    def _on_socket_empty(self, socket: SymbolWebSocket):
+        """Last symbol of a socket was released: close it if it is being retired"""
+        with self.universe_lock:
+            if socket.socket_id in self.retiring:
+                self._retire(socket)
+
+    def _retire(self, socket: SymbolWebSocket):
+        self.retiring.discard(socket.socket_id)
+        if socket in self.sockets:
+            self.sockets.remove(socket)
+        self.socket_symbols = [symbols for symbols in self.socket_symbols if symbols is not socket.symbols]
+        print(f"Closing Socket {socket.socket_id}, {len(self.sockets)} sockets left")
+        socket.stop()
+
+    def update_universe(self, symbols: List[str]):
+        """Bring the monitored symbols in line with a new universe using incremental (un)subscribes"""
+        wanted = set(symbols)
+        current = set(self.all_symbols)
+        self.remove_symbols(sorted(current - wanted))
+        self.add_symbols(sorted(wanted - current))
+
+    def register_consumer(self, name: str):
+        """Cursor over the symbols updated since the consumer last called wait()/drain()"""
+        return self.scheduler.register(name)
 
     def stop(self):
         self.json_writer_running = False
+        self.scheduler.close()
+        if self.history_writer:
+            self.history_writer.stop()
         for socket in self.sockets:
             socket.stop()
 
     def get_orderbooks(self) -> Dict:
-        with self.lock:
-            return self.orderbooks.copy()
+        """
+        Consistent snapshot of every book in O(symbols)
+
+        Books are immutable versions swapped in by reference, so copying the outer dict
+        (a single atomic operation under the GIL) is enough and no levels are copied.
+        """
+        return self.orderbooks.copy()
+
+    def get_update_stats(self, stale_after_ms: float = 5000) -> Dict[str, Dict]:
+        """
+        Per-symbol update statistics, so feeds that went quiet show up immediately
+
+        Args:
+            stale_after_ms (float): Age after which a symbol is flagged as stale
+
+        Returns:
+            dict: symbol -> updates, rate_per_sec, age_ms (None if never updated) and stale flag
+        """
+        now_ns = time.monotonic_ns()
+        stats = {}
+        for socket in self.sockets:
+            for symbol in socket.symbols:
+                count, first_ns, last_ns = socket.update_stats.get(symbol, (0, 0, 0))
+                elapsed_s = (now_ns - first_ns) / 1e9 if count else 0
+                age_ms = (now_ns - last_ns) / 1e6 if count else None
+                stats[symbol] = {
+                    'socket_id': socket.socket_id,
+                    'updates': count,
+                    'rate_per_sec': round(count / elapsed_s, 3) if elapsed_s > 0 else 0.0,
+                    'age_ms': round(age_ms, 1) if age_ms is not None else None,
+                    'stale': age_ms is None or age_ms > stale_after_ms
+                }
+        return stats
 
     def print_orderbooks(self):
         orderbooks = self.get_orderbooks()
         print("\nActive Pairs:", len(orderbooks))
         print("Socket Distribution:")
-        for i, symbols in enumerate(self.socket_symbols):
-            print(f"Socket {i + 1}: {len(symbols)} pairs")
+        for socket in self.sockets:
+            print(f"Socket {socket.socket_id}: {len(socket.symbols)} pairs{' (standby)' if socket.standby else ''}")
 
         print("\nOrderbooks for each socket (first 10 pairs):")
         # Group orderbooks by socket_id
-        socket_books = {1: [], 2: [], 3: []}
+        socket_books = {socket.socket_id: [] for socket in self.sockets}
         for symbol, book in orderbooks.items():
             socket_id = book.get('socket_id')
-            if socket_id:
+            if socket_id in socket_books:
                 socket_books[socket_id].append((symbol, book))
 
         # Print first 10 orderbooks from each socket
-        for socket_id in [1, 2, 3]:
-            books = socket_books[socket_id]
+        for socket_id, books in socket_books.items():
             print(f"\nSocket {socket_id} orderbooks:")
             for symbol, book in books[:10]:  # Only show first 10 pairs
                 print(f"\n{symbol}:")
                 if 'bids' in book and 'asks' in book:
                     print("Top 3 Bids:", book['bids'][:3])
                     print("Top 3 Asks:", book['asks'][:3])
-                    print("Last Update:", book.get('timestamp', 'N/A'))
+                    if book.get('recv_ns'):
+                        print(f"Last Update: {(time.monotonic_ns() - book['recv_ns']) / 1e6:.1f} ms ago")
 
 
 def load_trading_pairs() -> List[str]:
@@ -311,13 +867,27 @@ if __name__ == "__main__":
     TRADING_AMOUNT_USDT = 10  # $100k USDT base trading amount
 
     trading_pairs = load_trading_pairs()
+    start_metrics_server(int(os.getenv('METRICS_PORT', 9108)))
+    profiling = ProfilingControl()
+    profiling.start()
     client = MultiSocketClient(
         symbols=trading_pairs,
-        default_amount=TRADING_AMOUNT_USDT
+        default_amount=TRADING_AMOUNT_USDT,
+        standby_sockets=int(os.getenv('STANDBY_SOCKETS', 1))
     )
 
+    universe = None
+    if os.getenv('UNIVERSE_REFRESH_INTERVAL'):
+        # Follow listings and delistings on the running sockets, starting from the list above
+        from triangle_no_pandas import BybitTradingPairList
+        from universe import UniverseManager
+        universe = UniverseManager(client, None, BybitTradingPairList(api_key=None, api_secret=None),
+                                   refresh_interval=float(os.getenv('UNIVERSE_REFRESH_INTERVAL')))
+
     try:
         client.start()
+        if universe:
+            universe.start()
         print("Starting WebSocket connections...")
         print(f"Monitoring liquidity for {len(trading_pairs)} pairs...")
         print(f"Liquidity check amount: ${TRADING_AMOUNT_USDT:,} USDT equivalent for each pair")
@@ -330,4 +900,7 @@ if __name__ == "__main__":
 
     except KeyboardInterrupt:
         print("\nShutting down...")
-        client.stop()
\ No newline at end of file
+        if universe:
+            universe.stop()
+        client.stop()
+        profiling.stop()
\ No newline at end of file
@@ -5,6 +5,7 @@ from pybit.unified_trading import HTTP
 import json
 import traceback
 from typing import Dict  # Add this import
+from fixed_point import InstrumentScale, parse_scaled
 
 # Load environment variables from .env file
 load_dotenv()
@@ -41,23 +42,13 @@ class WalletExecutor:
                 symbol=symbol
             )
             
-            # Get lot size filter
-            lot_size_filter = symbol_info['result']['list'][0]['lotSizeFilter']
-            min_qty = float(lot_size_filter['minOrderQty'])
-            qty_step = float(lot_size_filter.get('qtyStep', min_qty))
-            
-            # Round down to the nearest step
-            formatted_qty = float(int(quantity / qty_step) * qty_step)
-            
+            # Lot size in fixed point: round down to the step and format with its exact digits
+            scale = InstrumentScale.from_instrument(symbol_info['result']['list'][0])
+            units = parse_scaled(str(quantity), scale.qty_decimals, exact=False)
+            units -= units % scale.lot
+
             # Ensure quantity is not less than minimum
-            if formatted_qty < min_qty:
-                formatted_qty = min_qty
-                
-            # Convert to string with appropriate precision
-            decimals = str(qty_step)[::-1].find('.')
-            if decimals > 0:
-                return f"{formatted_qty:.{decimals}f}"
-            return str(int(formatted_qty))
+            return scale.format_qty(max(units, scale.min_qty))
             
         except Exception as e:
             print(f"Error formatting quantity: {e}")
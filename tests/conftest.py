@@ -0,0 +1,18 @@
+"""Markets shared by the tests, built with the same helpers the benchmarks run on"""
+import pytest
+
+from benchmark import _multi_quote_market, _synthetic_books
+from topology_cache import synthetic_topology
+
+
+@pytest.fixture
+def triangle_market():
+    """(topology, books): 20 coins quoted in USDT and BTC, one triangle each, 10 levels per side"""
+    topology = synthetic_topology(20)
+    return topology, _synthetic_books(topology, levels=10)
+
+
+@pytest.fixture
+def multi_quote_market():
+    """(instruments, books): 8 coins quoted in USDT, USDC, BTC and ETH plus the pairs between those, 10 levels"""
+    return _multi_quote_market(coins=8, levels=10)
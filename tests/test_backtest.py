@@ -0,0 +1,51 @@
+import pytest
+
+from backtest import SimulatedExecutor, run_backtest, run_slice
+from book_history import BookHistoryWriter
+
+START_MS = 1_700_000_000_000
+
+
+def opportunity(initial, final):
+    return {'initial_amount': initial, 'final_amount': final}
+
+
+def test_executor_trades_an_opportunity_once_per_appearance():
+    executor = SimulatedExecutor(slippage_bps=0)
+    executor.on_results({'A': opportunity(100, 101)})
+    executor.on_results({'A': opportunity(100, 105), 'B': opportunity(10, 11)})
+    executor.on_results({})
+    executor.on_results({'A': opportunity(100, 102)})
+    assert executor.trades == 3
+    assert executor.realized_profit == pytest.approx(1 + 1 + 2)
+
+
+def test_slippage_is_charged_on_each_leg():
+    executor = SimulatedExecutor(slippage_bps=10)
+    executor.on_results({'A': opportunity(100, 100)})
+    assert executor.realized_profit == pytest.approx(100 * 0.999 ** 3 - 100)
+
+
+def test_parallel_backtest_matches_slices_run_in_process(tmp_path, triangle_market):
+    topology, books = triangle_market
+    writer = BookHistoryWriter(str(tmp_path), depth=10)
+    for second in range(6):
+        # Drift every book a little so the opportunities change between samples
+        drift = 1 + second * 0.002
+        writer.write_snapshot({symbol: {'bids': [(price * drift, qty) for price, qty in book['bids']],
+                                        'asks': [(price * drift, qty) for price, qty in book['asks']]}
+                               for symbol, book in books.items()}, ts_ms=START_MS + second * 1000)
+
+    triangles = topology['triangles'][:40]
+    grid = {'trade_amount': [10, 100], 'min_profit': [-100], 'max_profit': [100]}
+    end_ms = START_MS + 6000
+    report = run_backtest(str(tmp_path), triangles, START_MS, end_ms, grid, slices=2, workers=2)
+
+    assert report['jobs'] == 4
+    for total in report['results']:
+        expected = [run_slice({'history_root': str(tmp_path), 'triangles': triangles, 'params': total['params'],
+                               'start_ms': start, 'end_ms': end, 'fee_rate': 0.001, 'slippage_bps': 5.0})
+                    for start, end in ((START_MS, START_MS + 3000), (START_MS + 3000, end_ms))]
+        assert total['steps'] == 6
+        assert total['opportunities'] == sum(result['opportunities'] for result in expected) > 0
+        assert total['realized_profit'] == pytest.approx(sum(result['realized_profit'] for result in expected))
@@ -0,0 +1,44 @@
+import json
+import time
+
+from test_triple_socket import SymbolWebSocket
+from triangle_no_pandas import BybitTriangleCalculation
+from update_scheduler import DirtySymbolScheduler
+
+
+def snapshot(symbol, ts, bids=(('100', '1'),), asks=(('101', '1'),)):
+    return json.dumps({'topic': f'orderbook.50.{symbol}', 'type': 'snapshot', 'ts': ts,
+                       'data': {'s': symbol, 'b': [list(level) for level in bids],
+                                'a': [list(level) for level in asks], 'u': 1, 'seq': 1}})
+
+
+def test_books_carry_exchange_ts_and_monotonic_receive_time():
+    orderbooks = {}
+    socket = SymbolWebSocket(['BTCUSDT'], 0, orderbooks, DirtySymbolScheduler())
+    before = time.monotonic_ns()
+    socket._on_message(None, snapshot('BTCUSDT', 1700000000123))
+    socket._on_message(None, json.dumps({'topic': 'orderbook.50.BTCUSDT', 'type': 'delta', 'ts': 1700000000456,
+                                         'data': {'s': 'BTCUSDT', 'b': [['100', '2']], 'a': [], 'u': 2}}))
+
+    book = orderbooks['BTCUSDT']
+    assert book['ts'] == 1700000000456
+    assert before <= book['recv_ns'] <= time.monotonic_ns()
+    count, first_ns, last_ns = socket.update_stats['BTCUSDT']
+    assert count == 2 and first_ns <= last_ns == book['recv_ns']
+
+
+def test_stale_legs_skip_their_triangles(triangle_market):
+    topology, books = triangle_market
+    triangles = topology['triangles']
+    now_ns = time.monotonic_ns()
+    books = {symbol: dict(book, recv_ns=now_ns) for symbol, book in books.items()}
+    stale = triangles[0]['pair2']
+    books[stale]['recv_ns'] = now_ns - 10_000 * 1_000_000  # ten seconds old
+
+    options = dict(triangles=triangles, min_profit=-100, max_profit=100, results_file=None, verbose=False)
+    gated = BybitTriangleCalculation(max_book_age_ms=1000, **options).calculate_arbitrage(books)
+    ungated = BybitTriangleCalculation(**options).calculate_arbitrage(books)
+
+    using_stale = {key for key in ungated if stale in key.split('-')}
+    assert using_stale
+    assert set(gated) == set(ungated) - using_stale
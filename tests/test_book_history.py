@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from book_history import BookHistoryReader, BookHistoryWriter
+
+DAY_MS = 86_400_000
+START_MS = 1_700_000_000_000 // DAY_MS * DAY_MS + DAY_MS - 2000  # two seconds before midnight UTC
+
+
+def book(price, levels=3):
+    return {'bids': [[price - i, 1.0 + i] for i in range(levels)],
+            'asks': [[price + 1 + i, 2.0 + i] for i in range(levels)], 'ts': 7}
+
+
+@pytest.fixture
+def history(tmp_path):
+    writer = BookHistoryWriter(str(tmp_path), depth=5)
+    for second in range(4):
+        writer.write_snapshot({'BTCUSDT': book(100 + second), 'ETHUSDT': book(10 + second, levels=8)},
+                              ts_ms=START_MS + second * 1000)
+    return str(tmp_path)
+
+
+def test_samples_are_partitioned_by_utc_day(history):
+    reader = BookHistoryReader(history)
+    assert len(reader.days()) == 2
+    assert reader.symbols(reader.days()[0]) == ['BTCUSDT', 'ETHUSDT']
+
+
+def test_load_range_is_half_open_across_days(history):
+    reader = BookHistoryReader(history)
+    records = reader.load_range(['BTCUSDT', 'XRPUSDT'], START_MS + 1000, START_MS + 3000)
+    assert list(records['BTCUSDT']['ts']) == [START_MS + 1000, START_MS + 2000]
+    assert len(records['XRPUSDT']) == 0
+
+
+def test_records_round_trip_to_the_orderbook_layout(history):
+    reader = BookHistoryReader(history)
+    records = reader.load_range(['BTCUSDT', 'ETHUSDT'], START_MS, START_MS + 1)
+    assert reader.to_orderbook(records['BTCUSDT'][0]) == book(100)
+    # Deeper books are cut to the stored depth
+    eth = reader.to_orderbook(records['ETHUSDT'][0])
+    assert eth['bids'] == book(10, levels=8)['bids'][:5]
+    assert np.isnan(records['BTCUSDT'][0]['bid_px'][3])
+
+
+def test_depth_mismatch_is_rejected(history):
+    with pytest.raises(ValueError):
+        BookHistoryWriter(history, depth=10)
@@ -0,0 +1,86 @@
+import json
+import threading
+
+from test_triple_socket import SymbolWebSocket
+from update_scheduler import DirtySymbolScheduler
+
+
+class RecordingWs:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+def message(kind, bids=(), asks=(), symbol='BTCUSDT'):
+    return json.dumps({'topic': f'orderbook.50.{symbol}', 'type': kind, 'ts': 1,
+                       'data': {'s': symbol, 'b': [list(level) for level in bids],
+                                'a': [list(level) for level in asks], 'u': 1, 'seq': 1}})
+
+
+def connected_socket(symbols, socket_id, orderbooks, scheduler):
+    socket = SymbolWebSocket(symbols, socket_id, orderbooks, scheduler, subscribe_batch_delay=0)
+    socket.ws, socket.connected = RecordingWs(), True
+    if symbols:
+        socket._send_topics(socket.ws, 'subscribe', symbols)
+    return socket
+
+
+def test_a_delta_publishes_a_new_version_and_leaves_readers_untouched():
+    orderbooks = {}
+    socket = SymbolWebSocket(['BTCUSDT'], 1, orderbooks, DirtySymbolScheduler(name='test_cow'))
+    socket._on_message(None, message('snapshot', bids=[('100', '1'), ('99', '2')], asks=[('101', '1')]))
+    held = orderbooks['BTCUSDT']
+
+    socket._on_message(None, message('delta', bids=[('100', '0'), ('99.5', '3')], asks=[('100.5', '4')]))
+    assert held['bids'] == ((100.0, 1.0), (99.0, 2.0))
+    assert held['asks'] == ((101.0, 1.0),)
+    book = orderbooks['BTCUSDT']
+    assert book is not held
+    assert book['bids'] == ((99.5, 3.0), (99.0, 2.0))
+    assert book['asks'] == ((100.5, 4.0), (101.0, 1.0))
+
+
+def test_readers_only_ever_see_complete_versions():
+    orderbooks = {}
+    socket = SymbolWebSocket(['BTCUSDT'], 1, orderbooks, DirtySymbolScheduler(name='test_cow_threads'))
+    socket._on_message(None, message('snapshot', bids=[('100', '1')], asks=[('101', '1')]))
+    done = threading.Event()
+
+    def write():
+        for i in range(2000):
+            # Every version moves both sides together, keeping the spread at exactly one
+            price = 100 + i % 50
+            socket._on_message(None, message('snapshot', bids=[(str(price), '1')], asks=[(str(price + 1), '1')]))
+        done.set()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    torn = 0
+    while not done.is_set():
+        book = orderbooks['BTCUSDT']
+        torn += book['asks'][0][0] - book['bids'][0][0] != 1
+    writer.join()
+    assert torn == 0
+
+
+def test_old_owner_cannot_overwrite_a_handed_over_book():
+    orderbooks = {}
+    scheduler = DirtySymbolScheduler(name='test_handover')
+    source = connected_socket(['BTCUSDT'], 1, orderbooks, scheduler)
+    target = connected_socket([], 2, orderbooks, scheduler)
+    source._on_message(None, message('snapshot', bids=[('100', '1')], asks=[('101', '1')]))
+
+    target.adopt(['BTCUSDT'], source)
+    # Until the target's snapshot arrives the source keeps the book current
+    source._on_message(None, message('delta', bids=[('100', '2')]))
+    assert orderbooks['BTCUSDT']['bids'] == ((100.0, 2.0),)
+
+    target._on_message(None, message('snapshot', bids=[('200', '1')], asks=[('201', '1')]))
+    assert 'BTCUSDT' not in source.symbol_set
+    # A delta the source still had in flight is dropped
+    source._on_message(None, message('delta', bids=[('100', '9')]))
+    assert orderbooks['BTCUSDT']['socket_id'] == 2
+    assert orderbooks['BTCUSDT']['bids'] == ((200.0, 1.0),)
+    assert source.ws.sent[-1] == {'op': 'unsubscribe', 'args': ['orderbook.50.BTCUSDT']}
@@ -0,0 +1,109 @@
+import pytest
+
+from cycle_calculator import CycleCalculation, find_cycles
+
+ANCHORS = ('USDT', 'USDC', 'BTC', 'ETH')
+OPTIONS = dict(trade_amount=100, min_profit=-100, max_profit=100)
+
+
+def walk(levels, amount, side):
+    """Reference level walk: amount spent through one leg, None if the book is too thin"""
+    received = 0.0
+    for price, quantity in levels:
+        cost = price * quantity if side == 'buy' else quantity
+        if amount < cost:
+            return received + (amount / price if side == 'buy' else amount * price)
+        amount -= cost
+        received += quantity if side == 'buy' else price * quantity
+    return None
+
+
+def profits(calculator):
+    return {key: result['profit_percent'] for key, result in calculator.results.items()}
+
+
+def test_find_cycles_both_directions(multi_quote_market):
+    instruments, _ = multi_quote_market
+    cycles = find_cycles(instruments, anchors=('USDT',))
+    paths = {tuple(cycle['coins']) for cycle in cycles}
+    assert ('USDT', 'C0', 'BTC') in paths and ('USDT', 'BTC', 'C0') in paths
+    for cycle in cycles:
+        coin = cycle['anchor']
+        for symbol, side in cycle['legs']:
+            base, quote = instruments[symbol]['base'], instruments[symbol]['quote']
+            assert coin == (quote if side == 'buy' else base)
+            coin = base if side == 'buy' else quote
+        assert coin == cycle['anchor']
+
+
+def test_convert_matches_a_level_walk(multi_quote_market):
+    _, books = multi_quote_market
+    calculator = CycleCalculation({}, anchors=())
+    calculator.orderbooks = books
+    for side, book_side in (('buy', 'asks'), ('sell', 'bids')):
+        prefix = calculator._prefix('C0USDT', side)
+        levels = books['C0USDT'][book_side]
+        total = sum(price * quantity if side == 'buy' else quantity for price, quantity in levels)
+        # Out of order, so the lazily extended arrays are read before and after growing
+        for amount in (total * 0.5, total * 0.01, total * 0.99, total * 2, total * 0.2):
+            received, _ = calculator.convert(prefix, amount, side)
+            expected = walk(levels, amount, side)
+            assert (received is None) == (expected is None)
+            if expected is not None:
+                assert received == pytest.approx(expected, rel=1e-12)
+
+
+def test_shared_pass_matches_one_calculator_per_anchor(multi_quote_market):
+    instruments, books = multi_quote_market
+    shared = CycleCalculation(instruments, anchors=ANCHORS, **OPTIONS)
+    shared.calculate_arbitrage(dict(books))
+    separate = {}
+    for anchor in ANCHORS:
+        calculator = CycleCalculation(instruments, anchors=(anchor,), **OPTIONS)
+        calculator.calculate_arbitrage(dict(books))
+        separate.update(profits(calculator))
+    assert profits(shared) == separate
+    assert len(separate) == len(shared.compiled)
+
+
+def shift_prices(books, symbol, factor):
+    books[symbol] = {side: tuple((price * factor, quantity) for price, quantity in books[symbol][side])
+                     for side in ('bids', 'asks')}
+
+
+def test_moved_anchor_rate_rebases_its_cycles(multi_quote_market):
+    instruments, books = multi_quote_market
+    incremental = CycleCalculation(instruments, anchors=ANCHORS, **OPTIONS)
+    incremental.calculate_arbitrage(dict(books))
+
+    books = dict(books)
+    shift_prices(books, 'BTCUSDT', 1.02)
+    incremental.calculate_arbitrage(books, dirty={'BTCUSDT'})
+    full = CycleCalculation(instruments, anchors=ANCHORS, **OPTIONS)
+    full.calculate_arbitrage(books)
+
+    assert incremental.last_stats['incremental']
+    assert incremental.last_stats['rebased'] == ['BTC']
+    assert incremental.amounts == full.amounts
+    assert profits(incremental) == profits(full)
+
+
+def test_small_rate_move_only_reprices_profit_usdt(multi_quote_market):
+    instruments, books = multi_quote_market
+    calculator = CycleCalculation(instruments, anchors=ANCHORS, **OPTIONS)
+    first = calculator.calculate_arbitrage(dict(books))
+    amount = calculator.amounts['BTC']
+
+    books = dict(books)
+    shift_prices(books, 'BTCUSDT', 1.001)
+    results = calculator.calculate_arbitrage(books, dirty={'BTCUSDT'})
+
+    rate = calculator.usdt_rate('BTC')
+    assert calculator.last_stats['rebased'] == []
+    assert calculator.amounts['BTC'] == amount
+    kept = [key for key in results if key.startswith('BTC:') and 'BTCUSDT' not in results[key]['pairs']]
+    assert kept
+    for key in kept:
+        assert results[key]['profit_usdt'] == round(results[key]['profit_amount'] * rate, 6)
+        # Results handed out by the previous pass are not changed underneath their reader
+        assert first[key]['profit_usdt'] != results[key]['profit_usdt']
@@ -0,0 +1,98 @@
+import json
+
+from depth_tiers import DepthTierManager
+from test_triple_socket import SymbolWebSocket
+from triangle_no_pandas import BybitTriangleCalculation
+from update_scheduler import DirtySymbolScheduler
+
+TRIANGLES = [{'pair1': 'AUSDT', 'pair2': 'ABTC', 'pair3': 'BTCUSDT'},
+             {'pair1': 'BUSDT', 'pair2': 'BBTC', 'pair3': 'BTCUSDT'}]
+SYMBOLS = ['AUSDT', 'ABTC', 'BUSDT', 'BBTC', 'BTCUSDT']
+
+
+class TieredClient:
+    """The parts of MultiSocketClient DepthTierManager uses"""
+    def __init__(self, depths):
+        self.all_symbols = list(SYMBOLS)
+        self.depths = dict(depths)
+        self.default_depth = 50
+        self.applied = []
+
+    def set_depths(self, depths):
+        self.applied.append(dict(depths))
+        self.depths.update(depths)
+
+
+def book(price):
+    return {'bids': ((price, 1.0),), 'asks': ((price, 1.0),)}
+
+
+def books(a_price):
+    """Triangle A's upper bound is (1 / a_price - 1) * 100 percent, B's stays at -50%"""
+    return {'AUSDT': book(a_price), 'ABTC': book(1.0), 'BUSDT': book(2.0), 'BBTC': book(1.0), 'BTCUSDT': book(1.0)}
+
+
+def manager(a_price=1.0):
+    calculator = BybitTriangleCalculation(triangles=TRIANGLES, min_profit=0.1, results_file=None, verbose=False)
+    calculator.orderbooks = books(a_price)
+    tiers = DepthTierManager(None, calculator, promote_margin=0.5, hold_seconds=30)
+    tiers.client = TieredClient(tiers.initial_depths(SYMBOLS))
+    return tiers
+
+
+def test_everything_starts_on_the_screening_tier():
+    tiers = manager()
+    tiers.pin(['BUSDT'])
+    assert tiers.initial_depths(SYMBOLS) == {'AUSDT': 1, 'ABTC': 1, 'BUSDT': 200, 'BBTC': 1, 'BTCUSDT': 1}
+
+
+def test_legs_near_the_threshold_are_promoted_and_held():
+    tiers = manager(a_price=1.0)  # bound 0%, within the 0.5% margin of min_profit
+    assert tiers.evaluate(now=0) == {'AUSDT': 50, 'ABTC': 50, 'BTCUSDT': 50}
+    assert tiers.evaluate(now=1) == {}
+
+    # The opportunity fades: the legs stay deep for hold_seconds, then go back to screening
+    tiers.calculator.orderbooks = books(a_price=1.1)
+    assert tiers.evaluate(now=20) == {}
+    assert tiers.evaluate(now=32) == {'AUSDT': 1, 'ABTC': 1, 'BTCUSDT': 1}
+    assert tiers.metric_promotions.value >= 3 and tiers.metric_demotions.value >= 3
+
+
+def test_pinned_legs_use_the_trading_tier_until_unpinned():
+    tiers = manager(a_price=1.1)
+    tiers.pin(['BUSDT', 'BBTC'])
+    assert tiers.client.depths['BUSDT'] == tiers.client.depths['BBTC'] == 200
+    tiers.unpin(['BUSDT', 'BBTC'])
+    assert tiers.client.depths['BUSDT'] == tiers.client.depths['BBTC'] == 1
+
+
+class RecordingWs:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+def snapshot(depth, price, symbol='AUSDT'):
+    return json.dumps({'topic': f'orderbook.{depth}.{symbol}', 'type': 'snapshot', 'ts': 1,
+                       'data': {'s': symbol, 'b': [[str(price), '1']], 'a': [[str(price + 1), '1']], 'u': 1}})
+
+
+def test_promotion_switches_topics_make_before_break():
+    orderbooks = {}
+    socket = SymbolWebSocket(['AUSDT'], 1, orderbooks, DirtySymbolScheduler(name='test_tiers'), depths={'AUSDT': 1})
+    socket.ws, socket.connected = RecordingWs(), True
+    socket._send_topics(socket.ws, 'subscribe', ['AUSDT'])
+    socket._on_message(socket.ws, snapshot(1, 100))
+
+    socket.set_depths({'AUSDT': 50})
+    assert socket.ws.sent[-1] == {'op': 'subscribe', 'args': ['orderbook.50.AUSDT']}
+    # The level-1 stream keeps the book current until the deeper snapshot arrives
+    socket._on_message(socket.ws, snapshot(1, 101))
+    assert orderbooks['AUSDT']['bids'][0][0] == 101.0
+
+    socket._on_message(socket.ws, snapshot(50, 102))
+    assert socket.ws.sent[-1] == {'op': 'unsubscribe', 'args': ['orderbook.1.AUSDT']}
+    socket._on_message(socket.ws, snapshot(1, 103))  # still in flight from the old topic
+    assert orderbooks['AUSDT']['bids'][0][0] == 102.0
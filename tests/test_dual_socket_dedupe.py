@@ -0,0 +1,59 @@
+import json
+
+from test_dual_socket import DualSocketClient
+
+
+def message(kind, u, bids=(), asks=(), symbol='BTCUSDT'):
+    return json.dumps({'topic': f'orderbook.50.{symbol}', 'type': kind, 'ts': 0,
+                       'data': {'s': symbol, 'b': [list(level) for level in bids],
+                                'a': [list(level) for level in asks], 'u': u, 'seq': u}})
+
+
+def make_client(name):
+    client = DualSocketClient(['BTCUSDT'], name=name)
+    for feed_id in (0, 1):
+        client._on_message(feed_id, None, message('snapshot', 10, bids=[('100', '1')], asks=[('101', '1')]))
+    return client
+
+
+def test_peek_reads_symbol_u_and_type():
+    assert DualSocketClient._peek_update(message('snapshot', 1)) == ('BTCUSDT', 1, True)
+    assert DualSocketClient._peek_update(message('delta', 42)) == ('BTCUSDT', 42, False)
+    assert DualSocketClient._peek_update('{"op": "pong"}') is None
+
+
+def test_second_copy_of_a_delta_is_dropped():
+    client = make_client('test_copy')
+    delta = message('delta', 11, bids=[('100', '0'), ('99', '2')])
+    client._on_message(0, None, delta)
+    client._on_message(1, None, delta)
+
+    book = client.get_orderbook('BTCUSDT')
+    assert book['u'] == 11
+    assert book['bids'] == {99.0: 2.0}
+    assert client.get_feed_stats()[1]['duplicates'] == 2  # its snapshot copy and this delta
+
+
+def test_restart_snapshot_replaces_the_book_once():
+    client = make_client('test_restart')
+    client._on_message(0, None, message('snapshot', 1, bids=[('200', '1')], asks=[('201', '1')]))
+    # The slow feed still has a pre-restart delta in flight
+    client._on_message(1, None, message('delta', 11, bids=[('100', '5')]))
+    client._on_message(1, None, message('snapshot', 1, bids=[('200', '1')], asks=[('201', '1')]))
+    client._on_message(0, None, message('delta', 2, bids=[('199', '3')]))
+    client._on_message(1, None, message('delta', 2, bids=[('199', '3')]))
+
+    book = client.get_orderbook('BTCUSDT')
+    assert book['u'] == 2
+    assert book['bids'] == {200.0: 1.0, 199.0: 3.0}
+    assert book['asks'] == {201.0: 1.0}
+
+
+def test_older_snapshot_without_restart_is_dropped():
+    client = make_client('test_old_snapshot')
+    client._on_message(0, None, message('delta', 12, bids=[('100', '4')]))
+    client._on_message(1, None, message('snapshot', 5, bids=[('90', '1')]))
+
+    book = client.get_orderbook('BTCUSDT')
+    assert book['u'] == 12
+    assert book['bids'] == {100.0: 4.0}
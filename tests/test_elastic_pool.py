@@ -0,0 +1,82 @@
+import time
+
+from feed_simulator import LocalFeedSimulator
+from test_triple_socket import MultiSocketClient
+
+SYMBOLS = [f"C{i}USDT" for i in range(12)]
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def live(client):
+    return set(client.get_orderbooks()) == set(client.all_symbols)
+
+
+def test_sockets_follow_the_symbol_count(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the client's JSON writer writes under the working directory
+    client = MultiSocketClient(SYMBOLS[:10], max_pairs_per_socket=4, min_sockets=1)
+    try:
+        assert [len(symbols) for symbols in client.socket_symbols] == [4, 3, 3]
+        assert client._sockets_needed(0) == 1
+        assert client._sockets_needed(8) == 2
+    finally:
+        client.stop()
+
+    client = MultiSocketClient(SYMBOLS[:2], max_pairs_per_socket=4, min_sockets=3)
+    try:
+        assert len(client.socket_symbols) == 3
+    finally:
+        client.stop()
+
+
+def test_pool_grows_when_sockets_are_full_and_shrinks_when_symbols_leave(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    simulator = LocalFeedSimulator(SYMBOLS, rate_per_symbol=50)
+    simulator.start()
+    client = MultiSocketClient(SYMBOLS[:8], ws_app_factory=simulator.app_factory(), max_pairs_per_socket=4,
+                               min_sockets=1, subscribe_rate=1000, subscribe_burst=100)
+    try:
+        client.start()
+        assert len(client.sockets) == 2
+        assert wait_until(lambda: live(client))
+        first = {socket.socket_id: socket.ws for socket in client.sockets}
+
+        client.add_symbols(SYMBOLS[8:])
+        assert len(client.sockets) == 3
+        assert all(len(socket.symbols) <= 4 for socket in client.sockets)
+        # The full sockets kept their connections, the new symbols went to a new one
+        assert all(socket.ws is first[socket.socket_id] for socket in client.sockets if socket.socket_id in first)
+        assert wait_until(lambda: live(client))
+
+        client.remove_symbols(SYMBOLS[:5])
+        # Seven symbols fit on two sockets: the smallest is retired once its symbols moved
+        assert wait_until(lambda: len(client.sockets) == 2)
+        assert sorted(client.all_symbols) == sorted(SYMBOLS[5:])
+        assert wait_until(lambda: live(client))
+        assert sorted(symbol for socket in client.sockets for symbol in socket.symbols) == sorted(SYMBOLS[5:])
+        assert not client.retiring
+        assert client.get_outages() == []
+    finally:
+        client.stop()
+        simulator.stop()
+
+
+def test_symbols_added_before_start_are_placed_without_sockets(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = MultiSocketClient(SYMBOLS[:4], max_pairs_per_socket=4, min_sockets=1)
+    try:
+        client.add_symbols(SYMBOLS[4:6])
+        assert client.sockets == []
+        assert [len(symbols) for symbols in client.socket_symbols] == [4, 2]
+
+        client.remove_symbols(SYMBOLS[4:6])
+        assert client.socket_symbols == [SYMBOLS[:4]]
+    finally:
+        client.stop()
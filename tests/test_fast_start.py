@@ -0,0 +1,88 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import benchmark
+from topology_cache import TOPOLOGY_VERSION, TopologyCache, synthetic_topology
+from triangle_no_pandas import BybitTradingPairList
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def instrument(symbol, base, quote, tick='0.01'):
+    return {'symbol': symbol, 'baseCoin': base, 'quoteCoin': quote, 'status': 'Trading',
+            'priceFilter': {'tickSize': tick}, 'lotSizeFilter': {'basePrecision': '0.0001'}}
+
+
+class ListedInstruments(BybitTradingPairList):
+    def __init__(self, instruments):
+        super().__init__(api_key=None, api_secret=None)
+        self.instruments = instruments
+
+    def get_instruments(self):
+        return self.instruments
+
+
+MARKET = [instrument('BTCUSDT', 'BTC', 'USDT'), instrument('ETHUSDT', 'ETH', 'USDT'),
+          instrument('ETHBTC', 'ETH', 'BTC', tick='0.00001')]
+
+
+def test_cache_round_trip_and_rejections(tmp_path):
+    cache = TopologyCache(str(tmp_path / 'topology.json'))
+    assert cache.load() is None
+    topology = synthetic_topology(5)
+    cache.save(topology)
+    assert cache.load() == topology
+    assert not os.path.exists(cache.path + '.tmp')
+
+    assert TopologyCache(cache.path, base_currency='USDC').load() is None
+    cache.save(dict(topology, version=TOPOLOGY_VERSION - 1))
+    assert cache.load() is None
+    with open(cache.path, 'w') as f:
+        f.write('{"truncated')
+    assert cache.load() is None
+
+
+def test_validation_rewrites_the_cache_only_on_change(tmp_path):
+    cache = TopologyCache(str(tmp_path / 'topology.json'))
+    current = cache.load_or_build(ListedInstruments(MARKET))
+    assert current['triangles'] == [{'pair1': 'ETHUSDT', 'pair2': 'ETHBTC', 'pair3': 'BTCUSDT'}]
+
+    changes = []
+    assert cache.validate(ListedInstruments(MARKET), current, changes.append)['changed'] is False
+    assert changes == []
+
+    # A tick size change is enough to invalidate the cache
+    retick = MARKET[:2] + [instrument('ETHBTC', 'ETH', 'BTC', tick='0.000001')]
+    result = cache.validate(ListedInstruments(retick), current, changes.append)
+    assert result['changed'] and result['added'] == result['removed'] == []
+    assert changes[0]['instruments']['ETHBTC']['tick_size'] == '0.000001'
+    assert cache.load()['fingerprint'] == changes[0]['fingerprint']
+
+
+def test_cached_start_subscribes_without_the_heavy_imports(tmp_path):
+    cache_path = str(tmp_path / 'topology.json')
+    TopologyCache(cache_path).save(synthetic_topology(10))
+    env = dict(os.environ, TOPOLOGY_CACHE=cache_path, FAST_START_SIMULATOR='1', FAST_START_EXIT_AFTER_SUBSCRIBE='1',
+               PYTHONPATH=REPO)
+    # One write on stderr, like the STARTUP line, so socket threads cannot split it
+    script = ("import sys, json, fast_start; fast_start.main(); "
+              "loaded = sorted(m for m in ('pandas', 'pybit', 'requests') if m in sys.modules); "
+              "sys.stderr.write('IMPORTED ' + json.dumps(loaded) + '\\n')")
+    result = subprocess.run([sys.executable, '-c', script], cwd=tmp_path, env=env, capture_output=True, text=True,
+                            timeout=60)
+    assert 'STARTUP {' in result.stderr, result.stderr[-2000:]
+    timings, _ = json.JSONDecoder().raw_decode(result.stderr, result.stderr.index('STARTUP {') + len('STARTUP '))
+    assert timings['cache_hit'] and timings['first_subscription_ms'] is not None
+    imported, _ = json.JSONDecoder().raw_decode(result.stderr, result.stderr.index('IMPORTED [') + len('IMPORTED '))
+    assert imported == []
+
+
+def test_startup_benchmark_reports_missing_legacy_modules(monkeypatch):
+    find_spec = importlib.util.find_spec
+    monkeypatch.setattr(importlib.util, 'find_spec', lambda name, *args: None if name == 'pandas' else find_spec(name, *args))
+    report = benchmark.bench_startup(runs=1, coins=5)
+    assert report['legacy_eager_import_ms'] == 'unavailable (pandas not installed)'
+    assert report['launch_to_first_subscription_ms_median'] > 0
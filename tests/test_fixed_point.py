@@ -0,0 +1,70 @@
+import pytest
+
+from fixed_point import (FixedPointBook, InstrumentScale, base_for_notional, decimals_of, floor_decimal_string,
+                         format_scaled, notional_for_base, parse_scaled)
+
+
+@pytest.mark.parametrize('text, decimals, units', [
+    ('0.000123', 8, 12300),
+    ('65000.5', 2, 6500050),
+    ('12', 4, 120000),
+    ('1e-05', 6, 10),
+    ('0', 3, 0),
+    ('-1.5', 2, -150),
+])
+def test_parse_scaled(text, decimals, units):
+    assert parse_scaled(text, decimals) == units
+
+
+@pytest.mark.parametrize('text, decimals', [
+    ('0.00012300', 8), ('65000.50', 2), ('12.0000', 4), ('0.001', 3), ('-1.50', 2), ('7', 0),
+])
+def test_format_round_trips(text, decimals):
+    units = parse_scaled(text, decimals)
+    assert format_scaled(units, decimals) == text
+    assert parse_scaled(format_scaled(units, decimals), decimals) == units
+
+
+def test_parse_rejects_extra_digits_unless_truncating():
+    with pytest.raises(ValueError):
+        parse_scaled('0.123', 2)
+    assert parse_scaled('0.129', 2, exact=False) == 12
+    assert parse_scaled('0.1200', 2) == 12
+
+
+def test_decimals_and_floor():
+    assert decimals_of('0.0001') == 4
+    assert decimals_of('1') == 0
+    assert decimals_of('0.010') == 2
+    assert floor_decimal_string('1.23999', 2) == '1.23'
+
+
+def test_instrument_scale_order_sizes():
+    scale = InstrumentScale('BTCUSDT', tick_size='0.01', lot_size='0.000001', quote_precision='0.0001',
+                            min_qty='0.000048', min_amount='1')
+    assert scale.format_price(scale.price('65000.12')) == '65000.12'
+    assert scale.order_qty('0.0123456789') == '0.012345'
+    assert scale.order_qty('25.123456', quote_sized=True) == '25.1234'
+    with pytest.raises(ValueError):
+        scale.order_qty('0.00001')
+    with pytest.raises(ValueError):
+        scale.order_qty('0.5', quote_sized=True)
+    # price * qty units, rounded down to the quote precision
+    assert scale.format_notional(scale.price('65000.12') * scale.qty('0.5')) == '32500.0600'
+
+
+def test_book_keeps_strings_exact_and_widens_its_scale():
+    book = FixedPointBook()
+    book.apply([['100.5', '2']], [['101', '1.25']], snapshot=True)
+    book.apply([['100.25', '0.001'], ['100.5', '0']], [])
+
+    assert book.to_strings() == ([['100.25', '0.001']], [['101.00', '1.250']])
+    assert book.levels() == ([(10025, 1)], [(10100, 1250)])
+
+
+def test_integer_walks():
+    asks = [(100, 2), (101, 3)]  # price and qty units
+    assert base_for_notional(asks, 100 * 2 + 101 * 1) == (3, 301)
+    assert base_for_notional(asks, 250) == (2, 200)
+    assert notional_for_base(asks, 4) == (4, 100 * 2 + 101 * 2)
+    assert notional_for_base(asks, 10) == (5, 503)
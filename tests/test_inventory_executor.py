@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from fixed_point import InstrumentScale
+from mock_exchange import MockExchangeSession
+from walllet_connect import InventoryTriangleExecutor, WalletManager, cycle_leg_sides
+
+PRICES = {"ADAUSDC": 0.70, "ADABTC": 0.0000068, "BTCUSDC": 103000.0}
+BALANCES = {"USDC": 1000.0, "ADA": 1000.0, "BTC": 0.01}
+TARGETS = {"USDC": "1000", "ADA": "1000", "BTC": "0.01"}
+PAIRS = ["ADAUSDC", "ADABTC", "BTCUSDC"]
+LEGS = ["10", "14", "0.00009"]
+SCALES = {symbol: InstrumentScale(symbol, tick_size='0.0000001', lot_size='0.00000001', quote_precision='0.00000001')
+          for symbol in PAIRS}
+
+
+class RejectingSession(MockExchangeSession):
+    """Rejects the first order on one symbol, like an exchange-side insufficient balance"""
+    def __init__(self, reject_symbol, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reject_symbol = reject_symbol
+
+    def place_order(self, category, symbol, side, orderType, qty, **kwargs):
+        if symbol == self.reject_symbol:
+            self.reject_symbol = None
+            return {'retCode': 170131, 'retMsg': 'Insufficient balance.', 'result': {}}
+        return super().place_order(category, symbol, side, orderType, qty, **kwargs)
+
+
+def make_executor(session, tolerance="0.05"):
+    executor = InventoryTriangleExecutor(WalletManager("mock", "mock", session=session), "10",
+                                         inventory_targets=TARGETS, rebalance_tolerance=tolerance,
+                                         instrument_scales=SCALES)
+    executor.poll_interval = 0.001
+    return executor
+
+
+def test_cycle_leg_sides_follow_the_coin_path():
+    assert cycle_leg_sides(PAIRS) == ["BUY", "SELL", "SELL"]
+    assert cycle_leg_sides(["BTCUSDC", "ADABTC", "ADAUSDC"]) == ["BUY", "BUY", "SELL"]
+    assert cycle_leg_sides(["ADABTC", "BTCUSDC", "ADAUSDC"], start_coin="ADA") == ["SELL", "SELL", "BUY"]
+    with pytest.raises(ValueError):
+        cycle_leg_sides(["ADABTC", "ADAUSDC", "BTCUSDC"], start_coin="ADA")
+
+
+def test_all_legs_fill_concurrently():
+    session = MockExchangeSession(PRICES, BALANCES, latency_ms=5)
+    executor = make_executor(session)
+
+    async def run():
+        result = await executor.execute_triangle_trade(PAIRS, leg_quantities=LEGS)
+        await executor.rebalance_task
+        return result
+
+    result = asyncio.run(run())
+    assert result['status'] == 'success'
+    assert [order['symbol'] for order in result['orders']] == PAIRS
+    # Sequential legs would arrive at least two round trips apart
+    assert session.arrival_skew_ms({order['orderId'] for order in result['orders']}) < 10
+
+
+def test_failed_leg_reports_filled_legs_and_unwinds_them():
+    session = RejectingSession("ADABTC", PRICES, BALANCES, latency_ms=1)
+    executor = make_executor(session, tolerance="0")
+
+    async def run():
+        result = await executor.execute_triangle_trade(PAIRS, leg_quantities=LEGS)
+        assert executor.rebalance_task is not None
+        await executor.rebalance_task
+        return result
+
+    result = asyncio.run(run())
+    assert result['status'] == 'partial'
+    assert [order['symbol'] for order in result['orders']] == ["ADAUSDC", "BTCUSDC"]
+    assert all(order['orderId'] in session.orders for order in result['orders'])
+    assert [leg['symbol'] for leg in result['failed_legs']] == ["ADABTC"]
+    assert set(result['executed_amounts']) == {"ADAUSDC", "BTCUSDC"}
+    # USDC and ADA are traded back to target, BTC takes up the rest
+    assert session.balances["USDC"] == pytest.approx(1000, abs=1e-5)
+    assert session.balances["ADA"] == pytest.approx(1000, abs=1e-5)
+
+
+def test_every_leg_failing_is_an_error():
+    session = MockExchangeSession({}, BALANCES, latency_ms=1)
+    executor = make_executor(session)
+
+    result = asyncio.run(executor.execute_triangle_trade(PAIRS, leg_quantities=LEGS))
+    assert result['status'] == 'error'
+    assert result['orders'] == []
+    assert len(result['failed_legs']) == 3
+    assert executor.rebalance_task is None
+
+
+def test_success_reports_leg_timing_and_restores_targets():
+    session = MockExchangeSession(PRICES, BALANCES, latency_ms=1)
+    executor = make_executor(session, tolerance="0")
+
+    async def run():
+        result = await executor.execute_triangle_trade(PAIRS, leg_quantities=LEGS)
+        await executor.rebalance_task
+        return result
+
+    result = asyncio.run(run())
+    timing = result['leg_timing']
+    assert len(timing['round_trip_ms']) == 3
+    assert timing['send_skew_ms'] >= 0 and timing['ack_skew_ms'] >= 0
+    assert executor.leg_timings == [timing]
+    # BTC, the last coin of the path, takes up the cycle's profit or loss
+    assert session.balances["USDC"] == pytest.approx(1000, abs=1e-5)
+    assert session.balances["ADA"] == pytest.approx(1000, abs=1e-5)
+
+
+def test_deviation_within_tolerance_is_not_traded():
+    session = MockExchangeSession(PRICES, BALANCES, latency_ms=1)
+    executor = make_executor(session, tolerance="0.05")
+
+    async def run():
+        await executor.execute_triangle_trade(PAIRS, leg_quantities=LEGS)
+        await executor.rebalance_task
+
+    asyncio.run(run())
+    assert len(session.orders) == 3
+
+
+def test_legs_are_not_sent_without_enough_inventory():
+    session = MockExchangeSession(PRICES, dict(BALANCES, ADA=5.0), latency_ms=1)
+    executor = make_executor(session)
+
+    with pytest.raises(ValueError):
+        asyncio.run(executor.execute_triangle_trade(PAIRS, leg_quantities=LEGS))
+    with pytest.raises(ValueError):
+        asyncio.run(executor.execute_triangle_trade(PAIRS))
+    assert session.orders == {}
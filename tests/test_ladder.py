@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from triangle_no_pandas import LADDER_FIELDS, BybitTriangleCalculation
+
+SIZES = [10, 100, 1000, 5000, 100000]  # the largest exhausts the 10-level books
+
+
+@pytest.fixture
+def market(triangle_market):
+    topology, books = triangle_market
+    return topology['triangles'], books
+
+
+def calculator(triangles, **options):
+    return BybitTriangleCalculation(triangles=triangles, min_profit=-100, max_profit=100, results_file=None,
+                                    verbose=False, **options)
+
+
+def test_ladder_points_match_per_size_walks(market):
+    triangles, books = market
+    ladder = calculator(triangles, ladder=SIZES, fee_rate=0.001)
+    results = ladder.calculate_arbitrage(books)
+    assert len(results) == len(triangles)
+
+    for triangle in triangles:
+        pair1, pair2, pair3 = triangle['pair1'], triangle['pair2'], triangle['pair3']
+        grid = results[f"{pair1}-{pair2}-{pair3}"]['ladder']
+        assert [point[LADDER_FIELDS.index('amount')] for point in grid] == SIZES
+        for amount, final_amount, profit_amount, profit_percent in grid:
+            value1 = ladder.calculate_value(pair1, amount, 'asks')
+            value2 = ladder.calculate_value(pair2, value1, 'bids')
+            expected = ladder.calculate_value(pair3, value2, 'asks') * ladder.fee_multiplier
+            assert final_amount == pytest.approx(expected, rel=1e-9)
+            assert profit_amount == pytest.approx(expected - amount, rel=1e-9, abs=1e-9)
+            assert profit_percent == pytest.approx((expected - amount) / amount * 100, rel=1e-9, abs=1e-9)
+
+
+def test_ladder_matches_single_size_passes(market):
+    triangles, books = market
+    ladder_results = calculator(triangles, ladder=SIZES).calculate_arbitrage(books)
+    for size in SIZES:
+        for key, result in calculator(triangles, trade_amount=size).calculate_arbitrage(books).items():
+            point = next(point for point in ladder_results[key]['ladder'] if point[0] == size)
+            assert round(point[3], 4) == result['profit_percent']
+
+
+def test_top_level_fields_describe_the_best_size(market):
+    triangles, books = market
+    for result in calculator(triangles, ladder=SIZES).calculate_arbitrage(books).values():
+        best = max(result['ladder'], key=lambda point: point[2])
+        assert result['initial_amount'] == best[0]
+        assert result['profit_percent'] == round(best[3], 4)
+
+
+def test_ladder_reports_only_triangles_in_range(market):
+    triangles, books = market
+    out_of_range = BybitTriangleCalculation(triangles=triangles, ladder=SIZES, min_profit=50, max_profit=100,
+                                            results_file=None, verbose=False)
+    assert out_of_range.calculate_arbitrage(books) == {}
+
+
+def test_grid_serialises_as_plain_points(market):
+    triangles, books = market
+    result = next(iter(calculator(triangles, ladder=SIZES).calculate_arbitrage(books).values()))
+    grid = result['ladder']
+    assert json.loads(json.dumps(grid, default=list)) == [list(point) for point in grid.to_list()]
+    assert grid[1:3] == grid.to_list()[1:3]
+    assert grid == grid.to_list()
@@ -0,0 +1,72 @@
+import json
+import urllib.request
+
+from metrics import MetricsRegistry, REGISTRY, start_metrics_server
+from test_triple_socket import MultiSocketClient, SymbolWebSocket
+
+
+def snapshot(symbol):
+    return json.dumps({'topic': f'orderbook.50.{symbol}', 'type': 'snapshot', 'ts': 1,
+                       'data': {'s': symbol, 'b': [['100', '1']], 'a': [['101', '1']], 'u': 1, 'seq': 1}})
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+    text = registry.render()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert 'latency_seconds_count 4' in text
+
+
+def test_same_name_and_labels_return_the_same_metric():
+    registry = MetricsRegistry()
+    assert registry.counter('hits_total', labels={'a': 1}) is registry.counter('hits_total', labels={'a': 1})
+    assert registry.counter('hits_total', labels={'a': 1}) is not registry.counter('hits_total', labels={'a': 2})
+
+
+def test_two_clients_keep_separate_series(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the clients' JSON writers write under the working directory
+    clients = [MultiSocketClient(['BTCUSDT'], name=name) for name in ('metrics_a', 'metrics_b')]
+    try:
+        # Socket ids restart at 1 in every client; build each client's first socket as _start_socket does
+        sockets = [SymbolWebSocket(['BTCUSDT'], 1, client.orderbooks, client.scheduler, client_name=client.name)
+                   for client in clients]
+        for _ in range(3):
+            sockets[0]._on_message(None, snapshot('BTCUSDT'))
+        sockets[1]._on_message(None, snapshot('BTCUSDT'))
+
+        assert sockets[0].metric_messages.value == 3
+        assert sockets[1].metric_messages.value == 1
+        text = REGISTRY.render()
+        assert 'bybit_ws_messages_total{client="metrics_a",socket="1"} 3' in text
+        assert 'bybit_ws_messages_total{client="metrics_b",socket="1"} 1' in text
+        assert 'scheduler_pending_symbols{client="metrics_a"}' in text
+        assert 'scheduler_pending_symbols{client="metrics_b"}' in text
+    finally:
+        for client in clients:
+            client.stop()
+
+
+def test_unnamed_clients_get_distinct_labels(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first, second = MultiSocketClient(['BTCUSDT']), MultiSocketClient(['BTCUSDT'])
+    try:
+        assert first.name != second.name
+    finally:
+        first.stop()
+        second.stop()
+
+
+def test_server_exposes_the_registry():
+    registry = MetricsRegistry()
+    registry.counter('served_total', 'Served').inc(2)
+    server = start_metrics_server(port=0, registry=registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            assert 'served_total 2' in response.read().decode()
+    finally:
+        server.stop()
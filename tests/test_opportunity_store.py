@@ -0,0 +1,122 @@
+import sqlite3
+import time
+
+from opportunity_store import OpportunityStore
+
+
+def result(profit_percent, ladder=None):
+    return {'initial_amount': 100.0, 'final_amount': 100 + profit_percent, 'profit_amount': profit_percent,
+            'profit_percent': profit_percent, 'ladder': ladder}
+
+
+RESULTS = {
+    'ADAUSDT-ADABTC-BTCUSDT': result(0.5, ladder=[{'amount': 100, 'profit_percent': 0.5}]),
+    'XRPUSDT-XRPBTC-BTCUSDT': result(1.5),
+    'SOLUSDT-SOLBTC-BTCUSDT': result(1.0)
+}
+
+
+def test_top_n_reads_the_latest_flushed_pass(tmp_path):
+    store = OpportunityStore(str(tmp_path / 'opportunities.db'))
+    store.record_pass({'ADAUSDT-ADABTC-BTCUSDT': result(9.0)}, ts=1000.0)
+    latest = store.record_pass(RESULTS, stats={'trade_amount': 100, 'triangles_processed': 3})
+    # Nothing is visible before the writer flushes
+    assert store.top_n() == []
+
+    assert store.flush() == 2
+    top = store.top_n(n=2)
+    assert [row['triangle'] for row in top] == ['XRPUSDT-XRPBTC-BTCUSDT', 'SOLUSDT-SOLBTC-BTCUSDT']
+    assert {row['pass_id'] for row in top} == {latest}
+    assert (top[0]['pair1'], top[0]['pair2'], top[0]['pair3']) == ('XRPUSDT', 'XRPBTC', 'BTCUSDT')
+    assert store.top_n(n=3)[2]['ladder'] == [{'amount': 100, 'profit_percent': 0.5}]
+    assert store.rows_written == 4
+
+
+def test_top_n_ignores_a_stale_pass(tmp_path):
+    store = OpportunityStore(str(tmp_path / 'opportunities.db'))
+    store.record_pass(RESULTS, ts=time.time() - 60)
+    store.flush()
+
+    assert store.top_n(max_age=30) == []
+    assert len(store.top_n(max_age=120)) == 3
+
+
+def test_pass_ids_continue_after_a_restart(tmp_path):
+    path = str(tmp_path / 'opportunities.db')
+    store = OpportunityStore(path)
+    store.record_pass(RESULTS)
+    store.record_pass(RESULTS)
+    store.flush()
+
+    assert OpportunityStore(path).record_pass(RESULTS) == 3
+
+
+def test_history_and_hourly_queries(tmp_path):
+    store = OpportunityStore(str(tmp_path / 'opportunities.db'))
+    for ts in (3600.0, 3700.0, 7300.0):
+        store.record_pass(RESULTS, ts=ts)
+    store.flush()
+
+    history = store.triangle_history('XRPUSDT-XRPBTC-BTCUSDT', since=3650)
+    assert [row['ts'] for row in history] == [7300.0, 3700.0]
+    hours = store.per_hour()
+    assert [(row['hour'], row['opportunities'], row['triangles']) for row in hours] == [(3600, 6, 3), (7200, 3, 3)]
+    assert hours[0]['best_profit_percent'] == 1.5
+
+
+def test_background_writer_flushes_on_stop(tmp_path):
+    store = OpportunityStore(str(tmp_path / 'opportunities.db'), flush_interval=60)
+    store.start()
+    store.record_pass(RESULTS)
+    store.stop()
+
+    assert store.passes_written == 1
+    assert len(store.top_n()) == 3
+
+
+def test_oldest_passes_are_dropped_when_the_writer_falls_behind(tmp_path):
+    store = OpportunityStore(str(tmp_path / 'opportunities.db'), max_pending=2)
+    dropped = store.metric_dropped.value
+    first = store.record_pass(RESULTS)
+    store.record_pass(RESULTS)
+    store.record_pass(RESULTS)
+
+    assert store.metric_dropped.value == dropped + 1
+    assert [entry[0] for entry in store.pending] == [first + 1, first + 2]
+
+
+def test_cycle_anchor_and_sides_round_trip(tmp_path, multi_quote_market):
+    from cycle_calculator import CycleCalculation
+
+    instruments, books = multi_quote_market
+    store = OpportunityStore(str(tmp_path / 'opportunities.db'))
+    calculator = CycleCalculation(instruments, anchors=('BTC',), trade_amount=100, min_profit=-100, max_profit=100,
+                                  store=store)
+    results = calculator.calculate_arbitrage(dict(books))
+    store.flush()
+
+    row = store.top_n(1)[0]
+    result = results[row['triangle']]
+    assert row['anchor'] == 'BTC'
+    assert row['sides'] == result['sides']
+    assert [row['pair1'], row['pair2'], row['pair3']] == result['pairs']
+    assert row['initial_amount'] == result['initial_amount']
+
+
+def test_existing_database_gains_the_new_columns(tmp_path):
+    path = str(tmp_path / 'opportunities.db')
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        "CREATE TABLE opportunities (id INTEGER PRIMARY KEY, pass_id INTEGER NOT NULL, ts REAL NOT NULL, "
+        "triangle TEXT NOT NULL, pair1 TEXT, pair2 TEXT, pair3 TEXT, initial_amount REAL, final_amount REAL, "
+        "profit_amount REAL, profit_percent REAL, ladder TEXT);"
+    )
+    connection.close()
+
+    store = OpportunityStore(path)
+    store.record_pass(RESULTS)
+    store.flush()
+
+    top = store.top_n(1)[0]
+    assert top['triangle'] == 'XRPUSDT-XRPBTC-BTCUSDT'
+    assert (top['anchor'], top['sides']) == (None, None)
@@ -0,0 +1,122 @@
+import pytest
+
+from mock_exchange import MockExchangeSession, PaperExchangeSession
+
+
+class Books:
+    """Mutable book source standing in for MultiSocketClient.get_orderbooks"""
+    def __init__(self, asks=((100.0, 1.0), (101.0, 1.0)), bids=((99.0, 1.0), (98.0, 1.0))):
+        self.books = {'ADAUSDT': {'asks': tuple(asks), 'bids': tuple(bids)}}
+        self.after_submit = None
+
+    def __call__(self):
+        books = self.books
+        # The submit-time read comes first, the match sees the book the order raced against
+        if self.after_submit is not None:
+            self.books, self.after_submit = self.after_submit, None
+        return books
+
+
+def make_session(books, **kwargs):
+    kwargs.setdefault('latency_ms', 0)
+    return PaperExchangeSession(books, {'USDT': 1000.0, 'ADA': 10.0}, **kwargs)
+
+
+def order(session, order_id):
+    return session.get_order_history(category="spot", symbol="ADAUSDT", orderId=order_id)['result']['list'][0]
+
+
+def test_mock_session_stamps_arrival_after_latency():
+    session = MockExchangeSession({'ADAUSDT': 0.7}, {'USDT': 100.0}, latency_ms=20)
+    session.place_order(category="spot", symbol="ADAUSDT", side="Buy", orderType="Market", qty="10")
+
+    entry = session.order_log[0]
+    assert (entry['received_ns'] - entry['submitted_ns']) / 1e6 >= 20
+    assert entry['filled_ns'] == entry['received_ns']
+
+
+def test_quote_sized_buy_walks_levels_and_pays_fee_in_base():
+    session = make_session(Books())
+    order_id = session.place_order(category="spot", symbol="ADAUSDT", side="Buy", orderType="Market",
+                                   qty="150")['result']['orderId']
+
+    details = order(session, order_id)
+    assert details['orderStatus'] == 'Filled'
+    assert details['cumExecQty'] == '1.49504950'
+    assert float(details['cumExecValue']) == pytest.approx(150, abs=1e-6)
+    assert details['feeCurrency'] == 'ADA'
+    assert session.balances['USDT'] == pytest.approx(850, abs=1e-6)
+    assert session.balances['ADA'] == pytest.approx(10 + 1.4950495 * 0.999)
+
+
+def test_sell_slippage_is_measured_against_the_book_at_submit():
+    books = Books()
+    books.after_submit = {'ADAUSDT': {'asks': ((100.0, 1.0),), 'bids': ((98.0, 5.0),)}}
+    session = make_session(books)
+    order_id = session.place_order(category="spot", symbol="ADAUSDT", side="Sell", orderType="Market",
+                                   qty="2")['result']['orderId']
+
+    fill = session.fills[0]
+    assert order(session, order_id)['orderStatus'] == 'Filled'
+    assert fill['best_at_submit'] == 99.0
+    assert fill['avg_price'] == 98.0
+    assert fill['slippage_bps'] == pytest.approx((1 - 98 / 99) * 10000)
+    assert fill['fee'] == pytest.approx(196 * 0.001)
+    assert session.balances['USDT'] == pytest.approx(1000 + 196 * 0.999)
+
+
+def test_order_out_of_depth_rests_until_the_book_refills():
+    books = Books()
+    session = make_session(books)
+    order_id = session.place_order(category="spot", symbol="ADAUSDT", side="Sell", orderType="Market",
+                                   qty="3")['result']['orderId']
+    assert session.orders[order_id]['orderStatus'] == 'PartiallyFilled'
+    assert session.orders[order_id]['cumExecQty'] == '2.00000000'
+    first_fill_ns = session.order_log[0]['filled_ns']
+
+    books.books = {'ADAUSDT': {'asks': ((100.0, 1.0),), 'bids': ((97.0, 4.0),)}}
+    details = order(session, order_id)
+
+    assert details['orderStatus'] == 'Filled'
+    assert details['cumExecQty'] == '3.00000000'
+    assert float(details['avgPrice']) == pytest.approx((99 + 98 + 97) / 3)
+    assert session.order_log[0]['filled_ns'] > first_fill_ns >= session.order_log[0]['received_ns']
+    assert session.fills[0]['submit_to_fill_ms'] >= session.fills[0]['submit_to_match_ms']
+    assert session.balances['ADA'] == pytest.approx(7)
+    assert not session.resting
+
+
+def test_resting_remainder_is_cancelled_after_the_timeout():
+    # The book never updates, so the remainder has nothing new to fill against
+    session = make_session(Books(), partial_timeout_ms=0)
+    order_id = session.place_order(category="spot", symbol="ADAUSDT", side="Sell", orderType="Market",
+                                   qty="3")['result']['orderId']
+
+    details = order(session, order_id)
+    assert details['orderStatus'] == 'PartiallyFilledCanceled'
+    assert details['cumExecQty'] == '2.00000000'
+    assert session.slippage_report()['partial_fills'] == 1
+
+
+def test_max_fill_levels_cancels_the_rest_at_once():
+    session = make_session(Books(), max_fill_levels=1)
+    order_id = session.place_order(category="spot", symbol="ADAUSDT", side="Sell", orderType="Market",
+                                   qty="2")['result']['orderId']
+
+    assert session.orders[order_id]['orderStatus'] == 'PartiallyFilledCanceled'
+    assert session.orders[order_id]['cumExecQty'] == '1.00000000'
+    assert not session.resting
+
+
+def test_rejections_leave_balances_untouched():
+    session = make_session(Books(bids=()))
+    no_liquidity = session.place_order(category="spot", symbol="ADAUSDT", side="Sell", orderType="Market", qty="1")
+    base_sized = session.place_order(category="spot", symbol="ADAUSDT", side="Buy", orderType="Market",
+                                     qty="2", marketUnit="baseCoin")
+    session.balances['USDT'] = 50.0
+    insufficient = session.place_order(category="spot", symbol="ADAUSDT", side="Buy", orderType="Market", qty="60")
+
+    assert no_liquidity['retCode'] == 170136
+    assert base_sized['retCode'] == 0
+    assert insufficient['retCode'] == 170131
+    assert session.balances['ADA'] == pytest.approx(10 + 2 * 0.999)
@@ -0,0 +1,77 @@
+import os
+import threading
+
+from profiling import FunctionTimers, ProfilingControl, send_command
+
+
+class Worker:
+    def step(self, value):
+        return value * 2
+
+
+TARGETS = [(__name__, 'Worker', 'step')]
+
+
+def test_timers_wrap_only_while_enabled():
+    original = Worker.__dict__['step']
+    timers = FunctionTimers(TARGETS + [('not_loaded_module', 'Missing', 'method')])
+    assert timers.enable() == ['Worker.step']
+    assert Worker.__dict__['step'] is not original
+    assert [Worker().step(i) for i in range(5)] == [0, 2, 4, 6, 8]
+    timers.disable()
+
+    assert Worker.__dict__['step'] is original
+    assert timers.report()['Worker.step']['calls'] == 5
+    Worker().step(1)
+    assert timers.report()['Worker.step']['calls'] == 5
+
+
+def test_timer_counts_are_exact_across_threads():
+    timers = FunctionTimers(TARGETS)
+    timers.enable()
+    try:
+        threads = [threading.Thread(target=lambda: [Worker().step(i) for i in range(2000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        timers.disable()
+    assert timers.report()['Worker.step']['calls'] == 8000
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+def test_control_socket_runs_commands(tmp_path):
+    control = ProfilingControl(output_dir=str(tmp_path / 'profiles'), socket_path=str(tmp_path / 'control.sock'),
+                               timers=FunctionTimers(TARGETS))
+    control.start()
+    stop = threading.Event()
+    busy = threading.Thread(target=spin, args=(stop,))
+    busy.start()
+    try:
+        send = lambda command: send_command(control.socket_path, command, timeout=10)
+        assert send('timers on') == 'timers enabled: Worker.step'
+        assert send('status').startswith('timers on')
+        assert send('timers off') == 'timers disabled'
+
+        path = send('profile 0.2')
+        with open(path) as f:
+            assert 'spin' in f.read()
+        assert os.path.exists(path.replace('.txt', '.folded'))
+
+        assert send('mem').startswith('tracemalloc started')
+        leak = [bytearray(1000) for _ in range(1000)]
+        with open(send('mem')) as f:
+            assert 'traced' in f.readline()
+        assert send('mem stop') == 'tracemalloc stopped'
+        assert send('bogus') == 'unknown command: bogus'
+        assert leak
+    finally:
+        stop.set()
+        busy.join()
+        control.stop()
+    assert not os.path.exists(control.socket_path)
@@ -0,0 +1,95 @@
+import json
+import random
+import time
+
+import pytest
+
+from feed_simulator import LocalFeedSimulator
+from test_triple_socket import MultiSocketClient, SymbolWebSocket
+from update_scheduler import DirtySymbolScheduler
+
+SNAPSHOT = json.dumps({'topic': 'orderbook.50.BTCUSDT', 'type': 'snapshot', 'ts': 1,
+                       'data': {'s': 'BTCUSDT', 'b': [['100', '1']], 'a': [['101', '1']], 'u': 1}})
+
+
+class FlakyApp:
+    """Connection that closes at once; the ones listed in deliver_on deliver a snapshot first"""
+    def __init__(self, socket, deliver_on, stop_after):
+        self.socket, self.deliver_on, self.stop_after = socket, deliver_on, stop_after
+        self.connections = 0
+
+    def __call__(self, url, on_message=None, on_open=None, on_error=None, on_close=None):
+        self.connections += 1
+        self.on_message, self.on_close = on_message, on_close
+        return self
+
+    def run_forever(self, **kwargs):
+        if self.connections in self.deliver_on:
+            self.on_message(self, SNAPSHOT)
+        if self.connections == self.stop_after:
+            self.socket.running = False
+        self.on_close(self, 1006, 'dropped')
+
+    def close(self):
+        pass
+
+
+def test_backoff_grows_exponentially_up_to_the_cap():
+    socket = SymbolWebSocket([], 1, {}, DirtySymbolScheduler(name='test_backoff'), backoff_base=0.5, backoff_cap=30)
+    random.seed(3)
+    for attempt in range(10):
+        ceiling = min(30, 0.5 * 2 ** attempt)
+        assert ceiling * 0.5 <= socket._backoff_delay(attempt) <= ceiling
+
+
+def test_reconnect_loop_retries_without_recursion_and_resets_after_data(monkeypatch):
+    socket = SymbolWebSocket(['BTCUSDT'], 1, {}, DirtySymbolScheduler(name='test_reconnect'))
+    app = socket.ws_app_factory = FlakyApp(socket, deliver_on={3}, stop_after=6)
+    attempts = []
+    monkeypatch.setattr(socket, '_backoff_delay', lambda attempt: attempts.append(attempt) or 0)
+    socket.running = True
+    socket._ws_thread()
+
+    assert app.connections == 6
+    # The third connection delivered data, so the next wait starts from the base delay again
+    assert attempts == [0, 1, 0, 1, 2]
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.mark.parametrize('standby_sockets', [0, 1])
+def test_dropped_connection_recovers(tmp_path, monkeypatch, standby_sockets):
+    monkeypatch.chdir(tmp_path)  # the client's JSON writer writes under the working directory
+    symbols = ['BTCUSDT', 'ETHUSDT', 'ETHBTC', 'SOLUSDT', 'SOLBTC', 'XRPUSDT']
+    simulator = LocalFeedSimulator(symbols, rate_per_symbol=100)
+    simulator.start()
+    client = MultiSocketClient(symbols, ws_app_factory=simulator.app_factory(), standby_sockets=standby_sockets,
+                               subscribe_rate=1000, subscribe_burst=100)
+    try:
+        client.start()
+        for socket in client.sockets:
+            socket.backoff_base, socket.backoff_cap = 0.01, 0.05
+        assert wait_until(lambda: set(client.get_orderbooks()) == set(symbols)
+                          and all(s.connected for s in client.sockets))
+        victim = client.sockets[0]
+        lost = list(victim.symbols)
+        simulator.drop(victim.ws)
+
+        assert wait_until(lambda: len(client.get_outages()) == 1)
+        outage = client.get_outages()[0]
+        assert outage['recovery'] == ('standby' if standby_sockets else 'reconnect')
+        carrier = next(socket for socket in client.sockets if set(lost) <= socket.symbol_set)
+        assert (carrier is not victim) == bool(standby_sockets)
+        # Books of the affected symbols are live again
+        before = {symbol: client.get_orderbooks()[symbol]['recv_ns'] for symbol in lost}
+        assert wait_until(lambda: all(client.get_orderbooks()[symbol]['recv_ns'] > before[symbol] for symbol in lost))
+    finally:
+        client.stop()
+        simulator.stop()
@@ -0,0 +1,109 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mock_exchange import MockExchangeSession
+from request_scheduler import BACKGROUND, URGENT, RequestScheduler, TokenBucket, _Request
+# MockExchangeSession imports this lazily; a first import inside a timed test would stall the in-flight orders
+import walllet_connect  # noqa: F401
+
+PRICES = {"ADAUSDC": 0.70}
+
+
+def place(target, qty="10"):
+    return target.place_order(category="spot", symbol="ADAUSDC", side="BUY", orderType="MARKET", qty=qty)
+
+
+def test_bucket_spends_capacity_then_refills_at_rate():
+    bucket = TokenBucket(rate=10, capacity=2)
+    now = bucket.updated
+    bucket.take(now)
+    bucket.take(now)
+
+    assert bucket.wait_time(now) == pytest.approx(0.1)
+    assert bucket.wait_time(now + 0.1) == 0.0
+    # Idle time never banks more than the capacity
+    assert bucket.wait_time(now + 60) == 0.0
+    assert bucket.tokens == 2
+
+
+def test_bucket_follows_exchange_headers():
+    bucket = TokenBucket(rate=10)
+    now = bucket.updated
+    bucket.update(limit=20, remaining=15, now=now)
+    assert (bucket.rate, bucket.capacity, bucket.tokens) == (20, 20, 10)
+
+    # Remaining only ever lowers the local count
+    bucket.update(remaining=18, now=now)
+    assert bucket.tokens == 10
+
+    bucket.update(remaining=0, reset_ms=int((time.time() + 0.5) * 1000), now=now)
+    assert 0.4 < bucket.wait_time(now) <= 0.5
+
+
+def test_urgent_requests_leave_the_queue_first():
+    scheduler = RequestScheduler(MockExchangeSession(PRICES, {"USDC": 100.0}), name='test_priority')
+    background = _Request('get_wallet_balance', {}, BACKGROUND)
+    urgent = _Request('place_order', {}, URGENT)
+    scheduler.queue = [(BACKGROUND, 0, background), (URGENT, 1, urgent)]
+
+    now = time.monotonic()
+    assert scheduler._next_ready(now) == (urgent, 0.0)
+    assert scheduler._next_ready(now) == (background, 0.0)
+    assert scheduler._next_ready(now) == (None, 1.0)
+
+
+def test_scheduled_orders_stay_under_the_exchange_limit():
+    session = MockExchangeSession(PRICES, {"USDC": 1e6}, latency_ms=1, rate_limit=5, return_response_headers=True)
+    scheduler = RequestScheduler(session, limits={'place_order': 5}, name='test_limit')
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(lambda _: place(scheduler), range(10)))
+        elapsed = time.perf_counter() - start
+    finally:
+        scheduler.stop()
+
+    assert all(response['retCode'] == 0 for response in responses)
+    assert session.rejected == 0
+    # Five go at once, the other five need a refill
+    assert elapsed >= 0.9
+
+
+def test_orders_queued_together_share_a_batch():
+    session = MockExchangeSession(PRICES, {"USDC": 1e6}, latency_ms=1)
+    scheduler = RequestScheduler(session, batch_window_ms=100, name='test_batch')
+    try:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            responses = list(pool.map(lambda qty: place(scheduler, qty), ["10", "20", "30"]))
+    finally:
+        scheduler.stop()
+
+    order_ids = [response['result']['orderId'] for response in responses]
+    assert len(set(order_ids)) == 3
+    assert [session.orders[order_id]['cumExecValue'] for order_id in order_ids] == ['10.0', '20.0', '30.0']
+    assert scheduler.get_stats()['batched_orders'] == 3
+
+
+def test_stop_fails_waiting_callers_instead_of_hanging():
+    scheduler = RequestScheduler(MockExchangeSession(PRICES, {"USDC": 1e6}), ip_limit=1, name='test_stop')
+    place(scheduler)
+    errors = []
+
+    def waiting():
+        try:
+            place(scheduler)
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=waiting)
+    thread.start()
+    while not scheduler.queue:
+        time.sleep(0.001)
+    scheduler.stop()
+    thread.join(timeout=2)
+
+    assert not thread.is_alive()
+    assert len(errors) == 1
@@ -0,0 +1,96 @@
+import asyncio
+import gc
+import os
+import threading
+
+import pytest
+
+from runtime_config import RuntimeConfig, parse_cpus
+
+needs_affinity = pytest.mark.skipif(not hasattr(os, 'sched_setaffinity'), reason="no sched_setaffinity")
+
+
+def test_parse_cpus():
+    assert parse_cpus('0-2,5') == {0, 1, 2, 5}
+    assert parse_cpus(' 3 , ,7-7') == {3, 7}
+    assert parse_cpus('') == set()
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv('RUNTIME_AFFINITY', 'ingest=0-1; calculator=2;executor=;background=3')
+    monkeypatch.setenv('RUNTIME_GC_THRESHOLDS', '50000,50,100')
+    monkeypatch.setenv('RUNTIME_GC_FREEZE', '1')
+    monkeypatch.setenv('RUNTIME_UVLOOP', '0')
+    config = RuntimeConfig.from_env()
+
+    assert config.affinity == {'ingest': {0, 1}, 'calculator': {2}, 'background': {3}}
+    assert config.gc_thresholds == (50000, 50, 100)
+    assert config.gc_freeze and not config.use_uvloop
+
+
+def test_unknown_role_is_rejected():
+    with pytest.raises(ValueError):
+        RuntimeConfig(affinity={'ingets': [0]})
+
+
+def pinned_in_thread(config, role):
+    """Pin a fresh thread, so the test process keeps its own affinity"""
+    outcome = {}
+
+    def target():
+        outcome['changed'] = config.pin(role)
+        outcome['cpus'] = os.sched_getaffinity(0)
+    thread = threading.Thread(target=target, name=f"pin-{role}")
+    thread.start()
+    thread.join()
+    return outcome
+
+
+@needs_affinity
+def test_pin_restricts_the_calling_thread():
+    before = os.sched_getaffinity(0)
+    cpu = min(before)
+    config = RuntimeConfig(affinity={'ingest': [cpu], 'calculator': [100000]})
+
+    assert pinned_in_thread(config, 'ingest') == {'changed': True, 'cpus': {cpu}}
+    assert config.pinned == {'pin-ingest': 'ingest'}
+    # CPUs that do not exist here, and roles without CPUs, leave the thread alone
+    assert pinned_in_thread(config, 'calculator')['changed'] is False
+    assert pinned_in_thread(config, 'executor')['changed'] is False
+    assert os.sched_getaffinity(0) == before
+
+
+def test_gc_thresholds_and_freeze():
+    thresholds = gc.get_threshold()
+    config = RuntimeConfig(gc_thresholds=(50000, 50, 100), gc_freeze=True)
+    try:
+        config.tune_gc()
+        assert gc.get_threshold() == (50000, 50, 100)
+        config.warmed_up()
+        assert config.frozen == gc.get_freeze_count() > 0
+        assert config.report()['gc_frozen_objects'] == config.frozen
+    finally:
+        gc.unfreeze()
+        gc.set_threshold(*thresholds)
+
+
+def test_nothing_changes_unless_configured():
+    thresholds = gc.get_threshold()
+    config = RuntimeConfig()
+    config.tune_gc()
+    config.warmed_up()
+
+    assert gc.get_threshold() == thresholds
+    assert config.frozen == 0
+    assert config.pin('ingest') is False
+
+
+def test_run_falls_back_to_asyncio():
+    async def answer():
+        await asyncio.sleep(0)
+        return 42
+
+    config = RuntimeConfig(use_uvloop=False)
+    assert config.uvloop_module() is None
+    assert config.report()['event_loop'] == 'asyncio'
+    assert config.run(answer()) == 42
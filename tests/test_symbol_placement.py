@@ -0,0 +1,96 @@
+from symbol_placement import LoadBalancer, lpt_placement
+
+
+class FakeSocket:
+    def __init__(self, socket_id, counts, standby=False):
+        self.socket_id = socket_id
+        self.symbols = set(counts)
+        self.update_stats = {symbol: [count, 0.0, 0.0] for symbol, count in counts.items()}
+        self.standby = standby
+
+
+class FakeClient:
+    """The parts of MultiSocketClient the balancer reads, with move_symbols recording instead of resubscribing"""
+    def __init__(self, sockets, max_pairs_per_socket=10):
+        self.sockets = sockets
+        self.max_pairs_per_socket = max_pairs_per_socket
+        self.moved = []
+
+    def move_symbols(self, moves):
+        self.moved.append(moves)
+
+
+def measured(client, seconds=10.0):
+    """Balancer with one interval measured: every update count becomes a rate over seconds"""
+    counts = {socket.socket_id: dict(socket.update_stats) for socket in client.sockets}
+    for socket in client.sockets:
+        socket.update_stats = {symbol: [0, 0.0, 0.0] for symbol in socket.update_stats}
+    balancer = LoadBalancer(client)
+    balancer.measure(now=0.0)
+    for socket in client.sockets:
+        socket.update_stats = counts[socket.socket_id]
+    balancer.measure(now=seconds)
+    return balancer
+
+
+def test_lpt_places_hottest_first_onto_the_least_loaded_connection():
+    rates = {'A': 10, 'B': 8, 'C': 3, 'D': 3, 'E': 2}
+    placement = lpt_placement(rates, connections=2)
+
+    assert sorted(map(sorted, placement)) == [['A', 'D'], ['B', 'C', 'E']]
+    assert sorted(sum(rates[symbol] for symbol in symbols) for symbols in placement) == [13, 13]
+
+
+def test_lpt_respects_capacity_and_weighs_unmeasured_symbols():
+    rates = {'A': 5, 'B': 4, 'C': None, 'D': None, 'E': 0.5}
+    placement = lpt_placement(rates, connections=2, capacity=2, default_rate=3)
+
+    assert all(len(symbols) <= 2 for symbols in placement)
+    # No room is left for the coolest symbol
+    assert sorted(symbol for symbols in placement for symbol in symbols) == ['A', 'B', 'C', 'D']
+
+
+def test_rates_are_smoothed_and_survive_a_counter_reset():
+    socket = FakeSocket(1, {'A': 0})
+    balancer = LoadBalancer(FakeClient([socket]), smoothing=0.5)
+    balancer.measure(now=0.0)
+    socket.update_stats['A'][0] = 100
+    assert balancer.measure(now=10.0) == {'A': 10.0}
+    socket.update_stats['A'][0] = 300
+    assert balancer.measure(now=20.0) == {'A': 15.0}
+
+    # The symbol moved socket and its counter started over
+    socket.update_stats['A'][0] = 50
+    assert balancer.measure(now=30.0) == {'A': 10.0}
+
+
+def test_plan_moves_the_symbol_closest_to_half_the_gap():
+    client = FakeClient([FakeSocket(1, {'A': 100, 'B': 60, 'C': 40}), FakeSocket(2, {'D': 10})])
+    balancer = measured(client)
+
+    assert balancer.socket_loads() == {1: 20.0, 2: 1.0}
+    assert balancer.plan_moves() == {'A': 2}
+
+
+def test_no_moves_onto_a_full_socket_or_a_standby():
+    full = FakeClient([FakeSocket(1, {'A': 100, 'B': 60, 'C': 40}), FakeSocket(2, {'D': 10})],
+                      max_pairs_per_socket=1)
+    assert measured(full).plan_moves() == {}
+
+    standby = FakeClient([FakeSocket(1, {'A': 100, 'B': 60, 'C': 40}), FakeSocket(2, {'D': 10}, standby=True)])
+    balancer = measured(standby)
+    assert balancer.socket_loads() == {1: 20.0}
+    assert balancer.plan_moves() == {}
+
+
+def test_rebalance_moves_through_the_client_and_reports_the_load():
+    client = FakeClient([FakeSocket(1, {'A': 100, 'B': 60, 'C': 40}), FakeSocket(2, {'D': 10})])
+    balancer = measured(client)
+
+    # rebalance() measures again; with the counters unchanged the smoothed rates halve
+    assert balancer.rebalance() == {'A': 2}
+    assert client.moved == [{'A': 2}]
+    report = balancer.load_report()
+    assert report['moves'] == 1
+    assert report['sockets'][1]['hottest'] == ['A', 'B', 'C']
+    assert report['sockets'][1]['share'] == round(10.0 / 10.5, 3)
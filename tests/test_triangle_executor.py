@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from fixed_point import InstrumentScale
+from mock_exchange import MockExchangeSession
+from walllet_connect import TriangleWalletExecutor, WalletManager
+
+PRICES = {"ADAUSDC": 0.70, "ADABTC": 0.0000068, "BTCUSDC": 103000.0}
+PAIRS = ["ADABTC", "ADAUSDC", "BTCUSDC"]
+SCALES = {symbol: InstrumentScale(symbol, tick_size='0.0000001', lot_size='0.00000001', quote_precision='0.00000001')
+          for symbol in PRICES}
+
+
+def make_executor(balances):
+    session = MockExchangeSession(PRICES, balances, latency_ms=0)
+    executor = TriangleWalletExecutor(WalletManager("mock", "mock", session=session), "10", instrument_scales=SCALES)
+    executor.poll_interval = 0.001
+    return session, executor
+
+
+def test_cycle_starts_in_its_anchor_with_the_given_amount():
+    session, executor = make_executor({"BTC": 0.01})
+    result = asyncio.run(executor.execute_triangle_trade(PAIRS, start_coin="BTC", amount="0.001",
+                                                         sides=['buy', 'sell', 'buy']))
+
+    assert result['status'] == 'success'
+    assert [order['side'] for order in result['orders']] == ["BUY", "SELL", "BUY"]
+    # BTC -> ADA -> USDC -> BTC, the first leg spends exactly the anchor amount
+    assert session.orders[result['orders'][0]['orderId']]['cumExecValue'] == '0.001'
+    assert session.balances["BTC"] == pytest.approx(0.01 - 0.001 + 0.001 * 0.70 / 0.0000068 / 103000)
+
+
+def test_legacy_call_spends_the_first_quote_coin():
+    session, executor = make_executor({"USDC": 100.0})
+    result = asyncio.run(executor.execute_triangle_trade(["ADAUSDC", "ADABTC", "BTCUSDC"]))
+
+    assert result['status'] == 'success'
+    # Each leg is rounded down to the lot size on the way round
+    assert session.balances["USDC"] == pytest.approx(100 - 10 + 10 / 0.70 * 0.0000068 * 103000, rel=1e-4)
+
+
+def test_sides_that_do_not_follow_the_anchor_are_rejected():
+    _, executor = make_executor({"BTC": 0.01})
+    with pytest.raises(ValueError):
+        asyncio.run(executor.execute_triangle_trade(PAIRS, start_coin="BTC", amount="0.001",
+                                                    sides=['sell', 'buy', 'sell']))
+
+
+def test_balance_is_checked_in_the_start_coin():
+    # Plenty of USDC, the quote of the first pair, but the cycle spends BTC
+    _, executor = make_executor({"USDC": 1e6, "BTC": 0.0001})
+    with pytest.raises(ValueError, match="0.001 BTC"):
+        asyncio.run(executor.execute_triangle_trade(PAIRS, start_coin="BTC", amount="0.001"))
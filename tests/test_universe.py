@@ -0,0 +1,77 @@
+import time
+
+from feed_simulator import LocalFeedSimulator
+from test_triple_socket import MultiSocketClient
+from triangle_no_pandas import BybitTradingPairList, BybitTriangleCalculation
+from universe import UniverseManager
+
+LISTED = ['BTCUSDT', 'ETHUSDT', 'ETHBTC', 'SOLUSDT', 'SOLBTC', 'XRPUSDT', 'XRPBTC']
+
+
+class ListedPairs(BybitTradingPairList):
+    """Triangle discovery over a symbol list the test edits, instead of the exchange's"""
+    def __init__(self, tickers):
+        super().__init__(api_key=None, api_secret=None)
+        self.tickers = tickers
+
+    def get_tickers(self):
+        return list(self.tickers)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_refresh_adds_and_removes_symbols_on_the_running_sockets(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the client's JSON writer writes under the working directory
+    simulator = LocalFeedSimulator(LISTED, rate_per_symbol=50)
+    simulator.start()
+    pair_list = ListedPairs(['BTCUSDT', 'ETHUSDT', 'ETHBTC', 'SOLUSDT', 'SOLBTC'])
+    triangles = pair_list.find_triangular_pairs()
+    client = MultiSocketClient(pair_list.filter_unique_triangles(triangles), ws_app_factory=simulator.app_factory(),
+                               subscribe_rate=1000, subscribe_burst=100)
+    calculator = BybitTriangleCalculation(triangles=list(triangles), results_file=None, verbose=False)
+    universe = UniverseManager(client, calculator, pair_list)
+    try:
+        client.start()
+        assert wait_until(lambda: set(client.get_orderbooks()) == set(client.all_symbols))
+        sockets = list(client.sockets)
+        connections = [socket.ws for socket in sockets]
+
+        # SOL is delisted and XRP listed
+        pair_list.tickers = ['BTCUSDT', 'ETHUSDT', 'ETHBTC', 'XRPUSDT', 'XRPBTC']
+        change = universe.refresh()
+
+        assert change == {'added': ['XRPBTC', 'XRPUSDT'], 'removed': ['SOLBTC', 'SOLUSDT']}
+        expected = {'BTCUSDT', 'ETHUSDT', 'ETHBTC', 'XRPUSDT', 'XRPBTC'}
+        assert set(client.all_symbols) == expected
+        assert {triangle['pair2'] for triangle in calculator.triangles} == {'ETHBTC', 'XRPBTC'}
+        assert wait_until(lambda: set(client.get_orderbooks()) == expected)
+
+        # No connection was opened or restarted: the change went out as subscribe/unsubscribe
+        # requests (a socket left without symbols is closed by the elastic pool)
+        assert all(socket in sockets and socket.ws is connections[sockets.index(socket)]
+                   for socket in client.sockets)
+        assert client.get_outages() == []
+        subscribed = {topic for socket in client.sockets for topic in socket.ws.topics}
+        assert subscribed == {f"orderbook.50.{symbol}" for symbol in expected}
+    finally:
+        universe.stop()
+        client.stop()
+        simulator.stop()
+
+
+def test_empty_discovery_keeps_the_current_universe(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    client = MultiSocketClient(['BTCUSDT', 'ETHUSDT', 'ETHBTC'])
+    try:
+        universe = UniverseManager(client, None, ListedPairs([]))
+        assert universe.refresh() == {'added': [], 'removed': []}
+        assert client.all_symbols == ['BTCUSDT', 'ETHUSDT', 'ETHBTC']
+    finally:
+        client.stop()
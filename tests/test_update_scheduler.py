@@ -0,0 +1,49 @@
+import threading
+import time
+
+from update_scheduler import DirtySymbolScheduler
+
+
+def test_repeated_updates_are_coalesced_per_cursor():
+    scheduler = DirtySymbolScheduler(name='test_coalesce')
+    cursor = scheduler.register('calculator')
+    for symbol in ['BTCUSDT', 'ETHUSDT', 'BTCUSDT', 'BTCUSDT']:
+        scheduler.mark(symbol)
+    assert len(cursor) == 2
+    assert cursor.wait(timeout=0) == {'BTCUSDT', 'ETHUSDT'}
+    assert cursor.drain() == set()
+    assert scheduler.stats()['coalesced'] == 2
+
+
+def test_each_consumer_sees_every_symbol_independently():
+    scheduler = DirtySymbolScheduler(name='test_consumers')
+    fast, slow = scheduler.register('fast'), scheduler.register('slow')
+    scheduler.mark('BTCUSDT')
+    assert fast.drain() == {'BTCUSDT'}
+    scheduler.mark('ETHUSDT')
+    assert fast.drain() == {'ETHUSDT'}
+    assert slow.drain() == {'BTCUSDT', 'ETHUSDT'}
+    assert scheduler.register('fast') is fast
+
+
+def test_updates_without_consumers_are_counted_as_dropped():
+    scheduler = DirtySymbolScheduler(name='test_dropped')
+    scheduler.mark('BTCUSDT')
+    cursor = scheduler.register('late')
+    assert cursor.drain() == set()
+    assert scheduler.stats()['dropped'] == 1
+
+
+def test_wait_wakes_on_mark_and_on_close():
+    scheduler = DirtySymbolScheduler(name='test_wake')
+    cursor = scheduler.register('calculator')
+    assert cursor.wait(timeout=0.01) == set()
+
+    threading.Timer(0.05, scheduler.mark, args=('BTCUSDT',)).start()
+    start = time.monotonic()
+    assert cursor.wait(timeout=5) == {'BTCUSDT'}
+    assert time.monotonic() - start < 4
+
+    threading.Timer(0.05, scheduler.close).start()
+    assert cursor.wait(timeout=5) == set()
+    assert scheduler.closed
@@ -0,0 +1,70 @@
+import pytest
+
+from top_of_book import TopOfBook
+from triangle_no_pandas import BybitTriangleCalculation
+
+AMOUNT = 100
+
+
+class RecordingCalculation(BybitTriangleCalculation):
+    """Remembers which triangles reached the depth walk"""
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.walked = set()
+
+    def _ladder_result(self, pair1, pair2, pair3):
+        self.walked.add((pair1, pair2, pair3))
+        return super()._ladder_result(pair1, pair2, pair3)
+
+
+@pytest.fixture
+def one_level_market(triangle_market):
+    """Books one level deep with ample size, so a walk at AMOUNT fills at the top of book exactly"""
+    topology, books = triangle_market
+    books = {symbol: {'bids': ((book['bids'][0][0], 1e12),),
+                      'asks': ((book['asks'][0][0], 1e12),)}
+             for symbol, book in books.items()}
+    return topology['triangles'], books
+
+
+def options(triangles, **extra):
+    return dict(triangles=triangles, ladder=[AMOUNT], fee_rate=0.001, results_file=None, verbose=False, **extra)
+
+
+def test_pruned_triangles_are_exactly_the_unprofitable_ones(one_level_market):
+    triangles, books = one_level_market
+    everything = BybitTriangleCalculation(**options(triangles, min_profit=-1e9, max_profit=1e9))
+    profits = {tuple(result['pairs']): result['ladder'][0][3]
+               for result in everything.calculate_arbitrage(books).values()}
+    assert len(profits) == len(triangles)
+
+    min_profit = sorted(profits.values())[len(profits) // 2]
+    pruning = RecordingCalculation(**options(triangles, min_profit=min_profit, max_profit=1e9))
+    pruning.calculate_arbitrage(books)
+
+    pruned = set(profits) - pruning.walked
+    unprofitable = {key for key, profit in profits.items() if profit < min_profit}
+    assert unprofitable and pruned == unprofitable
+
+
+def test_pass_bounds_from_its_own_snapshot_not_the_live_arrays(one_level_market):
+    triangles, books = one_level_market
+    # The live arrays have moved on to prices at which nothing is profitable
+    live = TopOfBook(books)
+    for symbol in books:
+        live.update(symbol, [(1e9, 1.0)], [(1e9, 1.0)])
+
+    everything = BybitTriangleCalculation(**options(triangles, min_profit=-1e9, max_profit=1e9))
+    profits = sorted(result['ladder'][0][3] for result in everything.calculate_arbitrage(books).values())
+    min_profit = profits[len(profits) // 2]
+
+    plain = BybitTriangleCalculation(**options(triangles, min_profit=min_profit, max_profit=1e9))
+    with_live = BybitTriangleCalculation(top_of_book=live, **options(triangles, min_profit=min_profit, max_profit=1e9))
+    expected = plain.calculate_arbitrage(books)
+    assert expected
+    assert with_live.calculate_arbitrage(books).keys() == expected.keys()
+
+    triangle = triangles[0]
+    legs = (triangle['pair1'], triangle['pair2'], triangle['pair3'])
+    assert with_live._upper_bound_percent(*legs, live=True) < -99
+    assert with_live._upper_bound_percent(*legs) == plain._upper_bound_percent(*legs)
@@ -0,0 +1,81 @@
+from decimal import Decimal
+
+from walllet_connect import WalletBalanceCache
+
+
+class FakeWalletManager:
+    """Answers get_wallet_balance with fixed equities, like the REST endpoint"""
+    def __init__(self, equities):
+        self.equities = equities
+
+    def get_wallet_balance(self):
+        coins = [{'coin': coin, 'equity': equity} for coin, equity in self.equities.items()]
+        return {'retCode': 0, 'result': {'list': [{'coin': coins}]}}
+
+
+def wallet_message(creation_ms, equities):
+    return {'creationTime': creation_ms,
+            'data': [{'accountType': 'UNIFIED',
+                      'coin': [{'coin': coin, 'equity': equity} for coin, equity in equities.items()]}]}
+
+
+def make_cache(equities):
+    cache = WalletBalanceCache(FakeWalletManager(equities), use_stream=False)
+    cache.balances = {coin: Decimal(equity) for coin, equity in equities.items()}
+    return cache
+
+
+def test_fill_applied_once_per_order_id():
+    cache = make_cache({'USDT': '1000', 'BTC': '0'})
+    cache.apply_fill('BTCUSDT', 'BUY', '0.01', '600', order_id='a', exec_time_ms=1000)
+    cache.apply_fill('BTCUSDT', 'BUY', '0.01', '600', order_id='a', exec_time_ms=1000)
+
+    assert cache.available('USDT') == Decimal('400')
+    assert cache.available('BTC') == Decimal('0.01')
+
+
+def test_stream_update_containing_fill_is_not_double_counted():
+    cache = make_cache({'USDT': '1000', 'BTC': '0'})
+    cache.apply_fill('BTCUSDT', 'BUY', '0.01', '600', order_id='a', exec_time_ms=1000)
+    cache._on_wallet(wallet_message(1500, {'USDT': '400', 'BTC': '0.01'}))
+
+    assert cache.available('USDT') == Decimal('400')
+    assert cache.available('BTC') == Decimal('0.01')
+    assert cache.pending_fills == {}
+
+    # The order poll reporting the fill again changes nothing
+    cache.apply_fill('BTCUSDT', 'BUY', '0.01', '600', order_id='a', exec_time_ms=1000)
+    assert cache.available('USDT') == Decimal('400')
+
+
+def test_stream_update_older_than_fill_keeps_it():
+    cache = make_cache({'USDT': '1000', 'BTC': '0'})
+    cache.apply_fill('BTCUSDT', 'BUY', '0.01', '600', order_id='a', exec_time_ms=2000)
+    # Taken before the fill executed, e.g. after a deposit
+    cache._on_wallet(wallet_message(1500, {'USDT': '1100', 'BTC': '0'}))
+
+    assert cache.available('USDT') == Decimal('500')
+    assert cache.available('BTC') == Decimal('0.01')
+    assert 'a' in cache.pending_fills
+
+
+def test_fill_reported_after_the_stream_is_skipped():
+    cache = make_cache({'USDT': '1000', 'BTC': '0'})
+    cache._on_wallet(wallet_message(3000, {'USDT': '400', 'BTC': '0.01'}))
+    cache.apply_fill('BTCUSDT', 'BUY', '0.01', '600', order_id='a', exec_time_ms=2500)
+
+    assert cache.available('USDT') == Decimal('400')
+    assert cache.available('BTC') == Decimal('0.01')
+    assert 'a' in cache.settled_orders
+
+
+def test_resync_settles_fills_executed_before_the_request():
+    cache = make_cache({'USDT': '1000', 'BTC': '0'})
+    cache.apply_fill('BTCUSDT', 'SELL', '0.01', '600', order_id='a', exec_time_ms=1000)
+    cache.wallet_manager.equities = {'USDT': '1600', 'BTC': '-0.01'}
+
+    assert cache.resync()
+    assert cache.available('USDT') == Decimal('1600')
+    assert cache.available('BTC') == Decimal('-0.01')
+    assert cache.pending_fills == {}
+    assert cache.last_drift == {}
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from cycle_calculator import CycleCalculation
+
+ANCHORS = ('USDT', 'USDC', 'BTC', 'ETH')
+OPTIONS = dict(trade_amount=100, min_profit=-100, max_profit=100)
+
+
+def profits(calculator):
+    return {key: result['profit_percent'] for key, result in calculator.results.items()}
+
+
+def change_level(books, symbol, side, level, factor):
+    updated = list(books[symbol][side])
+    updated[level] = (updated[level][0], updated[level][1] * factor)
+    books[symbol] = dict(books[symbol], **{side: tuple(updated)})
+
+
+@pytest.mark.parametrize('watermarks', [True, False])
+def test_incremental_passes_match_full_passes(multi_quote_market, watermarks):
+    rng = random.Random(5)
+    instruments, books = multi_quote_market
+    incremental = CycleCalculation(instruments, anchors=ANCHORS, watermarks=watermarks, **OPTIONS)
+    incremental.calculate_arbitrage(dict(books))
+    symbols = sorted(books)
+
+    for _ in range(30):
+        books = dict(books)
+        dirty = set(rng.sample(symbols, 5))
+        for symbol in dirty:
+            change_level(books, symbol, rng.choice(('bids', 'asks')), rng.randrange(10), 0.5 + rng.random())
+        incremental.calculate_arbitrage(books, dirty=dirty)
+        full = CycleCalculation(instruments, anchors=ANCHORS, **OPTIONS)
+        full.calculate_arbitrage(books)
+        assert incremental.last_stats['incremental']
+        assert profits(incremental) == profits(full)
+    if watermarks:
+        assert incremental.watermark_hits > 0
+
+
+def test_deep_change_is_kept_by_the_watermark(multi_quote_market):
+    instruments, books = multi_quote_market
+    calculator = CycleCalculation(instruments, anchors=ANCHORS, **OPTIONS)
+    calculator.calculate_arbitrage(dict(books))
+    before = profits(calculator)
+
+    books = dict(books)
+    change_level(books, 'C0USDT', 'asks', 9, 2.0)
+    calculator.calculate_arbitrage(books, dirty={'C0USDT'})
+    assert calculator.last_stats['recomputed'] == 0
+    assert profits(calculator) == before
+
+
+@pytest.mark.parametrize('symbol', ['C3USDT', 'BTCUSDT'])
+def test_removed_and_emptied_books(multi_quote_market, symbol):
+    instruments, books = multi_quote_market
+    incremental = CycleCalculation(instruments, anchors=ANCHORS, **OPTIONS)
+    incremental.calculate_arbitrage(dict(books))
+
+    removed = {name: book for name, book in books.items() if name != symbol}
+    emptied = dict(books, **{symbol: dict(books[symbol], asks=())})
+    for current, gone in ((removed, ('buy', 'sell')), (emptied, ('buy',)), (dict(books), ())):
+        incremental.calculate_arbitrage(current, dirty={symbol})
+        full = CycleCalculation(instruments, anchors=ANCHORS, **OPTIONS)
+        full.calculate_arbitrage(current)
+        assert profits(incremental) == profits(full)
+        assert not [result for result in incremental.results.values()
+                    if any(pair == symbol and side in gone for pair, side in zip(result['pairs'], result['sides']))]
+
+
+def test_watermark_stats_accumulate_over_passes(multi_quote_market):
+    instruments, books = multi_quote_market
+    calculator = CycleCalculation(instruments, anchors=ANCHORS, **OPTIONS)
+    calculator.calculate_arbitrage(dict(books))
+    assert not calculator.last_stats['incremental']
+    assert calculator.watermark_stats()['hit_rate'] is None
+
+    passes = []
+    for level in (9, 0):
+        books = dict(books)
+        change_level(books, 'C0USDT', 'asks', level, 2.0)
+        calculator.calculate_arbitrage(books, dirty={'C0USDT'})
+        passes.append(calculator.last_stats)
+
+    stats = calculator.watermark_stats()
+    assert stats['watermark_hits'] == sum(last['watermark_hits'] for last in passes) > 0
+    assert stats['recomputed'] == sum(last['recomputed'] for last in passes) > 0
+    assert stats['hit_rate'] == round(stats['watermark_hits'] / (stats['watermark_hits'] + stats['recomputed']), 4)
@@ -0,0 +1,49 @@
+import math
+import threading
+from array import array
+from typing import Dict, List
+
+
+class TopOfBook:
+    """
+    Best bid/ask per symbol kept in flat arrays, updated by the sockets on every message.
+
+    Each symbol gets a fixed slot the first time it is seen, so readers index straight
+    into the arrays instead of touching the full orderbooks. The deepest bid is kept as
+    well: calculate_value divides by price on both sides, so the most favourable rate a
+    bids walk can reach is the one at the bottom of the book.
+    """
+    def __init__(self, symbols: List[str] = ()):
+        self.index: Dict[str, int] = {}
+        self.best_bid = array('d')
+        self.best_ask = array('d')
+        self.deepest_bid = array('d')
+        self.lock = threading.Lock()
+        for symbol in symbols:
+            self.slot(symbol)
+
+    def slot(self, symbol: str) -> int:
+        """Return the array slot of a symbol, allocating one on first use"""
+        idx = self.index.get(symbol)
+        if idx is None:
+            with self.lock:
+                idx = self.index.get(symbol)
+                if idx is None:
+                    self.best_bid.append(math.nan)
+                    self.best_ask.append(math.nan)
+                    self.deepest_bid.append(math.nan)
+                    idx = len(self.best_bid) - 1
+                    self.index[symbol] = idx
+        return idx
+
+    def update(self, symbol: str, bids: List, asks: List):
+        """Refresh a symbol from its sorted levels (bids descending, asks ascending)"""
+        idx = self.slot(symbol)
+        self.best_bid[idx] = bids[0][0] if bids else math.nan
+        self.deepest_bid[idx] = bids[-1][0] if bids else math.nan
+        self.best_ask[idx] = asks[0][0] if asks else math.nan
+
+    def clear(self, symbol: str):
+        idx = self.index.get(symbol)
+        if idx is not None:
+            self.best_bid[idx] = self.best_ask[idx] = self.deepest_bid[idx] = math.nan
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+# Bump when the cached layout changes; older files are ignored and rebuilt
+TOPOLOGY_VERSION = 1
+
+
+def instrument_filters(instrument: Dict) -> Dict:
+    """The parts of an instruments-info entry the scanner and executor need, as exact decimal strings"""
+    lot = instrument.get('lotSizeFilter', {})
+    price = instrument.get('priceFilter', {})
+    return {
+        'base': instrument.get('baseCoin', ''),
+        'quote': instrument.get('quoteCoin', ''),
+        'status': instrument.get('status', ''),
+        'tick_size': price.get('tickSize', ''),
+        'lot_size': lot.get('basePrecision', ''),
+        'quote_precision': lot.get('quotePrecision', ''),
+        'min_qty': lot.get('minOrderQty', ''),
+        'min_amount': lot.get('minOrderAmt', '')
+    }
+
+
+class TopologyCache:
+    """
+    Versioned on-disk copy of the trading universe: symbols, triangles and instrument filters.
+
+    A start-up with a valid cache needs no REST call and no triangle search before the
+    first subscription. The cache is then checked against the exchange in the background
+    and rewritten (with an optional callback) only when the instrument set or a filter changed.
+    """
+    def __init__(self, path: str = 'topology_cache.json', base_currency: str = "USDT", max_age: float = 86400):
+        """
+        Args:
+            path (str): Cache file
+            base_currency (str): Anchor currency the triangles were built for
+            max_age (float): Seconds after which a loaded cache is reported stale (it is still used)
+        """
+        self.path = path
+        self.base_currency = base_currency
+        self.max_age = max_age
+        self.last_validation = None
+
+    @staticmethod
+    def fingerprint(instruments: Dict[str, Dict]) -> str:
+        return hashlib.sha1(json.dumps(instruments, sort_keys=True).encode()).hexdigest()
+
+    def load(self) -> Dict:
+        """
+        Read the cache if it exists and matches the current version and base currency
+
+        Returns:
+            dict: Topology, or None when there is no usable cache
+        """
+        try:
+            with open(self.path, 'r') as f:
+                topology = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Ignoring unreadable topology cache {self.path}: {e}")
+            return None
+
+        if topology.get('version') != TOPOLOGY_VERSION or topology.get('base_currency') != self.base_currency:
+            print(f"Ignoring topology cache {self.path}: version or base currency changed")
+            return None
+        if time.time() - topology.get('created_at', 0) > self.max_age:
+            print(f"Topology cache {self.path} is older than {self.max_age}s, using it until validated")
+        return topology
+
+    def save(self, topology: Dict):
+        """Write atomically so a crash never leaves a half-written cache"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(topology, f)
+        os.replace(tmp_path, self.path)
+
+    def build(self, pair_list) -> Dict:
+        """
+        Fetch instruments and compute triangles from scratch
+
+        Args:
+            pair_list (BybitTradingPairList): Instrument fetch and triangle discovery
+
+        Returns:
+            dict: Topology, or None when the exchange returned no instruments
+        """
+        raw_instruments = pair_list.get_instruments()
+        if not raw_instruments:
+            return None
+
+        all_symbols = [item['symbol'] for item in raw_instruments]
+        triangles = pair_list.find_triangular_pairs(base_currency=self.base_currency, pair_tickers=all_symbols)
+        symbols = sorted(pair_list.filter_unique_triangles(triangles))
+        wanted = set(symbols)
+        instruments = {item['symbol']: instrument_filters(item) for item in raw_instruments if item['symbol'] in wanted}
+
+        return {
+            'version': TOPOLOGY_VERSION,
+            'created_at': time.time(),
+            'base_currency': self.base_currency,
+            'fingerprint': self.fingerprint(instruments),
+            'symbols': symbols,
+            'triangles': triangles,
+            'instruments': instruments
+        }
+
+    def load_or_build(self, pair_list) -> Dict:
+        """Cached topology when available, otherwise a fresh build that is saved for next time"""
+        topology = self.load()
+        if topology is not None:
+            return topology
+        topology = self.build(pair_list)
+        if topology is not None:
+            self.save(topology)
+        return topology
+
+    def validate(self, pair_list, current: Dict, on_change=None) -> Dict:
+        """
+        Compare a topology against the exchange and replace the cache if it changed
+
+        Args:
+            pair_list (BybitTradingPairList): Instrument fetch and triangle discovery
+            current (dict): Topology in use
+            on_change (callable, optional): Called with the new topology when it differs
+
+        Returns:
+            dict: Validation result with 'changed', 'added' and 'removed'
+        """
+        fresh = self.build(pair_list)
+        if fresh is None:
+            self.last_validation = {'checked_at': time.time(), 'changed': False, 'error': 'no instruments'}
+            return self.last_validation
+
+        changed = fresh['fingerprint'] != current.get('fingerprint')
+        self.last_validation = {
+            'checked_at': time.time(),
+            'changed': changed,
+            'added': sorted(set(fresh['symbols']) - set(current.get('symbols', []))),
+            'removed': sorted(set(current.get('symbols', [])) - set(fresh['symbols']))
+        }
+        if changed:
+            self.save(fresh)
+            print(f"Topology changed: +{len(self.last_validation['added'])} / "
+                  f"-{len(self.last_validation['removed'])} symbols, cache rewritten")
+            if on_change:
+                on_change(fresh)
+        else:
+            # Same content, just mark the cache as fresh again
+            current['created_at'] = fresh['created_at']
+            self.save(current)
+        return self.last_validation
+
+    def validate_in_background(self, pair_list, current: Dict, on_change=None) -> threading.Thread:
+        def run():
+            try:
+                self.validate(pair_list, current, on_change)
+            except Exception as e:
+                print(f"Topology validation failed: {e}")
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+def synthetic_topology(coins: int = 100, base_currency: str = "USDT") -> Dict:
+    """
+    Topology for benchmarks: every coin quoted in USDT and BTC, giving one triangle per coin
+
+    Returns:
+        dict: Topology in the cache layout
+    """
+    symbols: List[str] = [f"BTC{base_currency}"]
+    triangles = []
+    for i in range(coins):
+        coin = f"C{i}"
+        symbols += [f"{coin}{base_currency}", f"{coin}BTC"]
+        triangles.append({'pair1': f"{coin}{base_currency}", 'pair2': f"{coin}BTC", 'pair3': f"BTC{base_currency}"})
+    instruments = {
+        symbol: {'base': symbol[:-len(base_currency)] if symbol.endswith(base_currency) else symbol[:-3],
+                 'quote': base_currency if symbol.endswith(base_currency) else 'BTC',
+                 'status': 'Trading', 'tick_size': '0.0001', 'lot_size': '0.000001', 'quote_precision': '0.00000001',
+                 'min_qty': '0.000001', 'min_amount': '1'}
+        for symbol in symbols
+    }
+    return {
+        'version': TOPOLOGY_VERSION,
+        'created_at': time.time(),
+        'base_currency': base_currency,
+        'fingerprint': TopologyCache.fingerprint(instruments),
+        'symbols': sorted(symbols),
+        'triangles': triangles,
+        'instruments': instruments
+    }
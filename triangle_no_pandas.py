@@ -1,20 +1,16 @@
-from pybit.unified_trading import HTTP
-import pandas as pd
 import time
 import json
-import requests
-import certifi
-from typing import List
-from test_triple_socket import SymbolWebSocket, MultiSocketClient
+from collections.abc import Sequence
+from typing import Dict, List
+from metrics import REGISTRY
 
 
 class BybitTradingPairList():
     def __init__(self, api_key, api_secret, testnet=False, trade_amount=1000):
-        self.session = HTTP(
-            testnet=testnet,
-            api_key=api_key,
-            api_secret=api_secret
-        )
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.testnet = testnet
+        self._session = None
         self.min_volume = 1  # Minimum 24h volume
         self.min_turnover = 1  # Minimum 24h turnover in USDT
         self.trade_amount = trade_amount
@@ -40,7 +36,23 @@ class BybitTradingPairList():
     #         print(f"Error fetching tickers: {e}")
     #         return None
 
-    def get_tickers(self) -> List[str]:  # from pair_socket_downloadable
+    @property
+    def session(self):
+        """pybit HTTP session, created (and pybit imported) on first use"""
+        if self._session is None:
+            from pybit.unified_trading import HTTP
+            self._session = HTTP(
+                testnet=self.testnet,
+                api_key=self.api_key,
+                api_secret=self.api_secret
+            )
+        return self._session
+
+    def get_instruments(self) -> List[Dict]:
+        """Raw spot instruments-info list (symbol, coins, price and lot size filters)"""
+        import certifi
+        import requests
+
         url = "https://api.bybit.com/v5/market/instruments-info"
         params = {"category": "spot"}
 
@@ -50,16 +62,26 @@ class BybitTradingPairList():
             data = response.json()
 
             if data["retCode"] == 0 and "list" in data["result"]:
-                return [item["symbol"] for item in data["result"]["list"]]
+                return data["result"]["list"]
 
         except Exception as e:
             print(f"Error fetching pairs: {e}")
 
         return []
 
-    def find_triangular_pairs(self, base_currency="USDT"):
-        """Find all possible triangular pairs with the given base currency"""
-        pair_tickers = self.get_tickers()
+    def get_tickers(self) -> List[str]:  # from pair_socket_downloadable
+        return [item["symbol"] for item in self.get_instruments()]
+
+    def find_triangular_pairs(self, base_currency="USDT", pair_tickers=None):
+        """
+        Find all possible triangular pairs with the given base currency
+
+        Args:
+            base_currency (str): Anchor currency
+            pair_tickers (list, optional): Symbols to search, fetched from the exchange when omitted
+        """
+        if pair_tickers is None:
+            pair_tickers = self.get_tickers()
         if not pair_tickers:
             return []
 
@@ -110,19 +132,84 @@ class BybitTradingPairList():
         return list(set(triangle_pairs_all))
 
 
+# Fields of each point in a ladder result's "ladder" grid
+LADDER_FIELDS = ("amount", "final_amount", "profit_amount", "profit_percent")
+
+
+class LadderGrid(Sequence):
+    """
+    Size-by-profit grid of one triangle, one LADDER_FIELDS tuple per ladder size.
+
+    Only the ladder sizes, the last leg's walked amounts and the fee multiplier are kept; a
+    point's tuple is built when it is read, so a pass that never looks at the grid does not
+    pay for it. Serialise with to_list() (or json.dumps(..., default=list)).
+    """
+    __slots__ = ('amounts', 'values', 'fee_multiplier')
+
+    def __init__(self, amounts: List[float], values: List[float], fee_multiplier: float):
+        self.amounts = amounts
+        self.values = values
+        self.fee_multiplier = fee_multiplier
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.amounts)))]
+        amount, final_amount = self.amounts[index], self.values[index] * self.fee_multiplier
+        return amount, final_amount, final_amount - amount, (final_amount - amount) / amount * 100
+
+    def __eq__(self, other):
+        return list(self) == list(other) if isinstance(other, Sequence) else NotImplemented
+
+    def to_list(self) -> List[tuple]:
+        return list(self)
+
+    def __repr__(self):
+        return f"LadderGrid({self.to_list()!r})"
+
+
 class BybitTriangleCalculation:
-    def __init__(self, trade_amount=10, min_profit=1, max_profit=10):
+    def __init__(self, trade_amount=10, min_profit=1, max_profit=10, max_book_age_ms=None,
+                 fee_rate=0.0, top_of_book=None, triangles=None, results_file='arbitrage_res_all.json',
+                 verbose=True, ladder=None, store=None):
         """
         Initialize the calculation class
         
         Args:
             trade_amount (float): Initial amount for trading calculations (in USDT)
+            max_book_age_ms (float, optional): Skip legs whose book was last received longer ago than this
+            fee_rate (float): Taker fee charged on each of the three legs (e.g., 0.001 for 0.1%)
+            top_of_book (TopOfBook, optional): Live best bid/ask arrays for upper bounds read between passes
+            triangles (list, optional): Triangles to evaluate instead of loading triangles.json
+            results_file (str, optional): Where each pass is saved, None to skip saving
+            verbose (bool): Print per-pass statistics
+            ladder (list, optional): Trade amounts evaluated together in one pass instead of trade_amount
+            store (OpportunityStore, optional): Record every pass there instead of rewriting results_file
         """
         self.trade_amount = trade_amount
+        self.ladder = sorted(ladder) if ladder else None
         self.orderbooks = {}
         self.triangles = []
         self.min_profit = min_profit
         self.max_profit = max_profit
+        self.max_book_age_ms = max_book_age_ms
+        self.fee_multiplier = (1 - fee_rate) ** 3
+        self.top_of_book = top_of_book
+        self.results_file = results_file
+        self.store = store
+        self.verbose = verbose
+
+        self.metric_pass = REGISTRY.histogram('calculator_pass_seconds', 'Duration of one calculate_arbitrage pass')
+        self.metric_processed = REGISTRY.counter('calculator_triangles_processed_total', 'Triangles processed')
+        self.metric_skipped = REGISTRY.counter('calculator_triangles_skipped_total', 'Triangles skipped')
+        self.metric_pruned = REGISTRY.counter('calculator_triangles_pruned_total', 'Triangles pruned at top of book')
+        self.metric_opportunities = REGISTRY.counter('calculator_opportunities_total', 'Opportunities found')
+
+        if triangles is not None:
+            self.triangles = triangles
+            return
         
         # Safely load triangles.json
         try:
@@ -132,6 +219,62 @@ class BybitTriangleCalculation:
         except (FileNotFoundError, json.JSONDecodeError) as e:
             print(f"Warning: Could not load triangles.json: {e}")
 
+    def update_triangles(self, triangles):
+        """
+        Bring the triangle index in line with a new universe, in place
+
+        Triangles no longer present are removed and new ones appended, so a pass running
+        concurrently keeps iterating a valid list and unchanged triangles keep their order.
+        """
+        def key(triangle):
+            return (triangle.get('pair1'), triangle.get('pair2'), triangle.get('pair3'))
+
+        wanted = {key(triangle): triangle for triangle in triangles}
+        current = {key(triangle) for triangle in self.triangles}
+        self.triangles[:] = [triangle for triangle in self.triangles if key(triangle) in wanted]
+        self.triangles.extend(triangle for k, triangle in wanted.items() if k not in current)
+
+    def _stale_pairs(self) -> set:
+        """Pairs whose local receive time (recv_ns) is older than max_book_age_ms"""
+        if self.max_book_age_ms is None:
+            return set()
+        now_ns = time.monotonic_ns()
+        max_age_ns = self.max_book_age_ms * 1_000_000
+        return {
+            pair for pair, book in self.orderbooks.items()
+            if book.get('recv_ns') and now_ns - book['recv_ns'] > max_age_ns
+        }
+
+    def _upper_bound_percent(self, pair1, pair2, pair3, live=False):
+        """
+        Best return a triangle could reach after fees, from top-of-book prices only
+
+        Every leg quantity is amount / price, so no depth walk can beat the best ask on the
+        asks legs or the deepest bid on the bids leg. Returns None when a price is missing.
+
+        A pass bounds each triangle from the same books it walks, so a triangle is never
+        pruned on prices newer than its depth walk would see. live=True reads the
+        top_of_book arrays instead, for callers between passes (see DepthTierManager).
+        """
+        tob = self.top_of_book
+        if live and tob is not None:
+            idx1, idx2, idx3 = tob.index.get(pair1), tob.index.get(pair2), tob.index.get(pair3)
+            if idx1 is None or idx2 is None or idx3 is None:
+                return None
+            ask1, bid2, ask3 = tob.best_ask[idx1], tob.deepest_bid[idx2], tob.best_ask[idx3]
+        else:
+            try:
+                ask1 = self.orderbooks[pair1]['asks'][0][0]
+                bid2 = self.orderbooks[pair2]['bids'][-1][0]
+                ask3 = self.orderbooks[pair3]['asks'][0][0]
+            except (KeyError, IndexError):
+                return None
+
+        # NaN (empty side) fails every comparison and falls through to the depth walk
+        if not (ask1 > 0 and bid2 > 0 and ask3 > 0):
+            return None
+        return (self.fee_multiplier / (ask1 * bid2 * ask3) - 1) * 100
+
     def calculate_value(self, pair, trade_amount, status): # status 'asks', 'bids'
         """
         Calculate how many tokens can be bought/sold at current market prices
@@ -196,6 +339,86 @@ class BybitTriangleCalculation:
 
         return total_quantity
 
+    def calculate_value_ladder(self, pair, amounts, status):
+        """
+        calculate_value for several ascending amounts in a single walk of the book
+
+        Larger amounts only ever consume more levels, so one cursor moves forward through
+        the book and each amount starts where the previous one stopped.
+
+        Args:
+            pair (str): Trading pair symbol
+            amounts (list): Amounts to trade, ascending
+            status (str): 'asks' for buying, 'bids' for selling
+
+        Returns:
+            list: Quantity for each amount, same order as amounts
+        """
+        book = self.orderbooks.get(pair)
+        orderbook_data = book.get(status) if book else None
+        if not orderbook_data:
+            return [0] * len(amounts)
+
+        quantities = []
+        total_quantity = 0
+        spent = 0
+        level = 0
+        levels = len(orderbook_data)
+        value, quantity = orderbook_data[0]
+        cost = value * quantity
+        for amount in amounts:
+            while amount - spent >= cost:
+                total_quantity += quantity
+                spent += cost
+                level += 1
+                if level == levels:
+                    cost = float('inf')  # book exhausted, larger amounts get the same total
+                    break
+                value, quantity = orderbook_data[level]
+                cost = value * quantity
+            if level < levels:
+                quantities.append(total_quantity + (amount - spent) / value)
+            else:
+                quantities.append(total_quantity)
+        return quantities
+
+    def _ladder_result(self, pair1, pair2, pair3):
+        """
+        Size-by-profit grid of one triangle, or None if no ladder point is within the profit range
+
+        The grid is a LadderGrid: one flat (amount, final_amount, profit_amount, profit_percent)
+        tuple per ladder size, unrounded (see LADDER_FIELDS) and built only when read; only the
+        best size is rounded into the top-level fields. Building every point up front cost
+        more than the walks themselves.
+        """
+        ladder = self.ladder
+        values1 = self.calculate_value_ladder(pair1, ladder, 'asks')
+        values2 = self.calculate_value_ladder(pair2, values1, 'bids')
+        values3 = self.calculate_value_ladder(pair3, values2, 'asks')
+
+        fee_multiplier, min_profit, max_profit = self.fee_multiplier, self.min_profit, self.max_profit
+        best = best_profit = None
+        for index, amount in enumerate(ladder):
+            token_value3 = values3[index]
+            profit_amount = token_value3 * fee_multiplier - amount
+            if token_value3 > 0 and min_profit <= profit_amount / amount * 100 <= max_profit:
+                if best is None or profit_amount > best_profit:
+                    best, best_profit = index, profit_amount
+        if best is None:
+            return None
+
+        # Points are only materialised when the grid is read
+        grid = LadderGrid(ladder, values3, fee_multiplier)
+        amount, final_amount, profit_amount, profit_percent = grid[best]
+        # Top-level fields describe the most profitable size, so existing consumers keep working
+        return {
+            "pairs": [pair1, pair2, pair3],
+            "initial_amount": amount,
+            "final_amount": round(final_amount, 6),
+            "profit_amount": round(profit_amount, 6),
+            "profit_percent": round(profit_percent, 4),
+            "ladder": grid
+        }
 
     def calculate_arbitrage(self, external_orderbooks=None):
         """
@@ -208,6 +431,7 @@ class BybitTriangleCalculation:
             dict: Dictionary of arbitrage results
         """
         results = {}
+        pass_start = time.perf_counter()
         
         # Update orderbooks if provided externally
         if external_orderbooks:
@@ -225,6 +449,11 @@ class BybitTriangleCalculation:
         # Track processing stats
         triangles_processed = 0
         triangles_skipped = 0
+        stale_legs = 0
+        stale_pairs = self._stale_pairs()
+        triangles_pruned = 0
+        depth_walks = 0
+        depth_walk_ns = 0
         
         # Process each triangle
         for triangle in self.triangles:
@@ -243,25 +472,42 @@ class BybitTriangleCalculation:
                 if not all(pair in self.orderbooks for pair in [pair1, pair2, pair3]):
                     triangles_skipped += 1
                     continue
+
+                if stale_pairs:
+                    stale_count = (pair1 in stale_pairs) + (pair2 in stale_pairs) + (pair3 in stale_pairs)
+                    if stale_count:
+                        stale_legs += stale_count
+                        triangles_skipped += 1
+                        continue
+
+                # Prune triangles that cannot reach min_profit even at the best prices
+                upper_bound = self._upper_bound_percent(pair1, pair2, pair3)
+                if upper_bound is not None and upper_bound < self.min_profit:
+                    triangles_pruned += 1
+                    continue
                 
+                if self.ladder:
+                    walk_start = time.perf_counter_ns()
+                    depth_walks += 1
+                    ladder_result = self._ladder_result(pair1, pair2, pair3)
+                    depth_walk_ns += time.perf_counter_ns() - walk_start
+                    if ladder_result:
+                        results[f"{pair1}-{pair2}-{pair3}"] = ladder_result
+                    continue
+
                 # Process the triangle
+                walk_start = time.perf_counter_ns()
+                depth_walks += 1
                 token_value1 = self.calculate_value(pair1, self.trade_amount, 'asks')
-                if token_value1 <= 0:
-                    triangles_skipped += 1
-                    continue
-                    
-                token_value2 = self.calculate_value(pair2, token_value1, 'bids')
-                if token_value2 <= 0:
-                    triangles_skipped += 1
-                    continue
-                    
-                token_value3 = self.calculate_value(pair3, token_value2, 'asks')
+                token_value2 = self.calculate_value(pair2, token_value1, 'bids') if token_value1 > 0 else 0
+                token_value3 = self.calculate_value(pair3, token_value2, 'asks') if token_value2 > 0 else 0
+                depth_walk_ns += time.perf_counter_ns() - walk_start
                 if token_value3 <= 0:
                     triangles_skipped += 1
                     continue
                     
                 # Calculate the arbitrage profit
-                final_amount = token_value3
+                final_amount = token_value3 * self.fee_multiplier
                 profit_amount = final_amount - self.trade_amount
                 profit_percent = (profit_amount / self.trade_amount) * 100
                 
@@ -282,24 +528,56 @@ class BybitTriangleCalculation:
                 triangles_skipped += 1
                 continue
             
+        # Pruned triangles would have cost about as much as the depth walks actually run
+        prune_ratio = triangles_pruned / triangles_processed if triangles_processed else 0
+        prune_time_saved_ms = triangles_pruned * (depth_walk_ns / depth_walks) / 1e6 if depth_walks else 0
+
+        self.metric_pass.observe(time.perf_counter() - pass_start)
+        self.metric_processed.inc(triangles_processed)
+        self.metric_skipped.inc(triangles_skipped)
+        self.metric_pruned.inc(triangles_pruned)
+        self.metric_opportunities.inc(len(results))
+
         # Print stats
-        print(f"Processed {triangles_processed} triangles, skipped {triangles_skipped}")
-        print(f"Found {len(results)} potential arbitrage opportunities")
+        if self.verbose:
+            print(f"Processed {triangles_processed} triangles, skipped {triangles_skipped} ({stale_legs} stale legs)")
+            print(f"Found {len(results)} potential arbitrage opportunities")
+            print(f"Pruned {triangles_pruned} triangles at top of book ({prune_ratio:.1%}), "
+                  f"saved ~{prune_time_saved_ms:.3f} ms of depth walks")
+
+        if self.store is not None:
+            # Queued for the store's writer thread, nothing is written on the calculator thread
+            self.store.record_pass(results, {
+                "trade_amount": self.trade_amount,
+                "triangles_processed": triangles_processed,
+                "triangles_skipped": triangles_skipped,
+                "triangles_pruned": triangles_pruned
+            })
+            return results
+
+        if not self.results_file:
+            return results
         
         # Save results to file
         timestamp = int(time.time())
         output_data = {
             "timestamp": timestamp,
             "trade_amount": self.trade_amount,
+            "ladder": self.ladder,
             "triangles_processed": triangles_processed,
             "triangles_skipped": triangles_skipped,
+            "stale_legs": stale_legs,
+            "stale_pairs": sorted(stale_pairs),
+            "triangles_pruned": triangles_pruned,
+            "prune_ratio": round(prune_ratio, 4),
+            "prune_time_saved_ms": round(prune_time_saved_ms, 3),
             "results": results
         }
         
         try:
-            with open('arbitrage_res_all.json', 'w') as f:
-                json.dump(output_data, f, indent=4)
-            print("Saved arbitrage results to arbitrage_res_all.json")
+            with open(self.results_file, 'w') as f:
+                json.dump(output_data, f, indent=4, default=list)  # LadderGrid
+            print(f"Saved arbitrage results to {self.results_file}")
         except Exception as e:
             print(f"Error saving arbitrage results: {e}")
             
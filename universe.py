@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from typing import Dict, List, Tuple
+
+
+class UniverseManager:
+    """
+    Keeps the monitored symbols and the calculator's triangles in step with the exchange.
+
+    On every refresh the universe is rebuilt from triangle discovery, optionally filtered
+    by the orderbook liquidity checker, and the difference is applied to the running
+    client as incremental subscribe/unsubscribe ops. Delisted or illiquid symbols stop
+    streaming without any socket being restarted.
+    """
+    def __init__(self, client, calculator, pair_list, liquidity_checker=None, base_currency: str = "USDT",
+                 min_liquidity_usdt: float = 1000, refresh_interval: float = 3600):
+        """
+        Args:
+            client (MultiSocketClient): Running socket client to (un)subscribe on
+            calculator (BybitTriangleCalculation, optional): Calculator whose triangles are updated in place,
+                None to only keep the client's subscriptions in step
+            pair_list (BybitTradingPairList): Triangle discovery
+            liquidity_checker (BybitSpotOrderbookChecker, optional): Filters out thin books
+            base_currency (str): Anchor currency for triangle discovery
+            min_liquidity_usdt (float): Minimum total orderbook value for a pair to be kept
+            refresh_interval (float): Seconds between background refreshes
+        """
+        self.client = client
+        self.calculator = calculator
+        self.pair_list = pair_list
+        self.liquidity_checker = liquidity_checker
+        self.base_currency = base_currency
+        self.min_liquidity_usdt = min_liquidity_usdt
+        self.refresh_interval = refresh_interval
+        self.running = False
+        self.last_refresh = None
+        self.last_change: Dict[str, List[str]] = {'added': [], 'removed': []}
+
+    def _liquid_pairs(self, symbols: List[str]) -> set:
+        self.liquidity_checker.verified_pairs = {}
+        asyncio.run(self.liquidity_checker.verify_pairs_batch(symbols))
+        return {
+            symbol for symbol, data in self.liquidity_checker.verified_pairs.items()
+            if data.get('total_orderbook_value', 0) >= self.min_liquidity_usdt
+        }
+
+    def build_universe(self) -> Tuple[List[str], List[Dict]]:
+        """
+        Discover triangles and the symbols they need
+
+        Returns:
+            tuple: (symbols, triangles)
+        """
+        triangles = self.pair_list.find_triangular_pairs(base_currency=self.base_currency)
+        symbols = self.pair_list.filter_unique_triangles(triangles)
+
+        if self.liquidity_checker and symbols:
+            liquid = self._liquid_pairs(symbols)
+            triangles = [
+                triangle for triangle in triangles
+                if all(triangle[key] in liquid for key in ('pair1', 'pair2', 'pair3'))
+            ]
+            symbols = self.pair_list.filter_unique_triangles(triangles)
+
+        return sorted(symbols), triangles
+
+    def refresh(self) -> Dict[str, List[str]]:
+        """Rebuild the universe and apply the difference to the client and calculator"""
+        symbols, triangles = self.build_universe()
+        if not symbols:
+            print("Universe refresh returned no symbols, keeping the current universe")
+            return {'added': [], 'removed': []}
+
+        current = set(self.client.all_symbols)
+        change = {
+            'added': sorted(set(symbols) - current),
+            'removed': sorted(current - set(symbols))
+        }
+
+        self.client.update_universe(symbols)
+        if self.calculator is not None:
+            self.calculator.update_triangles(triangles)
+
+        self.last_refresh = time.time()
+        self.last_change = change
+        print(f"Universe refreshed: {len(symbols)} symbols, {len(triangles)} triangles, "
+              f"+{len(change['added'])} / -{len(change['removed'])}")
+        return change
+
+    def _refresh_task(self):
+        while self.running:
+            time.sleep(self.refresh_interval)
+            if not self.running:
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing universe: {e}")
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._refresh_task)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
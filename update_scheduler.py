@@ -0,0 +1,106 @@
+import threading
+from typing import Dict, Set
+
+from metrics import REGISTRY
+
+
+class DirtyCursor:
+    """One consumer's view of the scheduler: the symbols changed since it last looked"""
+    def __init__(self, scheduler: 'DirtySymbolScheduler', name: str):
+        self.scheduler = scheduler
+        self.name = name
+        self.pending: Set[str] = set()
+
+    def wait(self, timeout: float = None) -> Set[str]:
+        """
+        Block until at least one symbol is dirty (or timeout) and take the whole dirty set
+
+        Returns:
+            set: Symbols updated since the previous call, each listed once
+        """
+        with self.scheduler.condition:
+            if not self.pending and not self.scheduler.closed:
+                self.scheduler.condition.wait_for(lambda: self.pending or self.scheduler.closed, timeout)
+            symbols, self.pending = self.pending, set()
+        return symbols
+
+    def drain(self) -> Set[str]:
+        """Take the dirty set without waiting"""
+        with self.scheduler.condition:
+            symbols, self.pending = self.pending, set()
+        return symbols
+
+    def __len__(self):
+        return len(self.pending)
+
+
+class DirtySymbolScheduler:
+    """
+    Coalescing replacement for the old update_queue deque.
+
+    Every consumer (calculator, JSON writer, ...) registers a cursor holding a dirty set.
+    A symbol updated many times before a consumer wakes up is listed once, so a burst
+    costs O(unique symbols) instead of O(messages) and nothing is silently pushed out.
+    """
+    def __init__(self, name: str = 'default'):
+        """
+        Args:
+            name (str): Client label on the scheduler_* metrics, one per scheduler in the process
+        """
+        self.condition = threading.Condition()
+        self.cursors: Dict[str, DirtyCursor] = {}
+        self.closed = False
+
+        labels = {'client': name}
+        self.metric_marks = REGISTRY.counter('scheduler_marks_total', 'Symbol updates signalled', labels)
+        self.metric_coalesced = REGISTRY.counter('scheduler_coalesced_total',
+                                                 'Updates merged into an already dirty symbol, per cursor', labels)
+        self.metric_dropped = REGISTRY.counter('scheduler_dropped_total', 'Updates signalled with no consumer registered',
+                                               labels)
+        REGISTRY.gauge('scheduler_pending_symbols', 'Largest dirty set across consumers',
+                       labels).set_function(self.pending_depth)
+
+    def register(self, name: str) -> DirtyCursor:
+        with self.condition:
+            cursor = self.cursors.get(name)
+            if cursor is None:
+                cursor = self.cursors[name] = DirtyCursor(self, name)
+            return cursor
+
+    def unregister(self, name: str):
+        with self.condition:
+            self.cursors.pop(name, None)
+
+    def mark(self, symbol: str):
+        """Flag a symbol as updated for every consumer"""
+        with self.condition:
+            self.metric_marks.inc()
+            if not self.cursors:
+                self.metric_dropped.inc()
+                return
+            added = False
+            for cursor in self.cursors.values():
+                if symbol in cursor.pending:
+                    self.metric_coalesced.inc()
+                else:
+                    cursor.pending.add(symbol)
+                    added = True
+            if added:
+                self.condition.notify_all()
+
+    def pending_depth(self) -> int:
+        return max((len(cursor.pending) for cursor in list(self.cursors.values())), default=0)
+
+    def stats(self) -> Dict:
+        return {
+            'marks': self.metric_marks.value,
+            'coalesced': self.metric_coalesced.value,
+            'dropped': self.metric_dropped.value,
+            'pending': {name: len(cursor.pending) for name, cursor in list(self.cursors.items())}
+        }
+
+    def close(self):
+        """Wake every waiting consumer so it can exit"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
@@ -2,27 +2,87 @@ import json
 import time
 import asyncio
 from typing import List, Dict
-from decimal import Decimal, ROUND_DOWN
+from decimal import Decimal
 from pybit.unified_trading import HTTP
 from pybit.unified_trading import WebSocket
 from dotenv import load_dotenv
 import os
+import threading
+from metrics import REGISTRY
+from fixed_point import InstrumentScale, floor_decimal_string
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Quote currencies listed on Bybit spot, longest first so that e.g. USDE wins over a shorter suffix
+QUOTE_CURRENCIES = ("USDT", "USDC", "USDE", "USDQ", "USDR", "EUR", "BRL", "DAI", "BTC", "ETH", "SOL")
+
+
+def split_symbol(symbol: str):
+    """
+    Split a spot symbol into (base, quote) using the known quote currencies
+
+    Args:
+        symbol (str): Trading pair symbol (e.g., 'BBSOLUSDT')
+
+    Returns:
+        tuple: (base, quote), e.g. ('BBSOL', 'USDT')
+    """
+    for quote in sorted(QUOTE_CURRENCIES, key=len, reverse=True):
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    raise ValueError(f"Unknown quote currency for symbol {symbol}")
+
+
+def cycle_leg_sides(trading_pairs: List[str], start_coin: str = None) -> List[str]:
+    """
+    Order side of every leg, following the coins around the cycle
+
+    A leg spending the quote coin is a BUY, a leg spending the base coin is a SELL.
+
+    Args:
+        trading_pairs (list): Symbols of the cycle in trading order
+        start_coin (str, optional): Coin spent by the first leg, the first pair's quote by default
+
+    Returns:
+        list: 'BUY' or 'SELL' per leg, e.g. ['BUY', 'SELL', 'SELL'] for ADAUSDC, ADABTC, BTCUSDC
+    """
+    start_coin = start_coin or split_symbol(trading_pairs[0])[1]
+    coin = start_coin
+    sides = []
+    for symbol in trading_pairs:
+        base, quote = split_symbol(symbol)
+        if coin == quote:
+            sides.append("BUY")
+            coin = base
+        elif coin == base:
+            sides.append("SELL")
+            coin = quote
+        else:
+            raise ValueError(f"{symbol} does not trade {coin}, pairs {trading_pairs} are not a cycle")
+    if coin != start_coin:
+        raise ValueError(f"Pairs {trading_pairs} end in {coin} instead of returning to the start coin")
+    return sides
+
 
 class WalletManager:
-    def __init__(self, api_key: str, api_secret: str, testnet: bool = True):
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True, session=None,
+                 rate_limited: bool = False, batch_window_ms: float = 0.0):
         self.api_key = api_key
         self.api_secret = api_secret
         self.testnet = testnet
 
-        self.session = HTTP(
+        # Any object exposing place_order/get_order_history/get_wallet_balance can stand in for HTTP
+        self.session = session or HTTP(
             testnet=self.testnet,
             api_key=self.api_key,
-            api_secret=self.api_secret
+            api_secret=self.api_secret,
+            return_response_headers=rate_limited
         )
+        if rate_limited:
+            # Pace every REST call by the X-Bapi-Limit headers, orders first
+            from request_scheduler import RequestScheduler
+            self.session = RequestScheduler(self.session, batch_window_ms=batch_window_ms)
 
     def get_wallet_balance(self):
         """Get current unified account wallet balance in a simplified format"""
@@ -47,22 +107,199 @@ class WalletManager:
             return None
 
     def close(self):
-        pass
+        if hasattr(self.session, 'stop'):
+            self.session.stop()
+
+
+class WalletBalanceCache:
+    """
+    In-memory wallet balances kept current by the private wallet stream.
+
+    Fills are applied optimistically as soon as an order is confirmed, the wallet stream
+    overwrites coins as the exchange reports them, and a periodic REST resync corrects
+    any drift left over (fees, missed messages, transfers).
+
+    An optimistic fill stays pending, keyed by orderId, until a stream update or resync
+    taken at or after its execution time has been applied; that update already contains
+    the fill, so it is dropped instead of being counted twice.
+    """
+    def __init__(self, wallet_manager: WalletManager, resync_interval: float = 60, use_stream: bool = True):
+        self.wallet_manager = wallet_manager
+        self.resync_interval = resync_interval
+        self.use_stream = use_stream
+        self.balances: Dict[str, Decimal] = {}
+        self.lock = threading.Lock()
+        self.ws = None
+        self.running = False
+        self.last_resync = None
+        self.last_drift: Dict[str, Decimal] = {}
+        # orderId -> (execution time in ms, {coin: delta}) for fills the exchange has not reported yet
+        self.pending_fills: Dict[str, tuple] = {}
+        self.settled_orders: Dict[str, int] = {}  # recent orderIds already in the balances, oldest first
+        self.last_update_ms = 0
+
+    def _parse_coins(self, coins: List[Dict]) -> Dict[str, Decimal]:
+        return {coin['coin']: Decimal(str(coin['equity'])) for coin in coins if coin.get('equity') not in (None, '')}
+
+    def available(self, coin: str) -> Decimal:
+        """Current balance of a coin, without any network round trip"""
+        return self.balances.get(coin, Decimal(0))
+
+    def _mark_settled(self, order_id: str, exec_ms: int):
+        self.settled_orders[order_id] = exec_ms
+        if len(self.settled_orders) > 10000:
+            del self.settled_orders[next(iter(self.settled_orders))]
+
+    def _settle(self, update_ms: int, fresh: Dict[str, Decimal]) -> Dict[str, Decimal]:
+        """
+        Drop the pending fills contained in an update taken at update_ms; call with the lock held
+
+        Returns:
+            dict: The update's balances with the fills it does not contain yet added back
+        """
+        self.last_update_ms = max(self.last_update_ms, update_ms)
+        for order_id, (exec_ms, _) in list(self.pending_fills.items()):
+            if exec_ms <= update_ms:
+                del self.pending_fills[order_id]
+                self._mark_settled(order_id, exec_ms)
+
+        adjusted = dict(fresh)
+        for _, deltas in self.pending_fills.values():
+            for coin, delta in deltas.items():
+                if coin in adjusted:
+                    adjusted[coin] += delta
+        return adjusted
+
+    def resync(self) -> bool:
+        """Replace the cached balances with a REST snapshot and record the drift that was corrected"""
+        requested_ms = int(time.time() * 1000)
+        balance = self.wallet_manager.get_wallet_balance()
+        if not balance:
+            return False
+
+        fresh = self._parse_coins(balance['result']['list'][0]['coin'])
+        with self.lock:
+            # Fills executed before the request are in the snapshot
+            fresh = self._settle(requested_ms, fresh)
+            drift = {}
+            for coin in set(fresh) | set(self.balances):
+                delta = fresh.get(coin, Decimal(0)) - self.balances.get(coin, Decimal(0))
+                if delta != 0:
+                    drift[coin] = delta
+            self.balances = fresh
+            self.last_drift = drift
+            self.last_resync = time.time()
+
+        if drift:
+            print(f"Balance resync corrected drift: {drift}")
+        return True
+
+    def _on_wallet(self, message: Dict):
+        try:
+            update_ms = int(message.get('creationTime') or time.time() * 1000)
+            with self.lock:
+                for account in message.get('data', []):
+                    if account.get('accountType', 'UNIFIED') != 'UNIFIED':
+                        continue
+                    self.balances.update(self._settle(update_ms, self._parse_coins(account.get('coin', []))))
+        except Exception as e:
+            print(f"Error applying wallet update: {e}")
+
+    def apply_fill(self, symbol: str, side: str, base_qty: str, quote_qty: str, order_id: str = None,
+                   exec_time_ms: int = None):
+        """
+        Optimistically move balances for a filled order before the wallet stream confirms it
+
+        Args:
+            symbol (str): Traded symbol
+            side (str): 'BUY' or 'SELL'
+            base_qty (str): Executed base quantity
+            quote_qty (str): Executed quote value
+            order_id (str, optional): Order id; a fill is applied once and never after an update containing it
+            exec_time_ms (int, optional): Execution time in ms (the order's updatedTime), now if unknown
+        """
+        base, quote = split_symbol(symbol)
+        base_qty, quote_qty = Decimal(str(base_qty)), Decimal(str(quote_qty))
+        if side.upper() == "SELL":
+            base_qty, quote_qty = -base_qty, -quote_qty
+        deltas = {base: base_qty, quote: -quote_qty}
+        exec_ms = int(exec_time_ms) if exec_time_ms else int(time.time() * 1000)
+
+        with self.lock:
+            if order_id is not None:
+                if order_id in self.pending_fills or order_id in self.settled_orders:
+                    return
+                if exec_ms <= self.last_update_ms:
+                    # The stream was faster than the order poll, its balances already hold this fill
+                    self._mark_settled(order_id, exec_ms)
+                    return
+                self.pending_fills[order_id] = (exec_ms, deltas)
+            for coin, delta in deltas.items():
+                self.balances[coin] = self.balances.get(coin, Decimal(0)) + delta
+
+    def _resync_task(self):
+        while self.running:
+            time.sleep(self.resync_interval)
+            if self.running:
+                self.resync()
+
+    def start(self):
+        self.running = True
+        self.resync()
+
+        if self.use_stream:
+            self.ws = WebSocket(
+                testnet=self.wallet_manager.testnet,
+                channel_type="private",
+                api_key=self.wallet_manager.api_key,
+                api_secret=self.wallet_manager.api_secret
+            )
+            self.ws.wallet_stream(self._on_wallet)
+
+        self.resync_thread = threading.Thread(target=self._resync_task)
+        self.resync_thread.daemon = True
+        self.resync_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.ws:
+            self.ws.exit()
 
 
 class TriangleWalletExecutor:
-    def __init__(self, wallet_manager: WalletManager, initial_trading_amount: str):
+    def __init__(self, wallet_manager: WalletManager, initial_trading_amount: str,
+                 balance_cache: WalletBalanceCache = None, instrument_scales: Dict[str, InstrumentScale] = None):
         self.wallet_manager = wallet_manager
         self.initial_amount = initial_trading_amount
+        self.balance_cache = balance_cache
+        # symbol -> InstrumentScale (e.g. fixed_point.scales_from_topology) for exact lot-size rounding
+        self.instrument_scales = instrument_scales or {}
         self.current_orders = {}
         self.trade_confirmations = {}
         self.executed_amounts = {}
+        # Seconds between order status polls; a paper exchange session can use a few milliseconds
+        self.poll_interval = 1.0
+        self.metric_order_rtt = REGISTRY.histogram('order_place_round_trip_seconds', 'place_order request round trip')
+        self.metric_fill_rtt = REGISTRY.histogram('order_fill_confirmation_seconds', 'Time until an order is confirmed filled')
+
+    def _get_balance(self):
+        """REST wallet balance, skipped entirely when a balance cache is attached"""
+        if self.balance_cache:
+            return None
+        return self.wallet_manager.get_wallet_balance()
 
-    def _verify_sufficient_balance(self, balance, first_pair: str) -> bool:
-        """Verify if there's sufficient balance for the first trade"""
+    def _verify_sufficient_balance(self, balance, first_pair: str, coin: str = None, amount: str = None) -> bool:
+        """Verify if there's sufficient balance for the first trade, in the coin it spends"""
         try:
-            quote_currency = first_pair[3:]  # Extract the quote currency (e.g., USDT from ADAUSDT)
-            required_amount = Decimal(self.initial_amount)
+            # The quote currency (e.g., USDT from ADAUSDT) unless the cycle starts elsewhere
+            quote_currency = coin or split_symbol(first_pair)[1]
+            required_amount = Decimal(str(amount or self.initial_amount))
+
+            if self.balance_cache:
+                available = self.balance_cache.available(quote_currency)
+                print(f"Available {quote_currency} balance: {available}")
+                print(f"Required amount: {required_amount}")
+                return available >= required_amount
 
             # Get the coin list from the unified account response
             coin_list = balance['result']['list'][0]['coin']
@@ -81,20 +318,27 @@ class TriangleWalletExecutor:
             print(f"Balance response: {json.dumps(balance, indent=2)}")
             return False
 
-    async def _execute_trade(self, symbol: str, side: str, quantity: str) -> Dict:
+    async def _execute_trade(self, symbol: str, side: str, quantity: str, **order_params) -> Dict:
         try:
-            # Round quantity based on symbol
-            rounded_quantity = self._round_quantity(symbol, quantity)
+            # Round quantity based on symbol; spot market buys are sized in quote coin by default
+            market_unit = order_params.get('marketUnit')
+            quote_sized = market_unit == 'quoteCoin' or (side.upper() == "BUY" and market_unit != 'baseCoin')
+            rounded_quantity = self._round_quantity(symbol, quantity, quote_sized)
             print(f"Placing {side} order for {symbol}, quantity: {rounded_quantity}")
             
-            order_response = self.wallet_manager.session.place_order(
+            # The HTTP session is blocking, run it in a worker thread so concurrent legs really overlap
+            request_start = time.perf_counter()
+            order_response = await asyncio.to_thread(
+                self.wallet_manager.session.place_order,
                 category="spot",
                 symbol=symbol,
                 side=side,
                 orderType="MARKET",
                 qty=str(rounded_quantity),
-                accountType="UNIFIED"
+                accountType="UNIFIED",
+                **order_params
             )
+            self.metric_order_rtt.observe(time.perf_counter() - request_start)
 
             print(f"Order response: {json.dumps(order_response, indent=2)}")
 
@@ -119,10 +363,17 @@ class TriangleWalletExecutor:
             print(f"Full error details: {str(e)}")
             raise
 
-    def _round_quantity(self, symbol: str, quantity: str) -> str:
+    def _round_quantity(self, symbol: str, quantity: str, quote_sized: bool = False) -> str:
         """
-        Round quantity based on symbol requirements
+        Round quantity down based on symbol requirements, in fixed point
+
+        Uses the instrument's lot size (or quote precision for quote-sized orders) when its
+        scale is known, otherwise a per-symbol number of decimal places.
         """
+        scale = self.instrument_scales.get(symbol)
+        if scale is not None:
+            return scale.order_qty(quantity, quote_sized)
+
         # Common decimal places for different symbols
         decimals = {
             'ADABTC': 1,    # Example: 1 decimal place for ADABTC
@@ -133,17 +384,14 @@ class TriangleWalletExecutor:
         # Default to 1 decimal if symbol not found
         decimal_places = decimals.get(symbol, 1)
         
-        # Convert to Decimal for precise rounding
-        qty = Decimal(str(quantity))
-        rounded = qty.quantize(Decimal('0.1') ** decimal_places, rounding=ROUND_DOWN)
-        
-        return str(rounded)
+        return floor_decimal_string(str(quantity), decimal_places)
 
     async def _wait_for_confirmation(self, order_id: str, timeout: int = 30) -> bool:
         start_time = time.time()
         while time.time() - start_time < timeout:
             try:
-                order_status = self.wallet_manager.session.get_order_history(
+                order_status = await asyncio.to_thread(
+                    self.wallet_manager.session.get_order_history,
                     category="spot",
                     symbol=self.current_orders[order_id]['symbol'],
                     orderId=order_id,
@@ -156,20 +404,37 @@ class TriangleWalletExecutor:
                 if order_status['retCode'] == 0:
                     if not order_status['result']['list']:
                         print(f"No order found for ID {order_id}, retrying...")
-                        await asyncio.sleep(1)
+                        await asyncio.sleep(self.poll_interval)
                         continue
 
                     order_details = order_status['result']['list'][0]
                     status = order_details['orderStatus']
 
-                    if status == 'Filled':
+                    # A market order that runs out of liquidity ends PartiallyFilledCanceled;
+                    # whatever executed is real and the next leg continues with it
+                    partial = status == 'PartiallyFilledCanceled' and Decimal(order_details.get('cumExecQty') or '0') > 0
+                    if status == 'Filled' or partial:
+                        self.metric_fill_rtt.observe(time.time() - start_time)
                         self.trade_confirmations[order_id] = order_details
-                        print(f"Order {order_id} filled.")
+                        if self.balance_cache:
+                            self.balance_cache.apply_fill(
+                                order_details.get('symbol', self.current_orders[order_id]['symbol']),
+                                order_details['side'],
+                                order_details['cumExecQty'],
+                                order_details['cumExecValue'],
+                                order_id=order_id,
+                                exec_time_ms=order_details.get('updatedTime')
+                            )
+                        if partial:
+                            order_details['partial'] = True
+                            print(f"Order {order_id} partially filled, remainder cancelled.")
+                        else:
+                            print(f"Order {order_id} filled.")
                         print(f"Executed quantity: {order_details.get('cumExecQty', 'N/A')}")
                         print(f"Executed price: {order_details.get('avgPrice', 'N/A')}")
                         return True
 
-                    elif status in ['Rejected', 'Cancelled']:
+                    elif status in ['Rejected', 'Cancelled', 'PartiallyFilledCanceled']:
                         print(f"Order {order_id} failed with status: {status}")
                         return False
 
@@ -177,7 +442,7 @@ class TriangleWalletExecutor:
                 else:
                     print(f"Error in order status response: {order_status['retMsg']}")
 
-                await asyncio.sleep(1)
+                await asyncio.sleep(self.poll_interval)
 
             except Exception as e:
                 print(f"Error checking order status: {e}")
@@ -187,32 +452,64 @@ class TriangleWalletExecutor:
         print(f"Timeout waiting for order {order_id} confirmation")
         return False
 
-    async def execute_triangle_trade(self, trading_pairs: List[str]):
+    def _received_amount(self, order_id: str) -> str:
+        """
+        Coin received by a confirmed order, net of the fee when it was charged in that coin
+
+        A BUY receives the base quantity (cumExecQty), a SELL the quote value (cumExecValue).
+        """
+        details = self.trade_confirmations[order_id]
+        base, quote = split_symbol(details['symbol'])
+        if details['side'].upper() == "BUY":
+            received, coin = Decimal(str(details['cumExecQty'])), base
+        else:
+            received, coin = Decimal(str(details['cumExecValue'])), quote
+        if details.get('feeCurrency') == coin and details.get('cumExecFee'):
+            received -= Decimal(str(details['cumExecFee']))
+        return str(received)
+
+    async def execute_triangle_trade(self, trading_pairs: List[str], start_coin: str = None, amount: str = None,
+                                     sides: List[str] = None):
         """
         Execute triangle trades in sequence using unified account
+
+        Each leg spends what the previous one received, on the side the coin path requires
+        (see cycle_leg_sides), starting from the quote coin of the first pair unless a cycle
+        anchor says otherwise.
+
+        Args:
+            trading_pairs (list): The three pairs in trading order
+            start_coin (str, optional): Coin the cycle starts and ends in (a CycleCalculation anchor)
+            amount (str, optional): Amount of start_coin the first leg spends, initial_trading_amount by default
+            sides (list, optional): Leg sides the opportunity was priced with ('buy'/'sell'), checked against the path
         """
         if len(trading_pairs) != 3:
             raise ValueError("Must provide exactly 3 trading pairs")
-
-        # Check wallet balance before trading
-        balance = self.wallet_manager.get_wallet_balance()
-        if not self._verify_sufficient_balance(balance, trading_pairs[0]):
-            raise ValueError(f"Insufficient balance for initial trade of {self.initial_amount}")
+        start_coin = start_coin or split_symbol(trading_pairs[0])[1]
+        amount = str(amount or self.initial_amount)
+        leg_sides = cycle_leg_sides(trading_pairs, start_coin)
+        if sides and [side.upper() for side in sides] != leg_sides:
+            raise ValueError(f"Sides {sides} do not follow {trading_pairs} from {start_coin} ({leg_sides})")
+        sides = leg_sides
+
+        # Check wallet balance before trading, off the event loop when it is a REST call
+        balance = await asyncio.to_thread(self._get_balance)
+        if not self._verify_sufficient_balance(balance, trading_pairs[0], start_coin, amount):
+            raise ValueError(f"Insufficient balance for initial trade of {amount} {start_coin}")
 
         try:
             # First trade
             print(f"\nExecuting first trade for {trading_pairs[0]}")
             first_order = await self._execute_trade(
                 symbol=trading_pairs[0],
-                side="BUY",
-                quantity=self.initial_amount
+                side=sides[0],
+                quantity=amount
             )
 
             if not await self._wait_for_confirmation(first_order['orderId']):
                 raise Exception(f"First trade {trading_pairs[0]} failed to confirm")
 
-            # Changed from 'execQty' to 'cumExecQty'
-            first_filled_qty = self.trade_confirmations[first_order['orderId']]['cumExecQty']
+            first_filled_qty = self._received_amount(first_order['orderId'])
             self.executed_amounts[trading_pairs[0]] = first_filled_qty
             print(f"First trade completed. Received: {first_filled_qty}")
 
@@ -220,15 +517,14 @@ class TriangleWalletExecutor:
             print(f"\nExecuting second trade for {trading_pairs[1]}")
             second_order = await self._execute_trade(
                 symbol=trading_pairs[1],
-                side="SELL",
+                side=sides[1],
                 quantity=first_filled_qty
             )
 
             if not await self._wait_for_confirmation(second_order['orderId']):
                 raise Exception(f"Second trade {trading_pairs[1]} failed to confirm")
 
-            # Changed from 'execQty' to 'cumExecQty'
-            second_filled_qty = self.trade_confirmations[second_order['orderId']]['cumExecQty']
+            second_filled_qty = self._received_amount(second_order['orderId'])
             self.executed_amounts[trading_pairs[1]] = second_filled_qty
             print(f"Second trade completed. Received: {second_filled_qty}")
 
@@ -236,15 +532,14 @@ class TriangleWalletExecutor:
             print(f"\nExecuting third trade for {trading_pairs[2]}")
             third_order = await self._execute_trade(
                 symbol=trading_pairs[2],
-                side="BUY",
+                side=sides[2],
                 quantity=second_filled_qty
             )
 
             if not await self._wait_for_confirmation(third_order['orderId']):
                 raise Exception(f"Third trade {trading_pairs[2]} failed to confirm")
 
-            # Changed from 'execQty' to 'cumExecQty'
-            third_filled_qty = self.trade_confirmations[third_order['orderId']]['cumExecQty']
+            third_filled_qty = self._received_amount(third_order['orderId'])
             self.executed_amounts[trading_pairs[2]] = third_filled_qty
             print(f"Third trade completed. Received: {third_filled_qty}")
 
@@ -263,6 +558,226 @@ class TriangleWalletExecutor:
             }
 
 
+class InventoryTriangleExecutor(TriangleWalletExecutor):
+    """
+    Execute all three legs of a triangle at once from pre-positioned inventory.
+
+    Every currency of the triangle is already held in the wallet, so no leg has to wait
+    for the previous fill. The legs are fired together with asyncio.gather and the
+    inventory is brought back to its targets by a background rebalance task.
+    """
+
+    def __init__(self, wallet_manager: WalletManager, initial_trading_amount: str,
+                 inventory_targets: Dict[str, str], rebalance_tolerance: str = "0.05",
+                 balance_cache: WalletBalanceCache = None, instrument_scales: Dict[str, InstrumentScale] = None):
+        """
+        Args:
+            wallet_manager (WalletManager): Wallet holding the inventory
+            initial_trading_amount (str): Amount spent on the first leg
+            inventory_targets (dict): Target balance per coin, e.g. {'USDC': '100', 'ADA': '150'}
+            rebalance_tolerance (str): Relative deviation from a target tolerated before rebalancing
+            balance_cache (WalletBalanceCache): Optional streaming balances used instead of REST
+            instrument_scales (dict): Optional symbol -> InstrumentScale for lot-size rounding
+        """
+        super().__init__(wallet_manager, initial_trading_amount, balance_cache, instrument_scales)
+        self.inventory_targets = {coin: Decimal(str(target)) for coin, target in inventory_targets.items()}
+        self.rebalance_tolerance = Decimal(str(rebalance_tolerance))
+        self.leg_timings = []
+        self.rebalance_task = None
+
+    def _spent_currency(self, symbol: str, side: str) -> str:
+        """Currency taken from inventory by a market order (quote for BUY, base for SELL)"""
+        base, quote = split_symbol(symbol)
+        return quote if side.upper() == "BUY" else base
+
+    def _inventory(self, balance) -> Dict[str, Decimal]:
+        if self.balance_cache:
+            return self.balance_cache.balances
+        return {coin['coin']: Decimal(str(coin['equity'])) for coin in balance['result']['list'][0]['coin']}
+
+    def _verify_inventory(self, balance, trading_pairs: List[str], leg_quantities: List[str]) -> bool:
+        """Verify that every leg can be funded from the inventory currently held"""
+        try:
+            equity = self._inventory(balance)
+        except Exception as e:
+            print(f"Error reading inventory: {e}")
+            return False
+
+        required = {}
+        for symbol, side, quantity in zip(trading_pairs, cycle_leg_sides(trading_pairs), leg_quantities):
+            currency = self._spent_currency(symbol, side)
+            required[currency] = required.get(currency, Decimal(0)) + Decimal(str(quantity))
+
+        for currency, amount in required.items():
+            available = equity.get(currency, Decimal(0))
+            print(f"Inventory {currency}: available {available}, required {amount}")
+            if available < amount:
+                return False
+        return True
+
+    async def _timed_leg(self, leg: int, symbol: str, side: str, quantity: str) -> Dict:
+        """Place one leg and record when it was sent and acknowledged"""
+        sent_ns = time.perf_counter_ns()
+        order = await self._execute_trade(symbol=symbol, side=side, quantity=quantity)
+        acked_ns = time.perf_counter_ns()
+        order['timing'] = {'leg': leg, 'sent_ns': sent_ns, 'acked_ns': acked_ns}
+        return order
+
+    def _leg_skew(self, orders: List[Dict]) -> Dict:
+        """Spread between the earliest and latest leg, in milliseconds"""
+        sent = [order['timing']['sent_ns'] for order in orders]
+        acked = [order['timing']['acked_ns'] for order in orders]
+        return {
+            'send_skew_ms': (max(sent) - min(sent)) / 1e6,
+            'ack_skew_ms': (max(acked) - min(acked)) / 1e6,
+            'round_trip_ms': [(a - s) / 1e6 for s, a in zip(sent, acked)]
+        }
+
+    async def _rebalance_inventory(self, trading_pairs: List[str]):
+        """
+        Bring every coin of the triangle that has a target, the anchor included, back to it
+
+        Each coin is traded against a neighbour in the triangle that has not been settled
+        yet, so no rebalance order undoes an earlier one. Three coins joined by three pairs
+        leave one coin to take up the cycle's profit or loss: the last coin of the path,
+        or one without a target if there is one.
+        """
+        try:
+            path = [split_symbol(trading_pairs[0])[1]]
+            for symbol in trading_pairs:
+                base, quote = split_symbol(symbol)
+                path.append(quote if path[-1] == base else base)
+            coins = [coin for coin in dict.fromkeys(path) if coin in self.inventory_targets]
+
+            settled = set()
+            for coin in coins:
+                # Re-read after every order, each one also moved the coin it was traded against
+                balance = None
+                if not self.balance_cache:
+                    balance = await asyncio.to_thread(self.wallet_manager.get_wallet_balance)
+                    if not balance:
+                        return
+                equity = self._inventory(balance)
+
+                target = self.inventory_targets[coin]
+                deviation = target - equity.get(coin, Decimal(0))
+                if abs(deviation) <= target * self.rebalance_tolerance:
+                    settled.add(coin)
+                    continue
+
+                symbol = None
+                for pair in trading_pairs:
+                    pair_coins = split_symbol(pair)
+                    if coin in pair_coins and not settled.intersection(pair_coins):
+                        symbol = pair
+                        break
+                if symbol is None:
+                    print(f"{coin} off target by {deviation}, left to absorb the cycle's result")
+                    continue
+                settled.add(coin)
+
+                # Base coins are sized in base, the quote coin of a pair is bought or sold for in quote
+                base, quote = split_symbol(symbol)
+                if coin == base:
+                    side, unit = ("BUY" if deviation > 0 else "SELL"), "baseCoin"
+                else:
+                    side, unit = ("SELL" if deviation > 0 else "BUY"), "quoteCoin"
+                print(f"Rebalancing {coin} on {symbol}: {side} {abs(deviation)} {coin}")
+                order = await self._execute_trade(symbol=symbol, side=side, quantity=str(abs(deviation)),
+                                                  marketUnit=unit)
+                await self._wait_for_confirmation(order['orderId'])
+        except Exception as e:
+            print(f"Error rebalancing inventory: {e}")
+
+    async def execute_triangle_trade(self, trading_pairs: List[str], leg_quantities: List[str] = None):
+        """
+        Execute the three legs of a triangle concurrently from inventory
+
+        Args:
+            trading_pairs (list): The three pairs of the triangle
+            leg_quantities (list): Amount each leg spends (quote coin for a BUY, base coin for a SELL)
+
+        Returns:
+            dict: Filled orders, executed amounts and the measured leg timing skew; when a leg
+                fails, status 'partial' (or 'error' if nothing filled) and the failed legs
+        """
+        if len(trading_pairs) != 3:
+            raise ValueError("Must provide exactly 3 trading pairs")
+        if not leg_quantities or len(leg_quantities) != 3:
+            raise ValueError("Inventory mode needs a quantity for each of the 3 legs")
+
+        # The REST fallback blocks, keep it off the loop the legs are about to run on
+        balance = await asyncio.to_thread(self._get_balance)
+        if not self._verify_inventory(balance, trading_pairs, leg_quantities):
+            raise ValueError("Insufficient inventory for concurrent triangle execution")
+
+        print(f"\nExecuting concurrent legs for {trading_pairs}")
+        legs = list(zip(trading_pairs, cycle_leg_sides(trading_pairs), leg_quantities))
+        # A failed leg must not lose the orderIds of the legs that went through
+        placed = await asyncio.gather(*[self._timed_leg(leg, symbol, side, quantity)
+                                        for leg, (symbol, side, quantity) in enumerate(legs)],
+                                      return_exceptions=True)
+        orders = [order for order in placed if not isinstance(order, BaseException)]
+        failed = [{'symbol': symbol, 'side': side, 'error': str(order)}
+                  for (symbol, side, _), order in zip(legs, placed) if isinstance(order, BaseException)]
+
+        confirmed = await asyncio.gather(*[self._wait_for_confirmation(order['orderId']) for order in orders])
+        filled = []
+        for order, is_filled in zip(orders, confirmed):
+            if is_filled:
+                filled.append(order)
+                self.executed_amounts[order['symbol']] = self.trade_confirmations[order['orderId']]['cumExecQty']
+            else:
+                failed.append({'symbol': order['symbol'], 'side': order['side'], 'orderId': order['orderId'],
+                               'error': 'failed to confirm'})
+
+        skew = self._leg_skew(orders) if orders else None
+        if skew:
+            self.leg_timings.append(skew)
+            print(f"Legs sent within {skew['send_skew_ms']:.3f} ms, "
+                  f"acknowledged within {skew['ack_skew_ms']:.3f} ms")
+
+        if filled:
+            # After a failed leg this also unwinds the position the filled legs left open
+            self._schedule_rebalance(trading_pairs, urgent=bool(failed))
+
+        if failed:
+            print(f"Concurrent triangle incomplete, {len(filled)} legs filled, failed: {failed}")
+            return {
+                "status": "partial" if filled else "error",
+                "message": "; ".join(f"{leg['symbol']}: {leg['error']}" for leg in failed),
+                "orders": filled,
+                "failed_legs": failed,
+                "executed_amounts": self.executed_amounts,
+                "leg_timing": skew
+            }
+
+        return {
+            "status": "success",
+            "orders": filled,
+            "executed_amounts": self.executed_amounts,
+            "leg_timing": skew
+        }
+
+    def _schedule_rebalance(self, trading_pairs: List[str], urgent: bool = False):
+        """
+        Start a background rebalance of the triangle's coins
+
+        A rebalance still in flight works from older balances and the next trade catches
+        up; an urgent one (open position after a failed leg) is queued behind it instead.
+        """
+        previous = self.rebalance_task
+        if previous is None or previous.done():
+            self.rebalance_task = asyncio.create_task(self._rebalance_inventory(trading_pairs))
+        elif urgent:
+            async def after_previous():
+                await asyncio.wait([previous])
+                await self._rebalance_inventory(trading_pairs)
+            self.rebalance_task = asyncio.create_task(after_previous())
+        else:
+            print("Previous inventory rebalance still running, skipping this one")
+
+
 import json
 import time
 import asyncio